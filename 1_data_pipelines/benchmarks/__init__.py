@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The DAG modules import each other as top-level modules (e.g. `from staging import ...`)
+# as Airflow puts the dags folder on the path, so do the same for the benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dags'))
+# and the applicant_validation library is on the path of the Airflow containers
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'libs', 'applicant_validation'))
@@ -0,0 +1,353 @@
+"""
+Times the functions of the applicant_validation library and the stages of the pipeline on synthetic applications.
+
+Usage:
+    python -m benchmarks.run_benchmarks --sizes 5000 100000 1000000 10000000 --output baseline.json
+    python -m benchmarks.run_benchmarks --compare baseline.json --output current.json
+"""
+from typing import Callable, Dict, List, Optional
+from datetime import datetime
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic_data import generate_applications
+import applicant_validation
+from applicant_validation import batch, core, records
+
+
+DEFAULT_SIZES = [5000, 50000, 500000]
+DEFAULT_REPEAT = 3
+# relative change of time or peak memory above which a benchmark is reported as a regression
+DEFAULT_THRESHOLD = 0.10
+
+
+class Inputs:
+    """
+    The inputs of the benchmarks for one size, derived from the synthetic applications once and then shared.
+
+    Args:
+        num_rows (int): The number of synthetic applications.
+        seed (int): The seed of the random generator.
+    """
+
+    def __init__(self, num_rows: int, seed: int = 0):
+        self.num_rows = num_rows
+        self.raw_df = generate_applications(num_rows, seed)
+        self._cache = {}
+
+    def _cached(self, key: str, func: Callable):
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    @property
+    def raw_records(self) -> List[Dict]:
+        return self._cached('raw_records', lambda: self.raw_df.to_dict('records'))
+
+    @property
+    def preprocessed_df(self) -> pd.DataFrame:
+        return self._cached('preprocessed_df', lambda: batch.preprocess_frame(self.raw_df))
+
+    @property
+    def preprocessed_records(self) -> List[Dict]:
+        return self._cached('preprocessed_records', lambda: self.preprocessed_df.to_dict('records'))
+
+    @property
+    def valid_records(self) -> List[Dict]:
+        return self._cached('valid_records',
+                            lambda: batch.validate_frame(self.preprocessed_df)[0].to_dict('records'))
+
+    @property
+    def dates_with_formats(self) -> List[tuple]:
+        return self._cached('dates_with_formats', lambda: [(date, core.identify_date_format(date))
+                                                           for date in self.raw_df['date_of_birth']])
+
+
+class Benchmark:
+    """
+    A function timed on the inputs of each size.
+
+    Args:
+        name (str): The name of the benchmark, e.g. core.split_name.
+        setup (Callable): Takes the Inputs and returns the arguments of func. It is called before
+            every run and is not timed, so that the caches can be cleared and mutated inputs copied.
+        func (Callable): The function to time.
+        teardown (Optional[Callable]): Takes the arguments of func and cleans up after every run.
+    """
+
+    def __init__(self, name: str, setup: Callable, func: Callable, teardown: Optional[Callable] = None):
+        self.name = name
+        self.setup = setup
+        self.func = func
+        self.teardown = teardown
+
+    def run(self, inputs: Inputs, repeat: int, measure_memory: bool = True) -> Dict:
+        """
+        Times the function over `repeat` runs with the garbage collector disabled, as timeit does,
+        then measures its peak memory in a separate run, as tracing the allocations slows it down.
+
+        Returns:
+            Dict: The minimum and median time of the runs, the throughput and the peak memory.
+        """
+        timings = []
+        for _ in range(repeat):
+            args = self.setup(inputs)
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                self.func(*args)
+                timings.append(time.perf_counter() - start)
+            finally:
+                gc.enable()
+                if self.teardown is not None:
+                    self.teardown(*args)
+
+        peak_memory = None
+        if measure_memory:
+            args = self.setup(inputs)
+            gc.collect()
+            tracemalloc.start()
+            try:
+                self.func(*args)
+                _, peak_memory = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+                if self.teardown is not None:
+                    self.teardown(*args)
+
+        return {
+          'name': self.name,
+          'rows': inputs.num_rows,
+          'repeat': repeat,
+          'min_seconds': min(timings),
+          'median_seconds': float(np.median(timings)),
+          'rows_per_second': inputs.num_rows / min(timings) if min(timings) > 0 else None,
+          'peak_memory_mb': peak_memory / 2 ** 20 if peak_memory is not None else None,
+        }
+
+
+def clear_caches():
+    # the memoized date parsing and hashing would otherwise be warm from the previous runs
+    applicant_validation.clear_caches()
+
+
+def row_benchmark(func: Callable, values: Callable, name: Optional[str] = None) -> Benchmark:
+    # time a row-wise function called once per record, as the pipeline used to
+    def setup(inputs):
+        clear_caches()
+        return (values(inputs),)
+
+    return Benchmark(f'core.{name or func.__name__}', setup, lambda rows: [func(*row) for row in rows])
+
+
+def utils_benchmarks() -> List[Benchmark]:
+    def column(name):
+        return lambda inputs: [(value,) for value in inputs.raw_df[name]]
+
+    def normalized_dates(inputs):
+        return [(date,) for date in inputs.preprocessed_df['date_of_birth']]
+
+    def dates_with_formats(inputs):
+        return inputs.dates_with_formats
+
+    def normalize_many_setup(inputs):
+        clear_caches()
+        return core.DateNormalizer(), inputs.raw_df['date_of_birth'].tolist()
+
+    return [
+      row_benchmark(core.has_correct_digits, column('mobile_no')),
+      row_benchmark(core.identify_date_format, column('date_of_birth')),
+      row_benchmark(core.format_date_of_birth, dates_with_formats),
+      row_benchmark(core.parse_date, dates_with_formats),
+      row_benchmark(core.date_layout, column('date_of_birth')),
+      Benchmark('core.DateNormalizer.normalize_many', normalize_many_setup,
+                lambda normalizer, dates: normalizer.normalize_many(dates)),
+      row_benchmark(lambda date: core.is_above_age(date, 18), normalized_dates, 'is_above_age'),
+      row_benchmark(core.is_valid_email, column('email')),
+      row_benchmark(core.is_empty_name, column('name')),
+      row_benchmark(core.split_name, column('name')),
+      row_benchmark(core.is_valid_date, normalized_dates),
+      row_benchmark(core.get_hashed_date, normalized_dates),
+      row_benchmark(core.hash_date, normalized_dates),
+    ]
+
+
+def stage_benchmarks() -> List[Benchmark]:
+    def with_cleared_caches(values):
+        # validate_records and transform_records add fields to the records, so give them fresh copies
+        def setup(inputs):
+            clear_caches()
+            return ([dict(record) for record in values(inputs)],)
+        return setup
+
+    benchmarks = [
+      Benchmark('records.preprocess_records', with_cleared_caches(lambda inputs: inputs.raw_records),
+                records.preprocess_records),
+      Benchmark('records.validate_records', with_cleared_caches(lambda inputs: inputs.preprocessed_records),
+                records.validate_records),
+      Benchmark('records.transform_records', with_cleared_caches(lambda inputs: inputs.valid_records),
+                records.transform_records),
+    ]
+
+    # data_pipeline defines the DAGs, so writing can only be timed where Airflow is installed
+    try:
+        import data_pipeline
+    except ImportError as e:
+        print(f'Skipping the data_pipeline benchmarks as data_pipeline cannot be imported: {e}')
+        return benchmarks
+
+    def write_setup(inputs):
+        return inputs.preprocessed_records, tempfile.mkdtemp(prefix='benchmark_')
+
+    return benchmarks + [
+      Benchmark('data_pipeline.write_dict_to_csv', write_setup,
+                lambda records, path: data_pipeline.write_dict_to_csv(records, path, 'benchmark', 'run'),
+                teardown=lambda records, path: shutil.rmtree(path, ignore_errors=True)),
+    ]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict:
+    return {
+      'python': platform.python_version(),
+      'pandas': pd.__version__,
+      'numpy': np.__version__,
+      'platform': platform.platform(),
+      'processor': platform.processor(),
+      'cpu_count': os.cpu_count(),
+    }
+
+
+def run_benchmarks(sizes: List[int], repeat: int = DEFAULT_REPEAT, pattern: Optional[str] = None,
+                   seed: int = 0, measure_memory: bool = True) -> Dict:
+    """
+    Runs the benchmarks matching the pattern on synthetic applications of each size.
+
+    Returns:
+        Dict: The results of the benchmarks, with the commit and the environment they were run on.
+    """
+    benchmarks = utils_benchmarks() + stage_benchmarks()
+    if pattern is not None:
+        benchmarks = [benchmark for benchmark in benchmarks if re.search(pattern, benchmark.name)]
+
+    results = []
+    for num_rows in sizes:
+        inputs = Inputs(num_rows, seed)
+        for benchmark in benchmarks:
+            result = benchmark.run(inputs, repeat, measure_memory)
+            results.append(result)
+            print(format_result(result))
+        del inputs
+    return {
+      'commit': git_commit(),
+      'created_at': datetime.utcnow().isoformat(),
+      'seed': seed,
+      'environment': environment(),
+      'results': results,
+    }
+
+
+def format_result(result: Dict) -> str:
+    memory = f"{result['peak_memory_mb']:10.1f} MB" if result['peak_memory_mb'] is not None else ''
+    return (f"{result['name']:<40} {result['rows']:>10} rows {result['min_seconds']:10.4f} s "
+            f"{result['rows_per_second'] or 0:14,.0f} rows/s {memory}")
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    Compares the results of two runs of the benchmarks.
+
+    Args:
+        baseline (Dict): The results of the reference run, e.g. on the main branch.
+        current (Dict): The results of the run to check.
+        threshold (float): The relative change of time or peak memory above which a benchmark is
+            reported as a regression or an improvement.
+
+    Returns:
+        List[Dict]: The benchmarks run in both, with the ratios of their times and peak memory
+            (current / baseline) and their status: 'regression', 'improvement' or 'unchanged'.
+    """
+    baseline_results = {(result['name'], result['rows']): result for result in baseline['results']}
+    comparisons = []
+    for result in current['results']:
+        reference = baseline_results.get((result['name'], result['rows']))
+        if reference is None:
+            continue
+        time_ratio = result['min_seconds'] / reference['min_seconds'] if reference['min_seconds'] else None
+        memory_ratio = None
+        if result['peak_memory_mb'] is not None and reference['peak_memory_mb']:
+            memory_ratio = result['peak_memory_mb'] / reference['peak_memory_mb']
+        ratios = [ratio for ratio in (time_ratio, memory_ratio) if ratio is not None]
+        if any(ratio > 1 + threshold for ratio in ratios):
+            status = 'regression'
+        elif any(ratio < 1 / (1 + threshold) for ratio in ratios):
+            status = 'improvement'
+        else:
+            status = 'unchanged'
+        comparisons.append({'name': result['name'], 'rows': result['rows'], 'time_ratio': time_ratio,
+                            'memory_ratio': memory_ratio, 'status': status})
+    return comparisons
+
+
+def print_comparison(comparisons: List[Dict]):
+    for comparison in comparisons:
+        time_ratio = f"{comparison['time_ratio']:.2f}x" if comparison['time_ratio'] is not None else '-'
+        memory_ratio = f"{comparison['memory_ratio']:.2f}x" if comparison['memory_ratio'] is not None else '-'
+        print(f"{comparison['name']:<40} {comparison['rows']:>10} rows  time {time_ratio:>7}  "
+              f"memory {memory_ratio:>7}  {comparison['status']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help=f'numbers of applications to run the benchmarks on (default {DEFAULT_SIZES})')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f'number of timed runs of each benchmark (default {DEFAULT_REPEAT})')
+    parser.add_argument('--benchmarks', help='regular expression selecting the benchmarks to run by name')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic applications (default 0)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory measurements')
+    parser.add_argument('--output', help='path of the JSON file to write the results to')
+    parser.add_argument('--compare', help='path of a JSON file of results to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'relative change reported as a regression (default {DEFAULT_THRESHOLD})')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.repeat, args.benchmarks, args.seed, not args.no_memory)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} (commit {baseline.get('commit')}):")
+        comparisons = compare(baseline, results, args.threshold)
+        print_comparison(comparisons)
+        # a non-zero exit status lets a CI job fail on regressions
+        if any(comparison['status'] == 'regression' for comparison in comparisons):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Generates synthetic membership applications modeled on source_data/applications_dataset_*.csv.
+
+Usage:
+    python -m benchmarks.synthetic_data 1000000 /tmp/applications_1m.csv --seed 42
+"""
+from typing import Iterator
+import argparse
+import numpy as np
+import pandas as pd
+
+
+FIRST_NAMES = ['William', 'Kristen', 'Kimberly', 'Mary', 'Benjamin', 'Cathy', 'Brandon', 'Paul', 'Sarah',
+               'Caroline', 'Travis', 'Joseph', 'Jeffrey', 'Michael', 'Jennifer', 'David', 'Elizabeth', 'James',
+               'Patricia', 'Robert', 'Linda', 'John', 'Barbara', 'Richard', 'Susan', 'Thomas', 'Jessica',
+               'Christopher', 'Karen', 'Daniel', 'Nancy', 'Matthew', 'Lisa', 'Anthony', 'Betty', 'Mark']
+LAST_NAMES = ['Dixon', 'Horn', 'Chang', 'Ball', 'Craig', 'Werner', 'Bell', 'Farley', 'Mcdaniel', 'Anderson',
+              'Rice', 'Jacobson', 'Smith', 'Reed', 'Bauer', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia',
+              'Miller', 'Davis', 'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Thomas',
+              'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Clark']
+
+# shares of the names with a salutation or a suffix, and of the email domains made of two last names
+SALUTATIONS = ['Mr.', 'Dr.', 'Mrs.', 'Ms.']
+SALUTATION_RATE = 0.02
+SUFFIXES = ['MD', 'DDS', 'DVM', 'PhD', 'Jr.', 'III', 'II']
+SUFFIX_RATE = 0.025
+HYPHENATED_DOMAIN_RATE = 0.34
+
+# email top-level domains with their shares, of which only .com and .net are valid
+EMAIL_TLDS = ['.com', '.net', '.biz', '.info', '.org']
+EMAIL_TLD_WEIGHTS = [0.60, 0.10, 0.10, 0.10, 0.10]
+
+# the four date layouts of the source files, in equal shares
+DATE_FORMATS = ['%Y-%m-%d', '%Y/%m/%d', '%m/%d/%Y', '%m-%d-%Y']
+DATE_RANGE = ('1950-01-01', '2018-12-31')
+
+# mobile numbers have 5 to 8 digits in equal shares, and a third of the 8-digit ones are split by a space
+MOBILE_DIGITS = [5, 6, 7, 8]
+SPACED_MOBILE_RATE = 1 / 3
+
+
+def generate_applications(num_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generates synthetic applications with the same columns and value distributions as the source files.
+
+    Args:
+        num_rows (int): The number of applications to generate.
+        seed (int): The seed of the random generator, so that the same applications are generated every time.
+
+    Returns:
+        pd.DataFrame: The applications with the string columns name, email, date_of_birth and mobile_no,
+            as read by pd.read_csv from a source file.
+    """
+    rng = np.random.default_rng(seed)
+    first_names = np.asarray(FIRST_NAMES, dtype=object)[rng.integers(len(FIRST_NAMES), size=num_rows)]
+    last_names = np.asarray(LAST_NAMES, dtype=object)[rng.integers(len(LAST_NAMES), size=num_rows)]
+
+    # full names with an optional salutation and suffix
+    names = first_names + ' ' + last_names
+    salutations = np.asarray([s + ' ' for s in SALUTATIONS], dtype=object)
+    salutations = salutations[rng.integers(len(SALUTATIONS), size=num_rows)]
+    names = np.where(rng.random(num_rows) < SALUTATION_RATE, salutations + names, names)
+    suffixes = np.asarray([' ' + s for s in SUFFIXES], dtype=object)[rng.integers(len(SUFFIXES), size=num_rows)]
+    names = np.where(rng.random(num_rows) < SUFFIX_RATE, names + suffixes, names)
+
+    # emails such as William_Dixon@woodward-fuller.biz
+    domains = np.char.lower(np.asarray(LAST_NAMES))[rng.integers(len(LAST_NAMES), size=num_rows)].astype(object)
+    other_domains = np.char.lower(np.asarray(LAST_NAMES))[rng.integers(len(LAST_NAMES), size=num_rows)].astype(object)
+    domains = np.where(rng.random(num_rows) < HYPHENATED_DOMAIN_RATE, domains + '-' + other_domains, domains)
+    tlds = np.asarray(EMAIL_TLDS, dtype=object)[rng.choice(len(EMAIL_TLDS), size=num_rows, p=EMAIL_TLD_WEIGHTS)]
+    emails = first_names + '_' + last_names + '@' + domains + tlds
+
+    # dates of birth in one of the date layouts picked per row
+    start, end = (pd.Timestamp(date) for date in DATE_RANGE)
+    days = rng.integers((end - start).days + 1, size=num_rows)
+    dates = pd.Series(start + pd.to_timedelta(days, unit='D'))
+    layouts = rng.integers(len(DATE_FORMATS), size=num_rows)
+    dates_of_birth = np.empty(num_rows, dtype=object)
+    for layout, date_format in enumerate(DATE_FORMATS):
+        rows = layouts == layout
+        dates_of_birth[rows] = dates[rows].dt.strftime(date_format).to_numpy(dtype=object)
+
+    # mobile numbers without a leading zero
+    num_digits = np.asarray(MOBILE_DIGITS)[rng.integers(len(MOBILE_DIGITS), size=num_rows)]
+    numbers = rng.integers(10 ** (num_digits - 1), 10 ** num_digits).astype(str).astype(object)
+    is_spaced = (num_digits == 8) & (rng.random(num_rows) < SPACED_MOBILE_RATE)
+    spaced_numbers = pd.Series(numbers).str.replace(r'^(\d{4})', r'\1 ', regex=True).to_numpy(dtype=object)
+    mobile_nos = np.where(is_spaced, spaced_numbers, numbers)
+
+    return pd.DataFrame({'name': names, 'email': emails, 'date_of_birth': dates_of_birth, 'mobile_no': mobile_nos})
+
+
+def iter_applications(num_rows: int, seed: int = 0, chunk_size: int = 1000000) -> Iterator[pd.DataFrame]:
+    """
+    Generates synthetic applications in DataFrames of at most chunk_size rows, so that large
+    datasets do not have to be held in memory at once. Each chunk has its own seed derived from seed.
+    """
+    for chunk, start in enumerate(range(0, num_rows, chunk_size)):
+        yield generate_applications(min(chunk_size, num_rows - start), seed=seed + chunk)
+
+
+def write_applications_csv(filename: str, num_rows: int, seed: int = 0, chunk_size: int = 1000000):
+    """Writes synthetic applications to a CSV file in the layout of the source files."""
+    for chunk, df in enumerate(iter_applications(num_rows, seed, chunk_size)):
+        df.to_csv(filename, index=False, mode='w' if chunk == 0 else 'a', header=chunk == 0)
+    print(f"{num_rows} synthetic applications written to {filename}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('num_rows', type=int, help='number of applications to generate')
+    parser.add_argument('filename', help='path of the CSV file to write')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random generator (default 0)')
+    args = parser.parse_args()
+    write_applications_csv(args.filename, args.num_rows, args.seed)
+
+
+if __name__ == '__main__':
+    main()
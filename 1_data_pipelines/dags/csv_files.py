@@ -0,0 +1,41 @@
+import os
+from typing import List, Dict, Iterator, Optional
+import pandas as pd
+from sinks import CsvSink
+
+
+# maximum number of records held in memory at once when processing in batches
+BATCH_SIZE = int(os.getenv('PIPELINE_BATCH_SIZE', 100000))
+
+
+def iter_csv_frames(filename: str, batch_size: int = BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    # yield the records of the csv file in DataFrames of at most batch_size records
+    # the columns are read as strings, as by the Lambda function, so that e.g. mobile numbers keep their leading zeros
+    # files without records, or without even a header, yield no DataFrame rather than an empty one
+    try:
+        chunks = pd.read_csv(filename, chunksize=batch_size, dtype=str)
+    except pd.errors.EmptyDataError:
+        chunks = []
+    for chunk in chunks:
+        if len(chunk) > 0:
+            yield chunk
+    print(f'Ingested {filename}')
+
+
+def iter_csv_batches(filename: str, batch_size: int = BATCH_SIZE) -> Iterator[List[Dict]]:
+    # yield the records of the csv file in batches of at most batch_size records
+    for chunk in iter_csv_frames(filename, batch_size):
+        yield chunk.to_dict('records')
+
+
+# define the function to unload the records
+def write_dict_to_csv(records: list, path: str, prefix: str, timestamp: Optional[str] = None):
+    # write dict to target path
+    write_frame_to_csv(pd.DataFrame(records), path, prefix, timestamp)
+
+
+def write_frame_to_csv(df: pd.DataFrame, path: str, prefix: str, timestamp: Optional[str] = None):
+    # write DataFrame to target path
+    # append timestamp to prevent files from overwritten
+    # records written with the same timestamp are appended to the same file
+    CsvSink(path, prefix, timestamp).write(df)
@@ -2,18 +2,21 @@ import os
 from datetime import datetime, timedelta
 import time
 import pandas as pd
+import psycopg2
 from typing import List, Dict, Tuple
 from airflow import DAG
+from airflow.exceptions import AirflowSkipException
 from airflow.operators.python_operator import PythonOperator
-from utils import (has_correct_digits,
-                   identify_date_format,
-                   format_date_of_birth,
-                   is_above_age,
-                   is_valid_email,
-                   is_empty_name,
-                   split_name,
-                   get_hashed_date
-                   )
+from applicant_validation.batch import preprocess_frame, validate_frame, transform_frame
+from pipeline_tracking.manifest import FileManifest, archive_name, file_sha256
+from pipeline_tracking.metrics import MetricsRecorder
+from ecommerce_db.members import load_members
+from parallel import ShardExecutor
+from staging import StagingStore, read_staged
+# iter_csv_batches and the write functions are kept importable from here, e.g. by the benchmarks
+from csv_files import (BATCH_SIZE, iter_csv_frames, iter_csv_batches, write_dict_to_csv,  # noqa: F401
+                       write_frame_to_csv)
+from sinks import make_sink, RAW_SCHEMA, UNSUCCESSFUL_SCHEMA, SUCCESSFUL_SCHEMA
 
 
 # define the input and output directories
@@ -21,92 +24,170 @@ INPUT_DIR = '/source_data'
 OUTPUT_RAW_DIR = '/raw_data'
 OUTPUT_FAILED_DIR = '/unsuccessful_applicants'
 OUTPUT_PASSED_DIR = '/successful_applicants'
+# define the directory for the intermediate data passed between the tasks
+STAGING_DIR = '/staging'
+# define where the processed source files are moved to and recorded
+ARCHIVE_DIR = os.path.join(INPUT_DIR, 'archive')
+MANIFEST_FILE = os.path.join(ARCHIVE_DIR, 'manifest.json')
+
+# define the format of the outputs, 'csv' or 'parquet', see sinks.py
+OUTPUT_FORMAT = os.getenv('PIPELINE_OUTPUT_FORMAT', 'csv')
+
+# connection string of the ecommerce database the successful applicants are loaded into as members,
+# e.g. "host=ecommerce-db dbname=ecommerce user=postgres password=...". The loading is skipped if it is not set
+MEMBERS_DSN = os.getenv('PIPELINE_MEMBERS_DSN')
 
 
 # define the PythonOperator that reads the csv files and processes the records
-def ingest_csv_files(path: str) -> List[Dict]:
-    # loop through all the csv files in the input directory
-    # and store the records into a python dictionary
-    # remove the file from source_data folder to prevent duplication
-    all_data = []
-    for file in os.listdir(path):
+def list_new_files(path: str, manifest: FileManifest) -> List[Dict]:
+    # list the csv files in the input directory which have not been processed yet
+    # files processed before, under the same or another name, are archived again
+    new_files = []
+    for file in sorted(os.listdir(path)):
         if file.endswith('.csv'):
             filename = os.path.join(path, file)
-            df = pd.read_csv(filename)
-            print(f'Ingested {filename}')
-            data_dict = df.to_dict('records')
-            all_data.extend(data_dict)
-            os.remove(filename)
-            print(f'Removed {filename}')
-    return all_data
-
-
-# define the function to preprocess the data
-def preprocess_records(records: List[Dict]) -> List[Dict]:
-    # perform initial processing of the records
-    preprocessed_records = []
-    for record in records:
-      preprocessed_record = {}
-      preprocessed_record['first_name'], preprocessed_record['last_name'] = split_name(record['name'])
-      preprocessed_record['email'] = record['email']
-      date_format = identify_date_format(record['date_of_birth'])
-      preprocessed_record['date_of_birth'] = format_date_of_birth(record['date_of_birth'], date_format)
-      preprocessed_record['mobile_no'] = record['mobile_no']
-      preprocessed_record['above_18'] = is_above_age(preprocessed_record['date_of_birth'], 18)
-      preprocessed_records.append(preprocessed_record)
-    return preprocessed_records
-
-
-# define the function to perform the validation check
-def validate_record(record: dict) -> str:
-    # perform validation checks on the record
-    # return valid if the record passes the checks and the error otherwise
-    if not has_correct_digits(record['mobile_no'], 8):
-        return 'invalid_mobile_number'
-    if not record['above_18']:
-        return 'below_18'
-    if not is_valid_email(record['email']):
-        return 'invalid_email'
-    if (is_empty_name(
-        record['first_name']) and is_empty_name(record['last_name']
-                                                )):
-        return 'missing_name'
-    return 'valid'
-
-
-def validate_records(records: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
-    # Perform validation checks on all the records
-    valid_records = []
-    invalid_records = []
-    for record in records:
-        check = validate_record(record)
-        if check == 'valid':
-            valid_records.append(record)
-        else:
-            record['validate_check'] = check
-            invalid_records.append(record)
-    return valid_records, invalid_records
-
-
-# define the function to perform the transformation
-def transform_records(records: list) -> list:
-    # perform transformation on the record
-    # return the transformed record
-    for record in records:
-        record['membership_id'] = '_'.join([record['last_name'],
-                                            get_hashed_date(record['date_of_birth'])])
-    return records
-
-
-# define the function to unload the records
-def write_dict_to_csv(records: list, path: str, prefix: str):
-    # write dict to target path
-    # append timestamp to prevent files from overwritten
-    timestamp = time.strftime("%Y%m%d-%H%M%S")
-    filename = f"{path}/{prefix}_{timestamp}.csv"
-    df = pd.DataFrame(records)
-    df.to_csv(filename, index=False)
-    print(f"{len(records)} records written to {filename}")
+            stat = os.stat(filename)
+            source_file = {'name': file, 'path': filename, 'size': stat.st_size, 'mtime': stat.st_mtime}
+            if manifest.is_unchanged(file, stat.st_size, stat.st_mtime):
+                content_hash = manifest.entries[file]['content_hash']
+            else:
+                content_hash = source_file['content_hash'] = file_sha256(filename)
+                if not manifest.is_processed(content_hash):
+                    new_files.append(source_file)
+                    continue
+            print(f'Skipped {filename} as it was already processed')
+            archive_file(filename, content_hash)
+    return new_files
+
+
+def archive_file(filename: str, content_hash: str):
+    # move the source file out of the input directory once it is processed
+    # instead of removing it, so that no data is lost if the run fails
+    # the content hash is added to its name so that a file changed under the same name
+    # does not replace the archived copy of its previous version
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    archived_filename = os.path.join(ARCHIVE_DIR, archive_name(os.path.basename(filename), content_hash))
+    os.replace(filename, archived_filename)
+    print(f'Archived {filename} to {archived_filename}')
+
+
+def record_files(manifest: FileManifest, source_files: List[Dict], status: str, run_id: str):
+    # record the status of the source files in the manifest
+    for source_file in source_files:
+        manifest.mark(source_file['name'], status, run_id=run_id, size=source_file['size'],
+                      mtime=source_file['mtime'], content_hash=source_file['content_hash'], rows=source_file['rows'])
+
+
+def mark_files_processed(source_files: List[Dict], run_id: str):
+    # record the source files as processed before archiving them
+    # so that a file is never processed twice, even if archiving fails
+    manifest = FileManifest.load(MANIFEST_FILE)
+    record_files(manifest, source_files, 'processed', run_id)
+    manifest.save(MANIFEST_FILE)
+    for source_file in source_files:
+        archive_file(source_file['path'], source_file['content_hash'])
+
+
+def output_sinks(timestamp: str) -> Dict:
+    # define the sinks of the raw, unsuccessful and successful records of a run in OUTPUT_FORMAT
+    # Parquet outputs are partitioned by ingestion date, and the unsuccessful records by reason as well
+    return {
+      'raw_data': make_sink(OUTPUT_FORMAT, OUTPUT_RAW_DIR, 'raw_data', timestamp, RAW_SCHEMA),
+      'unsuccessful_applicants': make_sink(OUTPUT_FORMAT, OUTPUT_FAILED_DIR, 'unsuccessful_applicants', timestamp,
+                                           UNSUCCESSFUL_SCHEMA, ['validate_check']),
+      'successful_applicants': make_sink(OUTPUT_FORMAT, OUTPUT_PASSED_DIR, 'successful_applicants', timestamp,
+                                         SUCCESSFUL_SCHEMA),
+    }
+
+
+def write_output(metrics: MetricsRecorder, sink, df: pd.DataFrame):
+    # write the records to an output, timed as the writing stage
+    with metrics.stage('writing') as stage:
+        sink.write(df)
+        stage.add_rows(rows_in=len(df), rows_out=len(df))
+
+
+def load_successful_files(metrics: MetricsRecorder, successful_files: List[str]):
+    # upsert the successful applicants written by a run into the members table, timed as the loading stage
+    connection = psycopg2.connect(MEMBERS_DSN)
+    try:
+        with metrics.stage('loading') as stage:
+            counts = load_members(connection, successful_files)
+            stage.add_rows(rows_in=counts['staged'], rows_out=counts['inserted'] + counts['updated'])
+    finally:
+        connection.close()
+
+
+# define the functions to run a stage on the shards of a batch in parallel
+def preprocess_in_parallel(executor: ShardExecutor, df: pd.DataFrame) -> pd.DataFrame:
+    return pd.concat(executor.map(preprocess_frame, df))
+
+
+def validate_in_parallel(executor: ShardExecutor, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    # log the counts of each shard to spot skewed or failing shards
+    results = executor.map(validate_frame, df)
+    for shard, (valid_df, invalid_df) in enumerate(results):
+        print(f'Shard {shard}: {len(valid_df)} valid and {len(invalid_df)} invalid records')
+    return pd.concat([valid_df for valid_df, _ in results]), pd.concat([invalid_df for _, invalid_df in results])
+
+
+def transform_in_parallel(executor: ShardExecutor, df: pd.DataFrame) -> pd.DataFrame:
+    return pd.concat(executor.map(transform_frame, df))
+
+
+# define the functions to run a stage on a batch and record its metrics
+def preprocess_batch(metrics: MetricsRecorder, executor: ShardExecutor, raw_df: pd.DataFrame) -> pd.DataFrame:
+    with metrics.stage('preprocessing') as stage:
+        preprocessed_df = preprocess_in_parallel(executor, raw_df)
+        stage.add_rows(rows_in=len(raw_df), rows_out=len(preprocessed_df))
+    return preprocessed_df
+
+
+def validate_batch(metrics: MetricsRecorder, executor: ShardExecutor,
+                   preprocessed_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    with metrics.stage('validation') as stage:
+        valid_df, invalid_df = validate_in_parallel(executor, preprocessed_df)
+        stage.add_rows(rows_in=len(preprocessed_df), rows_out=len(valid_df))
+        stage.add_rejections(invalid_df['validate_check'])
+    return valid_df, invalid_df
+
+
+def transform_batch(metrics: MetricsRecorder, executor: ShardExecutor, valid_df: pd.DataFrame) -> pd.DataFrame:
+    with metrics.stage('transformation') as stage:
+        transformed_df = transform_in_parallel(executor, valid_df)
+        stage.add_rows(rows_in=len(valid_df), rows_out=len(transformed_df))
+    return transformed_df
+
+
+# define the function to process the csv files batch by batch
+def process_csv_files_in_batches(path: str, run_id: str, batch_size: int = BATCH_SIZE):
+    # run every stage on one batch at a time so that memory is bounded by the batch size
+    # the outputs of all the batches are appended to the same files
+    # each file is recorded in the manifest once all its batches are processed
+    # the metrics of each stage are summed over all the batches
+    metrics = MetricsRecorder('data_pipeline_backfill', run_id)
+    sinks = output_sinks(time.strftime("%Y%m%d-%H%M%S"))
+    source_files = list_new_files(path, FileManifest.load(MANIFEST_FILE))
+    try:
+        with ShardExecutor() as executor:
+            for source_file in source_files:
+                source_file['rows'] = 0
+                for raw_df in iter_csv_frames(source_file['path'], batch_size):
+                    source_file['rows'] += len(raw_df)
+                    write_output(metrics, sinks['raw_data'], raw_df)
+                    preprocessed_df = preprocess_batch(metrics, executor, raw_df)
+                    valid_df, invalid_df = validate_batch(metrics, executor, preprocessed_df)
+                    if len(invalid_df) > 0:
+                      write_output(metrics, sinks['unsuccessful_applicants'], invalid_df)
+                    if len(valid_df) > 0:
+                      transformed_df = transform_batch(metrics, executor, valid_df)
+                      write_output(metrics, sinks['successful_applicants'], transformed_df)
+                mark_files_processed([source_file], run_id)
+        # the successful applicants of all the batches are loaded at once, in a single transaction
+        if MEMBERS_DSN and sinks['successful_applicants'].files:
+            load_successful_files(metrics, sinks['successful_applicants'].files)
+    finally:
+        metrics.export()
 
 
 # set up the pipeline
@@ -123,36 +204,107 @@ dag = DAG(
   default_args=default_args,
   schedule_interval="@hourly",
   catchup=False,
+  max_active_runs=1,
   description='Data pipeline to process ecommerce data',
 )
 
 
+# the records are passed between the tasks through files in the staging directory
+# and only the path and row counts of the files are pushed to XCom
 def ingestion(**context):
-    raw_data = ingest_csv_files(INPUT_DIR)
-    if len(raw_data) > 0:
-      write_dict_to_csv(raw_data, OUTPUT_RAW_DIR, 'raw_data')
+    # the source files are left in place until the run has gone through
+    # so that a retry of the ingestion reads them again
+    # the ingestion stage covers listing, reading and staging the files, and includes writing the raw data
+    staging = StagingStore(STAGING_DIR, context['run_id'])
+    metrics = MetricsRecorder('data_pipeline', context['run_id'], task='ingestion')
+    manifest = FileManifest.load(MANIFEST_FILE)
+    raw_sink = output_sinks(time.strftime("%Y%m%d-%H%M%S"))['raw_data']
+
+    def raw_frames(source_files):
+        for source_file in source_files:
+            source_file['rows'] = 0
+            for raw_df in iter_csv_frames(source_file['path']):
+                source_file['rows'] += len(raw_df)
+                write_output(metrics, raw_sink, raw_df)
+                yield raw_df
+
+    try:
+        with metrics.stage('ingestion') as stage:
+            source_files = list_new_files(INPUT_DIR, manifest)
+            raw_data = staging.write('raw_data', raw_frames(source_files))
+            stage.add_rows(rows_in=raw_data['rows'], rows_out=raw_data['rows'])
+    finally:
+        metrics.export()
+    record_files(manifest, source_files, 'ingested', context['run_id'])
+    manifest.save(MANIFEST_FILE)
+    context['ti'].xcom_push(key='source_files', value=source_files)
     context['ti'].xcom_push(key='raw_data', value=raw_data)
 
 
 def preprocessing(**context):
+    staging = StagingStore(STAGING_DIR, context['run_id'])
+    metrics = MetricsRecorder('data_pipeline', context['run_id'], task='preprocessing')
     raw_data = context['ti'].xcom_pull(key='raw_data')
-    preprocessed_data = preprocess_records(raw_data)
+    try:
+        with ShardExecutor() as executor:
+            preprocessed_frames = (preprocess_batch(metrics, executor, raw_df) for raw_df in read_staged(raw_data))
+            preprocessed_data = staging.write('preprocessed_data', preprocessed_frames)
+    finally:
+        metrics.export()
     context['ti'].xcom_push(key='preprocessed_data', value=preprocessed_data)
 
 
 def validation(**context):
+    staging = StagingStore(STAGING_DIR, context['run_id'])
+    metrics = MetricsRecorder('data_pipeline', context['run_id'], task='validation')
     preprocessed_data = context['ti'].xcom_pull(key='preprocessed_data')
-    valid_data, invalid_data = validate_records(preprocessed_data)
-    if len(invalid_data) > 0:
-      write_dict_to_csv(invalid_data, OUTPUT_FAILED_DIR, 'unsuccessful_applicants')
+    invalid_sink = output_sinks(time.strftime("%Y%m%d-%H%M%S"))['unsuccessful_applicants']
+
+    def valid_frames(executor):
+        for preprocessed_df in read_staged(preprocessed_data):
+            valid_df, invalid_df = validate_batch(metrics, executor, preprocessed_df)
+            if len(invalid_df) > 0:
+              write_output(metrics, invalid_sink, invalid_df)
+            yield valid_df
+
+    try:
+        with ShardExecutor() as executor:
+            valid_data = staging.write('valid_data', valid_frames(executor))
+    finally:
+        metrics.export()
     context['ti'].xcom_push(key='valid_data', value=valid_data)
 
 
 def transformation(**context):
+    staging = StagingStore(STAGING_DIR, context['run_id'])
+    metrics = MetricsRecorder('data_pipeline', context['run_id'], task='transformation')
     valid_data = context['ti'].xcom_pull(key='valid_data')
-    if len(valid_data) > 0:
-      transformed_data = transform_records(valid_data)
-      write_dict_to_csv(transformed_data, OUTPUT_PASSED_DIR, 'successful_applicants')
+    passed_sink = output_sinks(time.strftime("%Y%m%d-%H%M%S"))['successful_applicants']
+    try:
+        with ShardExecutor() as executor:
+            for valid_df in read_staged(valid_data):
+                transformed_df = transform_batch(metrics, executor, valid_df)
+                write_output(metrics, passed_sink, transformed_df)
+    finally:
+        metrics.export()
+    # the source files are archived and the staged data removed only once the run has gone through
+    mark_files_processed(context['ti'].xcom_pull(key='source_files'), context['run_id'])
+    staging.cleanup()
+    context['ti'].xcom_push(key='successful_files', value=passed_sink.files)
+
+
+def loading(**context):
+    if not MEMBERS_DSN:
+        raise AirflowSkipException('PIPELINE_MEMBERS_DSN is not set, the members are not loaded')
+    successful_files = context['ti'].xcom_pull(key='successful_files')
+    if not successful_files:
+        print('No successful applicants to load')
+        return
+    metrics = MetricsRecorder('data_pipeline', context['run_id'], task='loading')
+    try:
+        load_successful_files(metrics, successful_files)
+    finally:
+        metrics.export()
 
 
 with dag:
@@ -180,4 +332,34 @@ with dag:
       provide_context=True,
     )
 
-    ingestion >> preprocessing >> validation >> transformation
+    loading = PythonOperator(
+      task_id='loading',
+      python_callable=loading,
+      provide_context=True,
+    )
+
+    ingestion >> preprocessing >> validation >> transformation >> loading
+
+
+# set up the pipeline for large backfills, which is triggered manually
+# and processes the files in batches within a single task
+backfill_dag = DAG(
+  dag_id='data_pipeline_backfill',
+  default_args=default_args,
+  schedule_interval=None,
+  catchup=False,
+  max_active_runs=1,
+  description='Data pipeline to process large backfills of ecommerce data in batches',
+)
+
+
+def batch_processing(**context):
+    process_csv_files_in_batches(INPUT_DIR, context['run_id'])
+
+
+with backfill_dag:
+    batch_processing = PythonOperator(
+      task_id='batch_processing',
+      python_callable=batch_processing,
+      provide_context=True,
+    )
@@ -0,0 +1,74 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional
+import os
+import pandas as pd
+
+
+# number of worker processes and maximum number of records sent to a worker at once
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', os.cpu_count() or 1))
+PIPELINE_CHUNK_SIZE = int(os.getenv('PIPELINE_CHUNK_SIZE', 10000))
+
+
+def split_frame(df: pd.DataFrame, chunk_size: int) -> List[pd.DataFrame]:
+    """
+    Splits a DataFrame into shards of at most chunk_size consecutive rows.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to split.
+        chunk_size (int): The maximum number of rows of a shard.
+
+    Returns:
+        List[pd.DataFrame]: The shards, in the order of the rows. An empty DataFrame gives a single empty shard.
+    """
+    if len(df) == 0:
+        return [df]
+    return [df.iloc[start:start + chunk_size] for start in range(0, len(df), chunk_size)]
+
+
+class ShardExecutor:
+    """
+    Runs a function over the shards of DataFrames in a pool of processes.
+
+    The results are returned in the order of the shards, so merging them gives the
+    same output as running the function on the whole DataFrame. With a single worker
+    the shards are processed in the current process.
+
+    Args:
+        workers (int): The number of worker processes. Defaults to PIPELINE_WORKERS.
+        chunk_size (int): The maximum number of rows of a shard. Defaults to PIPELINE_CHUNK_SIZE.
+
+    Example:
+        >>> with ShardExecutor(workers=4) as executor:
+        ...     preprocessed_df = pd.concat(executor.map(preprocess_frame, raw_df))
+    """
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: Optional[int] = None):
+        self.workers = workers or PIPELINE_WORKERS
+        self.chunk_size = chunk_size or PIPELINE_CHUNK_SIZE
+        self._executor = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def map(self, func: Callable, df: pd.DataFrame) -> List:
+        """
+        Applies the function to every shard of the DataFrame.
+
+        Args:
+            func (Callable): A module-level function taking a DataFrame, so that it can be sent to the workers.
+            df (pd.DataFrame): The DataFrame to process.
+
+        Returns:
+            List: The results of the function for each shard, in the order of the shards.
+        """
+        shards = split_frame(df, self.chunk_size)
+        if self._executor is None or len(shards) == 1:
+            return [func(shard) for shard in shards]
+        return list(self._executor.map(func, shards))
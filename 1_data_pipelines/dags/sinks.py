@@ -0,0 +1,209 @@
+from typing import Dict, List, Optional
+from datetime import datetime
+import os
+import re
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# schemas of the outputs of the pipeline
+RAW_SCHEMA = pa.schema([
+  ('name', pa.string()),
+  ('email', pa.string()),
+  ('date_of_birth', pa.string()),
+  ('mobile_no', pa.string()),
+])
+PREPROCESSED_SCHEMA = pa.schema([
+  ('first_name', pa.string()),
+  ('last_name', pa.string()),
+  ('email', pa.string()),
+  ('date_of_birth', pa.string()),
+  ('mobile_no', pa.string()),
+  ('above_18', pa.bool_()),
+])
+UNSUCCESSFUL_SCHEMA = PREPROCESSED_SCHEMA.append(pa.field('validate_check', pa.string()))
+SUCCESSFUL_SCHEMA = PREPROCESSED_SCHEMA.append(pa.field('membership_id', pa.string()))
+
+# partition column derived from the timestamp of the run rather than read from the records
+INGESTION_DATE = 'ingestion_date'
+
+# compression codec and maximum number of rows of a row group of the Parquet files
+PARQUET_COMPRESSION = os.getenv('PIPELINE_PARQUET_COMPRESSION', 'snappy')
+PARQUET_ROW_GROUP_SIZE = int(os.getenv('PIPELINE_PARQUET_ROW_GROUP_SIZE', 100000))
+
+
+def conform_to_schema(df: pd.DataFrame, schema: pa.Schema) -> pd.DataFrame:
+    """
+    Checks that a DataFrame has exactly the columns of a schema and orders them as in the schema.
+
+    Args:
+        df (pd.DataFrame): The records to write.
+        schema (pa.Schema): The schema of the output.
+
+    Returns:
+        pd.DataFrame: The records with the columns in the order of the schema.
+
+    Raises:
+        ValueError: If columns of the schema are missing or columns not in the schema are present.
+    """
+    missing = [name for name in schema.names if name not in df.columns]
+    unexpected = [name for name in df.columns if name not in schema.names]
+    if missing or unexpected:
+        raise ValueError(f"Records do not match the output schema: missing columns {missing}, "
+                         f"unexpected columns {unexpected}")
+    return df[schema.names]
+
+
+class CsvSink:
+    """
+    Writes records to a CSV file named after the prefix and the timestamp of the run.
+
+    All the records written with the same timestamp are appended to the same file,
+    with the header written once. The file is listed in `files` once written.
+
+    Args:
+        path (str): The output directory.
+        prefix (str): The prefix of the file name, e.g. 'successful_applicants'.
+        timestamp (Optional[str]): The timestamp of the run in %Y%m%d-%H%M%S format. Defaults to now.
+        schema (Optional[pa.Schema]): The schema the records must match. Only the columns are checked.
+
+    Example:
+        >>> sink = CsvSink('/successful_applicants', 'successful_applicants', '20220101-000000')
+        >>> sink.write(df)
+        2 records written to /successful_applicants/successful_applicants_20220101-000000.csv
+    """
+
+    def __init__(self, path: str, prefix: str, timestamp: Optional[str] = None, schema: Optional[pa.Schema] = None):
+        self.timestamp = timestamp or time.strftime("%Y%m%d-%H%M%S")
+        self.filename = f"{path}/{prefix}_{self.timestamp}.csv"
+        self.schema = schema
+        self.files = []
+
+    def write(self, df: pd.DataFrame):
+        """Appends the records to the CSV file of the run."""
+        if self.schema is not None:
+            df = conform_to_schema(df, self.schema)
+        df.to_csv(self.filename, index=False, mode='a', header=not os.path.exists(self.filename))
+        if self.filename not in self.files:
+            self.files.append(self.filename)
+        print(f"{len(df)} records written to {self.filename}")
+
+
+class ParquetSink:
+    """
+    Writes records to compressed Parquet files, partitioned Hive-style by ingestion date
+    and optionally by columns of the records, e.g.
+    <path>/<prefix>/ingestion_date=2022-01-01/validate_check=below_18/<prefix>_<timestamp>_00000.parquet
+
+    Each call to write adds new files to the partitions it touches, so the batches of a run
+    never overwrite each other. The partition columns are stored in the directory names
+    only, and are restored by readers of the dataset such as pd.read_parquet(<path>/<prefix>).
+    The files written are listed in `files`.
+
+    Args:
+        path (str): The output directory.
+        prefix (str): The name of the dataset, e.g. 'unsuccessful_applicants'.
+        timestamp (Optional[str]): The timestamp of the run in %Y%m%d-%H%M%S format. Defaults to now.
+        schema (Optional[pa.Schema]): The schema the records are cast to. Records with missing or
+            unexpected columns, or values which cannot be cast safely, are rejected.
+        partition_cols (Optional[List[str]]): The columns of the records to partition by, after the ingestion date.
+        compression (str): The compression codec. Defaults to PARQUET_COMPRESSION.
+        row_group_size (int): The maximum number of rows of a row group. Defaults to PARQUET_ROW_GROUP_SIZE.
+
+    Example:
+        >>> sink = ParquetSink('/unsuccessful_applicants', 'unsuccessful_applicants', '20220101-000000',
+        ...                    schema=UNSUCCESSFUL_SCHEMA, partition_cols=['validate_check'])
+        >>> sink.write(invalid_df)
+    """
+
+    def __init__(self, path: str, prefix: str, timestamp: Optional[str] = None, schema: Optional[pa.Schema] = None,
+                 partition_cols: Optional[List[str]] = None, compression: str = PARQUET_COMPRESSION,
+                 row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+        self.timestamp = timestamp or time.strftime("%Y%m%d-%H%M%S")
+        self.prefix = prefix
+        self.path = os.path.join(path, prefix)
+        self.schema = schema
+        self.partition_cols = list(partition_cols or [])
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.ingestion_date = datetime.strptime(self.timestamp, "%Y%m%d-%H%M%S").strftime("%Y-%m-%d")
+        self._parts = 0
+        self.files = []
+
+    def _to_table(self, df: pd.DataFrame) -> pa.Table:
+        if self.schema is None:
+            return pa.Table.from_pandas(df, preserve_index=False)
+        df = conform_to_schema(df, self.schema)
+        # cast after the conversion so that e.g. integer mobile numbers are stored as strings
+        return pa.Table.from_pandas(df, preserve_index=False).cast(self.schema)
+
+    def _partition_path(self, values: tuple) -> str:
+        path = os.path.join(self.path, f'{INGESTION_DATE}={self.ingestion_date}')
+        for name, value in zip(self.partition_cols, values):
+            value = re.sub(r'[^\w.-]', '_', str(value))
+            path = os.path.join(path, f'{name}={value}')
+        return path
+
+    def write(self, df: pd.DataFrame) -> Dict[str, int]:
+        """
+        Writes the records to their partitions.
+
+        Returns:
+            Dict[str, int]: The number of records written to each partition directory.
+        """
+        written = {}
+        if len(df) == 0:
+            return written
+        if self.partition_cols:
+            groups = df.groupby(self.partition_cols, sort=True, dropna=False)
+        else:
+            groups = [((), df)]
+        for values, group_df in groups:
+            if not isinstance(values, tuple):
+                values = (values,)
+            table = self._to_table(group_df)
+            table = table.select([name for name in table.column_names if name not in self.partition_cols])
+            partition_path = self._partition_path(values)
+            os.makedirs(partition_path, exist_ok=True)
+            filename = os.path.join(partition_path, f'{self.prefix}_{self.timestamp}_{self._parts:05d}.parquet')
+            pq.write_table(table, filename, compression=self.compression, row_group_size=self.row_group_size)
+            self.files.append(filename)
+            self._parts += 1
+            written[partition_path] = len(group_df)
+        print(f"{len(df)} records written to {len(written)} partitions of {self.path}")
+        return written
+
+
+SINKS = {
+  'csv': CsvSink,
+  'parquet': ParquetSink,
+}
+
+
+def make_sink(output_format: str, path: str, prefix: str, timestamp: Optional[str] = None,
+              schema: Optional[pa.Schema] = None, partition_cols: Optional[List[str]] = None):
+    """
+    Creates the sink of an output in the given format.
+
+    Args:
+        output_format (str): 'csv' or 'parquet'.
+        path (str): The output directory.
+        prefix (str): The name of the output.
+        timestamp (Optional[str]): The timestamp of the run in %Y%m%d-%H%M%S format. Defaults to now.
+        schema (Optional[pa.Schema]): The schema of the output.
+        partition_cols (Optional[List[str]]): The columns to partition by. Only used by the Parquet sink,
+            as a CSV output is a single file per run.
+
+    Returns:
+        CsvSink or ParquetSink: The sink, whose write method takes a DataFrame.
+
+    Raises:
+        ValueError: If the output format is not supported.
+    """
+    if output_format not in SINKS:
+        raise ValueError(f"Unknown output format: {output_format}. Supported formats: {list(SINKS)}")
+    if output_format == 'parquet':
+        return ParquetSink(path, prefix, timestamp, schema, partition_cols)
+    return CsvSink(path, prefix, timestamp, schema)
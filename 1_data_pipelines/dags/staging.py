@@ -0,0 +1,75 @@
+from typing import Dict, Iterable, Iterator
+import os
+import re
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class StagingStore:
+    """
+    Local storage for the records passed between the tasks of a DAG run.
+
+    Each dataset is written as a directory of Parquet part files under a directory
+    of its own for the run, so that only a small summary of it has to go through XCom.
+
+    Args:
+        root (str): The staging directory shared by all the DAG runs.
+        run_id (str): The id of the DAG run.
+
+    Example:
+        >>> staging = StagingStore('/staging', context['run_id'])
+        >>> staged = staging.write('raw_data', frames)
+        >>> for df in read_staged(staged):
+        ...     print(len(df))
+    """
+
+    def __init__(self, root: str, run_id: str):
+        self.path = os.path.join(root, re.sub(r'[^\w.-]', '_', run_id))
+
+    def write(self, name: str, frames: Iterable[pd.DataFrame]) -> Dict:
+        """
+        Writes the DataFrames as the part files of a dataset, replacing any previous
+        version of it, e.g. from a failed try of the task.
+
+        Args:
+            name (str): The name of the dataset.
+            frames (Iterable[pd.DataFrame]): The parts of the dataset. Empty parts are skipped.
+
+        Returns:
+            Dict: The path of the dataset with its number of rows and parts, to be pushed to XCom.
+        """
+        path = os.path.join(self.path, name)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        rows = 0
+        parts = 0
+        for df in frames:
+            if len(df) == 0:
+                continue
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            pq.write_table(table, os.path.join(path, f'part-{parts:05d}.parquet'))
+            rows += len(df)
+            parts += 1
+        print(f'{rows} records staged in {parts} parts to {path}')
+        return {'path': path, 'rows': rows, 'parts': parts}
+
+    def cleanup(self):
+        """Removes all the datasets of the run."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def read_staged(staged: Dict) -> Iterator[pd.DataFrame]:
+    """
+    Reads back a dataset written by StagingStore.write one part at a time.
+
+    Args:
+        staged (Dict): The summary of the dataset returned by StagingStore.write.
+
+    Returns:
+        Iterator[pd.DataFrame]: The parts of the dataset, in the order they were written.
+    """
+    for part in range(staged['parts']):
+        filename = os.path.join(staged['path'], f'part-{part:05d}.parquet')
+        yield pq.read_table(filename, memory_map=True).to_pandas()
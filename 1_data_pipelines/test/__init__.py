@@ -0,0 +1,14 @@
+import os
+import sys
+
+# The DAG modules import each other as top-level modules (e.g. `from staging import ...`)
+# as Airflow puts the dags folder on the path, so do the same for the tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dags'))
+# and the libraries are on the path of the Airflow containers
+for library in ['applicant_validation', 'pipeline_tracking', 'ecommerce_db']:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                    'libs', library))
+# the Lambda function of the cloud pipeline is tested here too, with S3 mocked by moto, after the DAG modules
+# on the path so that the modules it shares with them are imported from the same place
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             '2_databases', 'cloud_data_pipeline', 'terraform', 'src'))
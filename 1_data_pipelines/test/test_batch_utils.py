@@ -0,0 +1,192 @@
+import os
+import unittest
+import pandas as pd
+from applicant_validation.core import (has_correct_digits,
+                                       normalize_mobile_no,
+                                       identify_date_format,
+                                       format_date_of_birth,
+                                       is_above_age,
+                                       is_valid_email,
+                                       is_empty_name,
+                                       split_name,
+                                       get_hashed_date
+                                       )
+from applicant_validation.batch import (split_names,
+                                        format_dates_of_birth,
+                                        are_above_age,
+                                        have_correct_digits,
+                                        normalize_mobile_nos,
+                                        are_valid_emails,
+                                        are_empty_names,
+                                        preprocess_frame,
+                                        validate_frame,
+                                        transform_frame,
+                                        generate_membership_ids
+                                        )
+
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'source_data')
+
+
+def preprocess_row(record: dict) -> dict:
+    # Row-wise reference implementation of the preprocessing stage
+    first_name, last_name = split_name(record['name'])
+    date_of_birth = format_date_of_birth(record['date_of_birth'], identify_date_format(record['date_of_birth']))
+    return {'first_name': first_name,
+            'last_name': last_name,
+            'email': record['email'],
+            'date_of_birth': date_of_birth,
+            'mobile_no': record['mobile_no'],
+            'above_18': is_above_age(date_of_birth, 18)}
+
+
+def validate_row(record: dict) -> str:
+    # Row-wise reference implementation of the validation stage
+    if not has_correct_digits(record['mobile_no'], 8):
+        return 'invalid_mobile_number'
+    if not record['above_18']:
+        return 'below_18'
+    if not is_valid_email(record['email']):
+        return 'invalid_email'
+    if is_empty_name(record['first_name']) and is_empty_name(record['last_name']):
+        return 'missing_name'
+    return 'valid'
+
+
+class TestSplitNames(unittest.TestCase):
+    def test_matches_split_name(self):
+        names = ['Dr. Jane Doe Sr.', 'John Smith III', 'Mrs. Emily Brown', 'David Lee', 'Madonna',
+                 'Mr. Larry Grimes MD', 'Mary  Ann   Lee', ' Jane Doe ', 'Jr. Smith', 'Dr. Jr.', '', '   ']
+        first_names, last_names = split_names(pd.Series(names))
+        for name, first_name, last_name in zip(names, first_names, last_names):
+            self.assertEqual((first_name, last_name), split_name(name), name)
+
+    def test_missing_name(self):
+        first_names, last_names = split_names(pd.Series([None], dtype=object))
+        self.assertEqual((first_names[0], last_names[0]), ('', ''))
+
+
+class TestFormatDatesOfBirth(unittest.TestCase):
+    def test_matches_format_date_of_birth(self):
+        dates = ['2022-05-11', '11-05-2022', '2022/05/11', '11/05/2022', '20220511', '11052022',
+                 '05-31-2022', '05312022', '05/31/2022', '11/05/2022']
+        expected = [format_date_of_birth(d, identify_date_format(d)) for d in dates]
+        self.assertEqual(format_dates_of_birth(pd.Series(dates)).tolist(), expected)
+
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError):
+            format_dates_of_birth(pd.Series(['May 11, 2022']))
+
+
+class TestAreAboveAge(unittest.TestCase):
+    def test_matches_is_above_age(self):
+        dates = ['20040111', '20040112', '20040229', '19991231', '20100101']
+        for cutoff in ['2022-01-11', '2022-02-28', '2022-03-01']:
+            expected = [is_above_age(d, 18, cutoff) for d in dates]
+            self.assertEqual(are_above_age(pd.Series(dates), 18, cutoff).tolist(), expected)
+
+    def test_invalid_dob(self):
+        with self.assertRaises(ValueError):
+            are_above_age(pd.Series(['01/11/2004']), 18)
+
+
+class TestHaveCorrectDigits(unittest.TestCase):
+    def test_integers(self):
+        self.assertEqual(have_correct_digits(pd.Series([12345678, 1234567890, 1234567])).tolist(),
+                         [True, False, False])
+
+    def test_strings(self):
+        self.assertEqual(have_correct_digits(pd.Series(['12345678', '1234 5678'])).tolist(), [True, False])
+
+    def test_matches_has_correct_digits(self):
+        # Integers are checked arithmetically, strings by their lengths and other values as strings
+        for numbers in [[0, 1, 9, 10, 9999999, 10000000, 99999999, 100000000, 2 ** 63 - 1],
+                        [-1234567, 12345678, 123], ['01234567', '1234 5678', None], [12345678.0, float('nan')]]:
+            for num_digits in [1, 7, 8, 19, 20]:
+                self.assertEqual(have_correct_digits(pd.Series(numbers), num_digits).tolist(),
+                                 [has_correct_digits(number, num_digits) for number in numbers])
+
+
+class TestNormalizeMobileNos(unittest.TestCase):
+    def test_matches_normalize_mobile_no(self):
+        for numbers in [[12345678, 1234567], ['01234567', '1234 5678'], [12345678.0, None]]:
+            self.assertEqual(normalize_mobile_nos(pd.Series(numbers)).tolist(),
+                             [normalize_mobile_no(number) for number in numbers])
+
+    def test_types(self):
+        # Integers read by pandas must be checked as the strings read by csv.DictReader
+        self.assertEqual(normalize_mobile_nos(pd.Series([12345678, 1234567])).tolist(), ['12345678', '1234567'])
+        self.assertEqual(normalize_mobile_nos(pd.Series([12345678, None])).tolist(), ['12345678', None])
+
+
+class TestAreValidEmails(unittest.TestCase):
+    def test_default_suffixes(self):
+        emails = ['john.doe@example.com', 'jane.doe@example.net', '', 'john.doe@example',
+                  'john.doe@example.org', 'john.doe.example.com', 'john.doe@example.com\n']
+        self.assertEqual(are_valid_emails(pd.Series(emails)).tolist(), [is_valid_email(e) for e in emails])
+
+    def test_custom_suffixes(self):
+        emails = ['john.doe@example.org', 'jane.doe@example.io', 'john.doe@example.com']
+        self.assertEqual(are_valid_emails(pd.Series(emails), suffixes=['.org', '.io']).tolist(),
+                         [True, True, False])
+
+
+class TestAreEmptyNames(unittest.TestCase):
+    def test_empty_names(self):
+        self.assertEqual(are_empty_names(pd.Series(['', None, '  ', 'John Doe'], dtype=object)).tolist(),
+                         [True, True, True, False])
+
+
+class TestGenerateMembershipIds(unittest.TestCase):
+    def test_matches_get_hashed_date(self):
+        last_names = pd.Series(['Smith', 'Wang', 'Estrada', 'Smith'], index=[3, 5, 7, 9])
+        dates = pd.Series(['19750827', '19600311', '19921015', '19750827'], index=[3, 5, 7, 9])
+        membership_ids = generate_membership_ids(last_names, dates)
+        self.assertEqual(membership_ids.tolist(), ['Smith_c7677', 'Wang_04168', 'Estrada_0bf5b', 'Smith_c7677'])
+        self.assertEqual(membership_ids.tolist(),
+                         ['_'.join([n, get_hashed_date(d)]) for n, d in zip(last_names, dates)])
+        self.assertEqual(membership_ids.index.tolist(), [3, 5, 7, 9])
+
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError):
+            generate_membership_ids(pd.Series(['Smith']), pd.Series(['2022-12-25']))
+
+    def test_skip_validation(self):
+        membership_ids = generate_membership_ids(pd.Series(['Smith']), pd.Series(['20220101']), validate=False)
+        self.assertEqual(membership_ids.tolist(), ['Smith_23024'])
+
+
+class TestPipelineFrames(unittest.TestCase):
+    def test_matches_row_wise_pipeline(self):
+        # The column-wise stages should give the same partitions as the row-wise functions
+        for file in sorted(os.listdir(SOURCE_DIR)):
+            df = pd.read_csv(os.path.join(SOURCE_DIR, file))
+            expected = [preprocess_row(record) for record in df.to_dict('records')]
+            preprocessed = preprocess_frame(df)
+            self.assertEqual(preprocessed.to_dict('records'), expected)
+
+            checks = [validate_row(record) for record in expected]
+            valid_df, invalid_df = validate_frame(preprocessed)
+            self.assertEqual(valid_df.to_dict('records'),
+                             [record for record, check in zip(expected, checks) if check == 'valid'])
+            self.assertEqual(invalid_df.to_dict('records'),
+                             [dict(record, validate_check=check)
+                              for record, check in zip(expected, checks) if check != 'valid'])
+
+    def test_missing_name(self):
+        df = pd.DataFrame([{'name': '', 'email': 'a@b.com', 'date_of_birth': '1990-01-01', 'mobile_no': 12345678}])
+        valid_df, invalid_df = validate_frame(preprocess_frame(df))
+        self.assertTrue(valid_df.empty)
+        self.assertEqual(invalid_df['validate_check'].tolist(), ['missing_name'])
+
+    def test_transform_frame(self):
+        df = pd.DataFrame([{'first_name': 'Patty', 'last_name': 'Smith', 'date_of_birth': '19750827'},
+                           {'first_name': 'Sean', 'last_name': 'Wang', 'date_of_birth': '19600311'}])
+        transformed_df = transform_frame(df)
+        self.assertEqual(transformed_df['membership_id'].tolist(),
+                         ['Smith_' + get_hashed_date('19750827'), 'Wang_' + get_hashed_date('19600311')])
+        self.assertNotIn('membership_id', df.columns)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from dags.csv_files import iter_csv_batches, iter_csv_frames, write_dict_to_csv
+
+
+HEADER = 'name,email,date_of_birth,mobile_no\n'
+
+
+class TestIterCsvBatches(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_source(self, rows: int) -> str:
+        filename = os.path.join(self.tmp_dir.name, 'applications.csv')
+        with open(filename, 'w') as f:
+            f.write(HEADER)
+            for i in range(rows):
+                f.write(f'Applicant {i},applicant{i}@x.com,1990-01-01,0{i:07d}\n')
+        return filename
+
+    def test_exact_multiple_of_batch_size(self):
+        batches = list(iter_csv_batches(self.write_source(6), batch_size=3))
+        self.assertEqual([len(batch) for batch in batches], [3, 3])
+        self.assertEqual(batches[1][0]['name'], 'Applicant 3')
+
+    def test_short_last_batch(self):
+        batches = list(iter_csv_batches(self.write_source(7), batch_size=3))
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 1])
+        self.assertEqual(batches[-1][0]['name'], 'Applicant 6')
+
+    def test_values_are_read_as_strings(self):
+        # Test that the mobile numbers keep their leading zeros
+        batches = list(iter_csv_batches(self.write_source(2), batch_size=3))
+        self.assertEqual([record['mobile_no'] for record in batches[0]], ['00000000', '00000001'])
+
+    def test_file_without_records(self):
+        self.assertEqual(list(iter_csv_batches(self.write_source(0), batch_size=3)), [])
+
+    def test_empty_file(self):
+        filename = os.path.join(self.tmp_dir.name, 'applications.csv')
+        open(filename, 'w').close()
+        self.assertEqual(list(iter_csv_frames(filename, batch_size=3)), [])
+
+
+class TestWriteDictToCsv(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_append_does_not_repeat_header(self):
+        write_dict_to_csv([{'name': 'Jane Doe', 'mobile_no': '01234567'}], self.tmp_dir.name, 'raw_data', 'run')
+        write_dict_to_csv([{'name': 'John Smith', 'mobile_no': '76543210'}], self.tmp_dir.name, 'raw_data', 'run')
+        with open(os.path.join(self.tmp_dir.name, 'raw_data_run.csv')) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines, ['name,mobile_no', 'Jane Doe,01234567', 'John Smith,76543210'])
+
+    def test_other_timestamp_writes_other_file(self):
+        write_dict_to_csv([{'name': 'Jane Doe'}], self.tmp_dir.name, 'raw_data', 'run_1')
+        write_dict_to_csv([{'name': 'John Smith'}], self.tmp_dir.name, 'raw_data', 'run_2')
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ['raw_data_run_1.csv', 'raw_data_run_2.csv'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,318 @@
+import contextlib
+import io
+import os
+import types
+import unittest
+from unittest import mock
+from urllib.parse import quote_plus
+
+try:
+    # moto patches the clients created after it is imported, so it is imported before the function
+    from moto import mock_aws
+except ImportError:
+    raise unittest.SkipTest('the tests of the Lambda function need moto')
+from botocore.exceptions import ClientError
+
+# environment of the function, with fake credentials so that no request can reach AWS
+os.environ.update({'BUCKET_NAME': 'test-bucket', 'AWS_DEFAULT_REGION': 'ap-southeast-1',
+                   'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing'})
+import main  # noqa: E402
+
+
+class TestIterCsvBatches(unittest.TestCase):
+    LINES = ['name,email\n'] + [f'Applicant {i},applicant{i}@x.com\n' for i in range(7)]
+
+    def test_exact_multiple_of_batch_size(self):
+        batches = list(main.iter_csv_batches(self.LINES[:7], batch_size=3))
+        self.assertEqual([len(batch) for batch in batches], [3, 3])
+        self.assertEqual(batches[1][0], {'name': 'Applicant 3', 'email': 'applicant3@x.com'})
+
+    def test_short_last_batch(self):
+        batches = list(main.iter_csv_batches(self.LINES, batch_size=3))
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 1])
+        self.assertEqual(batches[-1][0]['name'], 'Applicant 6')
+
+    def test_file_without_records(self):
+        self.assertEqual(list(main.iter_csv_batches(self.LINES[:1], batch_size=3)), [])
+
+    def test_empty_file(self):
+        self.assertEqual(list(main.iter_csv_batches([], batch_size=3)), [])
+
+    def test_lines_of_a_shard_with_fieldnames(self):
+        # Test that the lines of a shard after the first one are read with the header of the file
+        batches = list(main.iter_csv_batches(self.LINES[4:], fieldnames=['name', 'email'], batch_size=3))
+        self.assertEqual([len(batch) for batch in batches], [3, 1])
+        self.assertEqual(batches[0][0]['name'], 'Applicant 3')
+
+
+BUCKET_NAME = os.environ['BUCKET_NAME']
+
+# applications with every other mobile number too short, so that both outputs get records
+APPLICATIONS = ['name,email,date_of_birth,mobile_no\r\n'] + [
+  f'Applicant {i},applicant{i}@x.com,1990-01-{i % 28 + 1:02d},{12345678 if i % 2 else 1234567}\r\n'
+  for i in range(40)]
+
+
+def notification(key: str, bucket_name: str = BUCKET_NAME) -> dict:
+    return {'Records': [{'eventName': 'ObjectCreated:Put',
+                         's3': {'bucket': {'name': bucket_name}, 'object': {'key': quote_plus(key)}}}]}
+
+
+class LambdaTestCase(unittest.TestCase):
+    def setUp(self):
+        # the mock is started here, as decorating the test classes would not cover the setUp they inherit
+        mock = mock_aws()
+        mock.start()
+        self.addCleanup(mock.stop)
+        self.s3 = main.get_client()
+        self.s3.create_bucket(Bucket=BUCKET_NAME,
+                              CreateBucketConfiguration={'LocationConstraint': os.environ['AWS_DEFAULT_REGION']})
+
+    def upload(self, key: str, body: bytes) -> dict:
+        self.s3.put_object(Bucket=BUCKET_NAME, Key=key, Body=body)
+        return main.head_object(BUCKET_NAME, key)
+
+    def read(self, key: str) -> str:
+        return self.s3.get_object(Bucket=BUCKET_NAME, Key=key)['Body'].read().decode('utf-8')
+
+    def keys(self, prefix: str) -> list:
+        return sorted(obj['Key'] for obj in main.list_keys(BUCKET_NAME, prefix))
+
+    def invoke(self, event: dict, request_id: str = None):
+        context = types.SimpleNamespace(aws_request_id=request_id) if request_id else None
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.lambda_handler(event, context)
+
+
+class TestArchiveObjects(LambdaTestCase):
+    def test_changed_file_does_not_replace_archived_copy(self):
+        first = self.upload('source_data/applications.csv', b'name\nJane Doe\n')
+        main.archive_objects(BUCKET_NAME, [first])
+        second = self.upload('source_data/applications.csv', b'name\nJohn Smith\n')
+        main.archive_objects(BUCKET_NAME, [second])
+        self.assertEqual(self.keys('archive/'), sorted([main.archive_key(first), main.archive_key(second)]))
+        self.assertEqual(self.keys('source_data/'), [])
+
+
+class TestShardRanges(LambdaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.body = ''.join(APPLICATIONS).encode('utf-8')
+        self.obj = self.upload('source_data/applications.csv', self.body)
+        self.fieldnames, self.header_size = main.read_header(BUCKET_NAME, self.obj)
+
+    def test_read_header(self):
+        self.assertEqual(self.fieldnames, ['name', 'email', 'date_of_birth', 'mobile_no'])
+        self.assertEqual(self.header_size, len(APPLICATIONS[0]))
+
+    def test_find_line_start_mid_line(self):
+        second_line = self.body.index(b'Applicant 1,')
+        self.assertEqual(main.find_line_start(BUCKET_NAME, self.obj, second_line - 5), second_line)
+
+    def test_find_line_start_at_line_start(self):
+        second_line = self.body.index(b'Applicant 1,')
+        self.assertEqual(main.find_line_start(BUCKET_NAME, self.obj, second_line), second_line)
+
+    def test_find_line_start_on_crlf(self):
+        # Test that an offset between the '\r' and the '\n' of a line break, or on the '\r', moves past the '\n'
+        second_line = self.body.index(b'Applicant 1,')
+        self.assertEqual(main.find_line_start(BUCKET_NAME, self.obj, second_line - 1), second_line)
+        self.assertEqual(main.find_line_start(BUCKET_NAME, self.obj, second_line - 2), second_line)
+
+    def test_find_line_start_in_small_chunks(self):
+        second_line = self.body.index(b'Applicant 1,')
+        self.assertEqual(main.find_line_start(BUCKET_NAME, self.obj, self.header_size + 1, chunk_size=4),
+                         second_line)
+
+    def test_find_line_start_in_last_line(self):
+        obj = self.upload('source_data/no_final_line_break.csv', b'name\nJane Doe\nJohn Smith')
+        self.assertEqual(main.find_line_start(BUCKET_NAME, obj, obj['Size'] - 3), obj['Size'])
+
+    def test_one_shard(self):
+        self.assertEqual(main.shard_ranges(BUCKET_NAME, self.obj, self.header_size, shard_size=self.obj['Size']),
+                         [(self.header_size, self.obj['Size'])])
+        self.assertEqual(main.shard_ranges(BUCKET_NAME, self.obj, self.header_size, shard_size=0),
+                         [(self.header_size, self.obj['Size'])])
+
+    def test_several_shards(self):
+        ranges = main.shard_ranges(BUCKET_NAME, self.obj, self.header_size, shard_size=200)
+        self.assertGreater(len(ranges), 1)
+        # the shards follow each other, start at a line and cover all the records
+        self.assertEqual(ranges[0][0], self.header_size)
+        self.assertEqual(ranges[-1][1], self.obj['Size'])
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(self.body[start - 2:start], b'\r\n')
+        self.assertEqual(b''.join(self.body[start:end] for start, end in ranges), self.body[self.header_size:])
+
+    def test_shards_smaller_than_a_line(self):
+        # Test that no shard is empty when several boundaries fall in the same line
+        ranges = main.shard_ranges(BUCKET_NAME, self.obj, self.header_size, shard_size=7)
+        self.assertEqual(len(ranges), len(APPLICATIONS) - 1)
+        self.assertTrue(all(end > start for start, end in ranges))
+
+
+class TestUpdateManifest(LambdaTestCase):
+    def mark(self, name: str):
+        return lambda manifest: manifest.mark(name, 'processed', content_hash=name)
+
+    def test_first_update_creates_manifest(self):
+        with mock.patch.object(self.s3, 'put_object', wraps=self.s3.put_object) as put:
+            main.update_manifest(BUCKET_NAME, self.mark('source_data/a.csv'))
+        self.assertEqual(put.call_args.kwargs['IfNoneMatch'], '*')
+        self.assertEqual(list(main.load_manifest(BUCKET_NAME).entries), ['source_data/a.csv'])
+
+    def test_update_is_applied_again_when_manifest_changed(self):
+        # Test that an update racing with another invocation is retried on the new version with IfMatch
+        main.update_manifest(BUCKET_NAME, self.mark('source_data/a.csv'))
+        updates = []
+
+        def update(manifest):
+            if not updates:
+                main.update_manifest(BUCKET_NAME, self.mark('source_data/b.csv'))
+            updates.append(sorted(manifest.entries))
+            self.mark('source_data/c.csv')(manifest)
+
+        with mock.patch.object(self.s3, 'put_object', wraps=self.s3.put_object) as put:
+            main.update_manifest(BUCKET_NAME, update)
+        self.assertEqual(updates, [['source_data/a.csv'], ['source_data/a.csv', 'source_data/b.csv']])
+        self.assertTrue(all('IfMatch' in call.kwargs for call in put.call_args_list))
+        self.assertEqual(sorted(main.load_manifest(BUCKET_NAME).entries),
+                         ['source_data/a.csv', 'source_data/b.csv', 'source_data/c.csv'])
+
+    def test_manifest_created_concurrently(self):
+        # Test that a manifest created by another invocation after it was found missing is not replaced
+        updates = []
+
+        def update(manifest):
+            if not updates:
+                main.update_manifest(BUCKET_NAME, self.mark('source_data/b.csv'))
+            updates.append(sorted(manifest.entries))
+            self.mark('source_data/a.csv')(manifest)
+
+        main.update_manifest(BUCKET_NAME, update)
+        self.assertEqual(updates, [[], ['source_data/b.csv']])
+        self.assertEqual(sorted(main.load_manifest(BUCKET_NAME).entries), ['source_data/a.csv', 'source_data/b.csv'])
+
+    def test_other_errors_are_raised(self):
+        error = ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'Access Denied'}}, 'PutObject')
+        with mock.patch.object(self.s3, 'put_object', side_effect=error):
+            with self.assertRaises(ClientError):
+                main.update_manifest(BUCKET_NAME, self.mark('source_data/a.csv'))
+
+
+class TestEventMode(LambdaTestCase):
+    def test_uploaded_file_is_processed_and_archived(self):
+        obj = self.upload('source_data/applications 1.csv', ''.join(APPLICATIONS).encode('utf-8'))
+        self.invoke(notification('source_data/applications 1.csv'))
+        raw_key, = self.keys('raw_data/')
+        self.assertEqual(len(self.read(raw_key).splitlines()), len(APPLICATIONS))
+        failed_key, = self.keys('unsuccessful_applicants/')
+        passed_key, = self.keys('successful_applicants/')
+        self.assertEqual(len(self.read(failed_key).splitlines()) + len(self.read(passed_key).splitlines()),
+                         len(APPLICATIONS) + 1)
+        entry = main.load_manifest(BUCKET_NAME).entries['source_data/applications 1.csv']
+        self.assertEqual((entry['status'], entry['rows']), ('processed', len(APPLICATIONS) - 1))
+        self.assertEqual(self.keys('source_data/'), [])
+        self.assertEqual(self.keys('archive/'), [main.archive_key(obj)])
+
+    def test_repeated_notification_is_skipped(self):
+        self.upload('source_data/applications.csv', ''.join(APPLICATIONS).encode('utf-8'))
+        self.invoke(notification('source_data/applications.csv'))
+        self.invoke(notification('source_data/applications.csv'))
+        self.assertEqual(len(self.keys('raw_data/')), 1)
+
+    def test_processed_content_under_another_key_is_archived(self):
+        self.upload('source_data/applications.csv', ''.join(APPLICATIONS).encode('utf-8'))
+        self.invoke(notification('source_data/applications.csv'))
+        copy = self.upload('source_data/applications_copy.csv', ''.join(APPLICATIONS).encode('utf-8'))
+        self.invoke(notification('source_data/applications_copy.csv'))
+        self.assertEqual(len(self.keys('raw_data/')), 1)
+        self.assertIn(main.archive_key(copy), self.keys('archive/'))
+
+    def test_other_files_are_ignored(self):
+        self.upload('source_data/notes.txt', b'not a csv')
+        self.upload('other/applications.csv', ''.join(APPLICATIONS).encode('utf-8'))
+        self.invoke(notification('source_data/notes.txt'))
+        self.invoke(notification('other/applications.csv'))
+        self.invoke(notification('source_data/applications.csv', bucket_name='other-bucket'))
+        self.assertEqual(self.keys('raw_data/'), [])
+        self.assertEqual(self.keys('archive/'), [])
+
+
+class TestShardedFile(LambdaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.obj = self.upload('source_data/applications.csv', ''.join(APPLICATIONS).encode('utf-8'))
+        shard_ranges = main.shard_ranges
+        with mock.patch.object(main, 'shard_ranges', lambda *args: shard_ranges(*args, shard_size=300)), \
+             mock.patch.object(main, 'invoke_shards') as invoke_shards:
+            self.invoke(notification('source_data/applications.csv'))
+        self.shards = invoke_shards.call_args.args[0]
+        self.run_id = self.shards[0]['run_id']
+
+    def test_file_is_split(self):
+        self.assertGreater(len(self.shards), 1)
+        self.assertEqual([shard['index'] for shard in self.shards], list(range(len(self.shards))))
+        self.assertTrue(all(shard['count'] == len(self.shards) for shard in self.shards))
+        # nothing is written or archived until the shards are processed
+        self.assertEqual(self.keys('raw_data/'), [])
+        self.assertEqual(self.keys('source_data/'), ['source_data/applications.csv'])
+
+    def test_last_shard_compacts_outputs(self):
+        for shard in reversed(self.shards):
+            self.invoke({'shard': shard})
+        raw = self.read(main.output_key(main.OUTPUT_RAW_PREFIX, self.run_id, 0))
+        self.assertEqual(raw.splitlines(), [line.rstrip('\r\n') for line in APPLICATIONS])
+        failed = self.read(main.output_key(main.OUTPUT_FAILED_PREFIX, self.run_id, 0)).splitlines()
+        passed = self.read(main.output_key(main.OUTPUT_PASSED_PREFIX, self.run_id, 0)).splitlines()
+        self.assertEqual(len(failed) - 1 + len(passed) - 1, len(APPLICATIONS) - 1)
+        self.assertEqual(main.load_manifest(BUCKET_NAME).entries['source_data/applications.csv']['rows'],
+                         len(APPLICATIONS) - 1)
+        self.assertEqual(self.keys(f'{main.SHARD_PREFIX}/'), [])
+        self.assertEqual(self.keys('archive/'), [main.archive_key(self.obj)])
+
+    def test_outputs_are_compacted_once(self):
+        # Test that a shard completing while another invocation holds the compacting marker does not compact
+        for shard in self.shards[:-1]:
+            self.invoke({'shard': shard})
+        self.s3.put_object(Bucket=BUCKET_NAME, Key=f'{main.SHARD_PREFIX}/{self.run_id}/compacting', Body=b'')
+        with mock.patch.object(main, 'compact_shards') as compact_shards:
+            self.invoke({'shard': self.shards[-1]})
+        compact_shards.assert_not_called()
+        self.assertEqual(len(self.keys(f'{main.SHARD_PREFIX}/{self.run_id}/done/')), len(self.shards))
+
+    def test_compaction_is_resumed_by_a_retry(self):
+        # Test that the retry of an invocation which failed while compacting takes the compacting marker over
+        for shard in self.shards[:-1]:
+            self.invoke({'shard': shard})
+        with mock.patch.object(main, 'compact_shards', side_effect=RuntimeError('timeout')):
+            with self.assertRaises(RuntimeError):
+                self.invoke({'shard': self.shards[-1]}, request_id='first')
+        with mock.patch.object(main, 'compact_shards') as compact_shards:
+            self.invoke({'shard': self.shards[0]}, request_id='other')
+        compact_shards.assert_not_called()
+        self.invoke({'shard': self.shards[-1]}, request_id='first')
+        self.assertEqual(self.keys(f'{main.SHARD_PREFIX}/'), [])
+        self.assertEqual(self.keys('archive/'), [main.archive_key(self.obj)])
+
+    def test_compaction_is_taken_over_after_the_lease(self):
+        for shard in self.shards[:-1]:
+            self.invoke({'shard': shard})
+        self.s3.put_object(Bucket=BUCKET_NAME, Key=f'{main.SHARD_PREFIX}/{self.run_id}/compacting', Body=b'')
+        with mock.patch.object(main, 'COMPACTION_LEASE', -1):
+            self.invoke({'shard': self.shards[-1]})
+        self.assertEqual(self.keys(f'{main.SHARD_PREFIX}/'), [])
+        self.assertEqual(len(self.read(main.output_key(main.OUTPUT_RAW_PREFIX, self.run_id, 0)).splitlines()),
+                         len(APPLICATIONS))
+
+    def test_shards_completing_before_the_last_do_not_compact(self):
+        with mock.patch.object(main, 'compact_shards') as compact_shards:
+            for shard in self.shards[:-1]:
+                self.invoke({'shard': shard})
+        compact_shards.assert_not_called()
+        self.assertNotIn(f'{main.SHARD_PREFIX}/{self.run_id}/compacting', self.keys(f'{main.SHARD_PREFIX}/'))
+
+
+if __name__ == '__main__':
+    unittest.main()
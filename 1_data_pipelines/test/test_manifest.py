@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from pipeline_tracking.manifest import FileManifest, archive_name, file_sha256
+
+
+class TestFileManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'archive', 'manifest.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_missing_manifest(self):
+        self.assertEqual(FileManifest.load(self.path).entries, {})
+
+    def test_save_and_load(self):
+        manifest = FileManifest()
+        manifest.mark('applications_dataset_1.csv', 'processed', size=10, mtime=1.5, content_hash='abc', rows=2)
+        manifest.save(self.path)
+        entry = FileManifest.load(self.path).entries['applications_dataset_1.csv']
+        self.assertEqual((entry['status'], entry['size'], entry['rows']), ('processed', 10, 2))
+
+    def test_only_processed_files_are_skipped(self):
+        manifest = FileManifest()
+        manifest.mark('applications_dataset_1.csv', 'ingested', size=10, mtime=1.5, content_hash='abc')
+        self.assertFalse(manifest.is_unchanged('applications_dataset_1.csv', 10, 1.5))
+        self.assertFalse(manifest.is_processed('abc'))
+
+        manifest.mark('applications_dataset_1.csv', 'processed')
+        self.assertTrue(manifest.is_unchanged('applications_dataset_1.csv', 10, 1.5))
+        self.assertTrue(manifest.is_processed('abc'))
+
+    def test_changed_file_is_not_skipped(self):
+        manifest = FileManifest()
+        manifest.mark('applications_dataset_1.csv', 'processed', size=10, mtime=1.5, content_hash='abc')
+        self.assertFalse(manifest.is_unchanged('applications_dataset_1.csv', 11, 2.5))
+        self.assertFalse(manifest.is_processed('def'))
+
+
+class TestArchiveName(unittest.TestCase):
+    def test_archive_name(self):
+        self.assertEqual(archive_name('applications_dataset_1.csv', '9f86d081884c7d659a2feaa0c55ad015'),
+                         'applications_dataset_1.9f86d081884c7d65.csv')
+
+    def test_changed_file_is_archived_under_another_name(self):
+        self.assertNotEqual(archive_name('source_data/applications.csv', '9f86d081884c7d659a2feaa0c55ad015'),
+                            archive_name('source_data/applications.csv', '60303ae22b998861bce3b28f33eec1be'))
+
+
+class TestFileSha256(unittest.TestCase):
+    def test_file_sha256(self):
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(b'20220101')
+        try:
+            # Same hash as get_hashed_date, which hashes the same bytes
+            self.assertTrue(file_sha256(f.name, block_size=3).startswith('23024'))
+        finally:
+            os.remove(f.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import io
+import os
+import tempfile
+import unittest
+import pandas as pd
+from ecommerce_db.members import iter_member_files, load_members, read_csv_header
+
+
+# the loading test needs a database, e.g. PIPELINE_MEMBERS_DSN="host=localhost dbname=ecommerce user=postgres"
+MEMBERS_DSN = os.getenv('PIPELINE_MEMBERS_DSN')
+
+SUCCESSFUL_DF = pd.DataFrame({
+  'first_name': ['Jane', 'John', 'Jane'],
+  'last_name': ['Doe', 'Smith', 'Doe'],
+  'email': ['jane@doe.com', 'john@smith.net', 'jane.doe@doe.com'],
+  'date_of_birth': ['19900101', '19910101', '19900101'],
+  'mobile_no': ['12345678', '87654321', '12345678'],
+  'above_18': [True, True, True],
+  'membership_id': ['Doe_1a2b3', 'Smith_4c5d6', 'Doe_1a2b3'],
+})
+
+
+class TestMemberFiles(unittest.TestCase):
+    def test_read_csv_header(self):
+        f = io.BytesIO(b'first_name,email,membership_id\nJane,jane@doe.com,Doe_1a2b3\n')
+        self.assertEqual(read_csv_header(f), ['first_name', 'email', 'membership_id'])
+        # the file is left at the first record, for COPY
+        self.assertEqual(f.read(), b'Jane,jane@doe.com,Doe_1a2b3\n')
+
+    def test_read_csv_header_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            read_csv_header(io.BytesIO(b'name,email,date_of_birth,mobile_no\n'))
+        with self.assertRaises(ValueError):
+            read_csv_header(io.BytesIO(b'first_name,email\n'))
+
+    def test_iter_member_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dataset = os.path.join(tmp_dir, 'successful_applicants')
+            for partition in ['ingestion_date=2022-01-02', 'ingestion_date=2022-01-01']:
+                os.makedirs(os.path.join(dataset, partition))
+                open(os.path.join(dataset, partition, 'part-0.parquet'), 'w').close()
+            open(os.path.join(dataset, '_SUCCESS'), 'w').close()
+            self.assertEqual(list(iter_member_files(['a.csv', dataset])), [
+              'a.csv',
+              os.path.join(dataset, 'ingestion_date=2022-01-01', 'part-0.parquet'),
+              os.path.join(dataset, 'ingestion_date=2022-01-02', 'part-0.parquet'),
+            ])
+
+
+@unittest.skipUnless(MEMBERS_DSN, 'PIPELINE_MEMBERS_DSN is not set')
+class TestLoadMembers(unittest.TestCase):
+    def setUp(self):
+        import psycopg2
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.connection = psycopg2.connect(MEMBERS_DSN)
+        # a temporary members table hides the real one for the session of the test
+        with self.connection, self.connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TEMPORARY TABLE members (
+                  membership_id VARCHAR(255) PRIMARY KEY,
+                  first_name VARCHAR(255) NOT NULL,
+                  last_name VARCHAR(255) NOT NULL,
+                  email VARCHAR(255) NOT NULL,
+                  date_of_birth DATE,
+                  mobile_no VARCHAR(20),
+                  created_at TIMESTAMP DEFAULT now(),
+                  updated_at TIMESTAMP DEFAULT now()
+                )
+            """)
+
+    def tearDown(self):
+        self.connection.close()
+        self.tmp_dir.cleanup()
+
+    def fetch_members(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT membership_id, email, date_of_birth::text FROM members ORDER BY membership_id")
+            return cursor.fetchall()
+
+    def test_load_csv_and_parquet(self):
+        csv_file = os.path.join(self.tmp_dir.name, 'successful_applicants.csv')
+        SUCCESSFUL_DF.to_csv(csv_file, index=False)
+        counts = load_members(self.connection, [csv_file])
+        self.assertEqual(counts, {'staged': 3, 'inserted': 2, 'updated': 0})
+        # the last record of a member wins
+        self.assertEqual(self.fetch_members(), [('Doe_1a2b3', 'jane.doe@doe.com', '1990-01-01'),
+                                                ('Smith_4c5d6', 'john@smith.net', '1991-01-01')])
+
+        # loading the same members again changes nothing, and only changed members are updated
+        parquet_file = os.path.join(self.tmp_dir.name, 'successful_applicants.parquet')
+        SUCCESSFUL_DF.iloc[1:].assign(email=['john@smith.com', 'jane.doe@doe.com']).to_parquet(parquet_file)
+        counts = load_members(self.connection, [parquet_file])
+        self.assertEqual(counts, {'staged': 2, 'inserted': 0, 'updated': 1})
+        self.assertEqual(self.fetch_members()[1], ('Smith_4c5d6', 'john@smith.com', '1991-01-01'))
+
+
+if __name__ == '__main__':
+    unittest.main()
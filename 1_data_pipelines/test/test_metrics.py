@@ -0,0 +1,80 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from pipeline_tracking.metrics import MetricsRecorder
+
+
+class TestMetricsRecorder(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MetricsRecorder('data_pipeline', 'run1', task='validation')
+        # Test that the metrics of a stage run once per batch are summed
+        for checks in [['invalid_mobile_number', 'below_18'], ['invalid_mobile_number']]:
+            with self.metrics.stage('validation') as stage:
+                stage.add_rows(rows_in=5, rows_out=5 - len(checks))
+                stage.add_rejections(checks)
+
+    def test_stage(self):
+        values = self.metrics.to_dict()['stages']['validation']
+        self.assertEqual((values['rows_in'], values['rows_out']), (10, 7))
+        self.assertEqual(values['rejections'],
+                         {'invalid_mobile_number': 2, 'below_18': 1, 'invalid_email': 0, 'missing_name': 0})
+        self.assertGreater(values['wall_seconds'], 0)
+        self.assertGreater(values['peak_rss_bytes'], 0)
+
+    def test_stage_records_time_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.metrics.stage('transformation'):
+                raise ValueError
+        self.assertGreater(self.metrics.stages['transformation'].wall_seconds, 0)
+
+    def test_iter_stage(self):
+        batches = list(self.metrics.iter_stage('ingestion', [[1, 2], [3]]))
+        self.assertEqual(batches, [[1, 2], [3]])
+        self.assertEqual(self.metrics.stages['ingestion'].rows_in, 3)
+
+    def test_to_prometheus(self):
+        lines = self.metrics.to_prometheus().splitlines()
+        self.assertIn('# TYPE pipeline_stage_wall_seconds gauge', lines)
+        self.assertIn('pipeline_stage_rows_in{pipeline="data_pipeline",task="validation",stage="validation"} 10', lines)
+        self.assertIn('pipeline_rejections{pipeline="data_pipeline",task="validation",stage="validation",'
+                      'reason="below_18"} 1', lines)
+
+    def test_to_statsd(self):
+        lines = self.metrics.to_statsd()
+        self.assertIn('data_pipeline.validation.validation.rows_out:7|g', lines)
+        self.assertIn('data_pipeline.validation.validation.rejections.invalid_mobile_number:2|g', lines)
+        self.assertTrue(any(line.endswith('|ms') for line in lines))
+
+    def test_to_emf(self):
+        (document,) = self.metrics.to_emf()
+        definition = document['_aws']['CloudWatchMetrics'][0]
+        # every metric declared in the metadata must have a value in the document
+        for metric in definition['Metrics']:
+            self.assertIn(metric['Name'], document)
+        for dimension in definition['Dimensions'][0]:
+            self.assertIn(dimension, document)
+        self.assertEqual(document['Rejections_below_18'], 1)
+        json.dumps(document)
+
+    def test_write_prometheus(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.metrics.write_prometheus(tmp_dir)
+            self.assertEqual(os.listdir(tmp_dir), ['data_pipeline_validation.prom'])
+
+    def test_unknown_exporter_is_rejected_when_created(self):
+        with self.assertRaises(ValueError):
+            MetricsRecorder('data_pipeline', 'run1', exporters='log,graphite')
+
+    def test_export_skips_unknown_exporter(self):
+        # Test that export, called in finally blocks, never raises over the exception of the run
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.metrics.export('graphite,log')
+        self.assertIn('Skipped unknown metrics exporter: graphite', output.getvalue())
+        self.assertIn('Metrics of validation', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import unittest
+import pandas as pd
+from applicant_validation.batch import preprocess_frame, validate_frame
+from dags.parallel import ShardExecutor, split_frame
+
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'source_data')
+
+
+class TestSplitFrame(unittest.TestCase):
+    def test_split_frame(self):
+        df = pd.DataFrame({'a': range(10)})
+        shards = split_frame(df, 4)
+        self.assertEqual([len(shard) for shard in shards], [4, 4, 2])
+        self.assertEqual(pd.concat(shards)['a'].tolist(), list(range(10)))
+
+    def test_split_empty_frame(self):
+        self.assertEqual(len(split_frame(pd.DataFrame({'a': []}), 4)), 1)
+
+
+class TestShardExecutor(unittest.TestCase):
+    def test_matches_single_process(self):
+        # The merged results of the shards should match processing the whole DataFrame
+        raw_df = pd.read_csv(os.path.join(SOURCE_DIR, 'applications_dataset_2.csv'))
+        expected_valid_df, expected_invalid_df = validate_frame(preprocess_frame(raw_df))
+        with ShardExecutor(workers=2, chunk_size=700) as executor:
+            preprocessed_df = pd.concat(executor.map(preprocess_frame, raw_df))
+            results = executor.map(validate_frame, preprocessed_df)
+        self.assertEqual(len(results), 5)
+        pd.testing.assert_frame_equal(pd.concat([valid_df for valid_df, _ in results]), expected_valid_df)
+        pd.testing.assert_frame_equal(pd.concat([invalid_df for _, invalid_df in results]), expected_invalid_df)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import csv
+import os
+import unittest
+import pandas as pd
+from applicant_validation import preprocess_records, validate_records, transform_records
+from applicant_validation.batch import preprocess_frame, validate_frame, transform_frame
+
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'source_data')
+
+
+class TestRecords(unittest.TestCase):
+    def test_matches_frames(self):
+        # The record API, used by the Lambda function, should give the same results as the DataFrame API
+        for file in sorted(os.listdir(SOURCE_DIR)):
+            with open(os.path.join(SOURCE_DIR, file)) as f:
+                records = list(csv.DictReader(f))
+            valid_records, invalid_records = validate_records(preprocess_records(records))
+            successful_records = transform_records(valid_records)
+
+            valid_df, invalid_df = validate_frame(preprocess_frame(pd.DataFrame(records)))
+            self.assertEqual(successful_records, transform_frame(valid_df).to_dict('records'))
+            self.assertEqual(invalid_records, invalid_df.to_dict('records'))
+
+    def test_missing_name(self):
+        records = [{'name': '', 'email': 'a@b.com', 'date_of_birth': '1990-01-01', 'mobile_no': '12345678'}]
+        valid_records, invalid_records = validate_records(preprocess_records(records))
+        self.assertEqual(valid_records, [])
+        self.assertEqual([record['validate_check'] for record in invalid_records], ['missing_name'])
+
+
+if __name__ == '__main__':
+    unittest.main()
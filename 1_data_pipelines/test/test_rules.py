@@ -0,0 +1,91 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+import pandas as pd
+from applicant_validation import preprocess_records, validate_records
+from applicant_validation.batch import preprocess_frame, validate_frame
+from applicant_validation.rules import DEFAULT_RULES, compile_rules, load_rules
+
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'source_data')
+
+RECORDS = [
+  {'name': 'Jane Doe', 'email': 'jane@doe.com', 'date_of_birth': '1990-01-01', 'mobile_no': '12345678'},
+  {'name': 'Jane Doe', 'email': 'jane@doe.org', 'date_of_birth': '2010-01-01', 'mobile_no': '1234567'},
+  {'name': '', 'email': 'jane@doe.org', 'date_of_birth': '1990-01-01', 'mobile_no': '12345678'},
+]
+
+
+class TestRuleSet(unittest.TestCase):
+    def test_first_failure(self):
+        valid_records, invalid_records = validate_records(preprocess_records([dict(r) for r in RECORDS]))
+        self.assertEqual(len(valid_records), 1)
+        self.assertEqual([record['validate_check'] for record in invalid_records],
+                         ['invalid_mobile_number', 'invalid_email'])
+
+    def test_all_failures(self):
+        rules = compile_rules(DEFAULT_RULES)
+        valid_df, invalid_df = validate_frame(preprocess_frame(pd.DataFrame(RECORDS)), rules, mode='all')
+        self.assertEqual(invalid_df['validate_check'].tolist(), ['invalid_mobile_number', 'invalid_email'])
+        self.assertEqual([rules.describe_mask(mask) for mask in invalid_df['validate_mask']],
+                         [['invalid_mobile_number', 'below_18', 'invalid_email'], ['invalid_email', 'missing_name']])
+        _, invalid_records = validate_records(preprocess_records([dict(r) for r in RECORDS]), rules, mode='all')
+        self.assertEqual([record['validate_mask'] for record in invalid_records], invalid_df['validate_mask'].tolist())
+
+    def test_configured_rules(self):
+        # Test that a change of the rules only needs a change of the configuration
+        config = [dict(rule, age=21) if rule['type'] == 'min_age' else rule for rule in DEFAULT_RULES]
+        config[2] = dict(config[2], suffixes=['.com', '.net', '.org'])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'rules.json')
+            with open(filename, 'w') as f:
+                json.dump({'rules': config}, f)
+            rules = load_rules(filename)
+        _, invalid_records = validate_records(preprocess_records([dict(r) for r in RECORDS]), rules)
+        self.assertEqual([record['validate_check'] for record in invalid_records],
+                         ['invalid_mobile_number', 'missing_name'])
+
+    def test_above_18_follows_min_age(self):
+        # Test that the above_18 field agrees with a configured minimum age
+        config = [dict(rule, age=40) if rule['type'] == 'min_age' else rule for rule in DEFAULT_RULES]
+        rules = compile_rules(config)
+        self.assertEqual(rules.age_threshold(), (40, '2022-01-01'))
+        self.assertEqual([record['above_18'] for record in preprocess_records([dict(r) for r in RECORDS], rules)],
+                         [False, False, False])
+        self.assertEqual(preprocess_frame(pd.DataFrame(RECORDS), rules)['above_18'].tolist(), [False, False, False])
+        self.assertEqual(preprocess_frame(pd.DataFrame(RECORDS))['above_18'].tolist(), [True, False, True])
+        no_age = compile_rules([rule for rule in DEFAULT_RULES if rule['type'] != 'min_age'])
+        self.assertEqual(no_age.age_threshold(), (18, '2022-01-01'))
+
+    def test_unordered_rules_match_validity(self):
+        # Unordered rules are reordered by rejection rate but must reject the same records
+        ordered = compile_rules(DEFAULT_RULES)
+        unordered = compile_rules({'rules': DEFAULT_RULES, 'ordered': False})
+        for file in sorted(os.listdir(SOURCE_DIR)):
+            df = preprocess_frame(pd.read_csv(os.path.join(SOURCE_DIR, file)))
+            expected_df, _ = validate_frame(df, ordered)
+            valid_df, invalid_df = validate_frame(df, unordered)
+            self.assertEqual(valid_df.index.tolist(), expected_df.index.tolist())
+            self.assertEqual(set(invalid_df['validate_check']) - set(ordered.names), set())
+        # the cheapest and most selective rules are checked first
+        ranks = [stat['cost'] / stat['rejection_rate'] for stat in unordered.stats()]
+        self.assertEqual(ranks, sorted(ranks))
+        self.assertEqual(ordered.order, [0, 1, 2, 3])
+
+    def test_pickle(self):
+        rules = pickle.loads(pickle.dumps(compile_rules(DEFAULT_RULES)))
+        self.assertEqual(rules.validate_record(preprocess_records([dict(RECORDS[1])])[0]), 'invalid_mobile_number')
+
+    def test_invalid_rules(self):
+        with self.assertRaises(ValueError):
+            compile_rules([{'name': 'invalid_email', 'type': 'domain', 'column': 'email'}])
+        with self.assertRaises(ValueError):
+            compile_rules([{'name': 'invalid_mobile_number', 'type': 'digits', 'column': 'mobile_no'}])
+        with self.assertRaises(ValueError):
+            compile_rules(DEFAULT_RULES + DEFAULT_RULES[:1])
+
+
+if __name__ == '__main__':
+    unittest.main()
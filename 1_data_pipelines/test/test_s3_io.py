@@ -0,0 +1,303 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+try:
+    # moto patches the clients created after it is imported, so it is imported before s3_io creates any
+    from moto import mock_aws
+except ImportError:
+    raise unittest.SkipTest('the tests of the Lambda function need moto')
+
+# fake credentials, so that no request can reach AWS
+os.environ.update({'AWS_DEFAULT_REGION': 'ap-southeast-1', 'AWS_ACCESS_KEY_ID': 'testing',
+                   'AWS_SECRET_ACCESS_KEY': 'testing'})
+import s3_io  # noqa: E402
+from s3_io import (MIN_PART_SIZE, BufferBudget, MultipartCsvWriter, concatenate_objects,  # noqa: E402
+                   delete_objects, iter_lines, iter_object_chunks, move_objects)
+
+BUCKET_NAME = 'test-bucket'
+
+
+class S3TestCase(unittest.TestCase):
+    def setUp(self):
+        # the mock is started here, as decorating the test classes would not cover the setUp they inherit
+        mock = mock_aws()
+        mock.start()
+        self.addCleanup(mock.stop)
+        self.s3 = s3_io.get_client()
+        self.s3.create_bucket(Bucket=BUCKET_NAME,
+                              CreateBucketConfiguration={'LocationConstraint': os.environ['AWS_DEFAULT_REGION']})
+
+    def put(self, key: str, body: bytes) -> bytes:
+        self.s3.put_object(Bucket=BUCKET_NAME, Key=key, Body=body)
+        return body
+
+    def read(self, key: str) -> bytes:
+        return self.s3.get_object(Bucket=BUCKET_NAME, Key=key)['Body'].read()
+
+    def keys(self, prefix: str = '') -> list:
+        response = self.s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=prefix)
+        return [obj['Key'] for obj in response.get('Contents', [])]
+
+    def pending_uploads(self) -> list:
+        return self.s3.list_multipart_uploads(Bucket=BUCKET_NAME).get('Uploads', [])
+
+
+def wait_for_release(budget: BufferBudget):
+    # the requests cancelled or still in flight release their bytes from the threads of the executor
+    deadline = time.monotonic() + 5
+    while budget.used > 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return budget.used
+
+
+class TestBufferBudget(unittest.TestCase):
+    def test_acquire_within_budget(self):
+        budget = BufferBudget(10)
+        self.assertTrue(budget.acquire(6, wait=False))
+        self.assertFalse(budget.acquire(6, wait=False))
+        self.assertTrue(budget.acquire(4, wait=False))
+        budget.release(10)
+        self.assertEqual(budget.used, 0)
+
+    def test_request_larger_than_budget_is_admitted_alone(self):
+        budget = BufferBudget(10)
+        self.assertTrue(budget.acquire(25, wait=False))
+        self.assertFalse(budget.acquire(1, wait=False))
+
+    def test_acquire_waits_for_release(self):
+        budget = BufferBudget(10)
+        budget.acquire(8)
+        releaser = threading.Timer(0.05, budget.release, args=(8,))
+        releaser.start()
+        budget.acquire(8)
+        releaser.join()
+        self.assertEqual(budget.used, 8)
+
+
+class TestIterObjectChunks(S3TestCase):
+    def test_chunks_in_order(self):
+        body = self.put('source_data/a.csv', bytes(range(100)))
+        chunks = list(iter_object_chunks(BUCKET_NAME, 'source_data/a.csv', 100, chunk_size=7, max_concurrency=3))
+        self.assertEqual([len(chunk) for chunk in chunks], [7] * 14 + [2])
+        self.assertEqual(b''.join(chunks), body)
+
+    def test_range_from_start_offset(self):
+        body = self.put('source_data/a.csv', bytes(range(100)))
+        chunks = list(iter_object_chunks(BUCKET_NAME, 'source_data/a.csv', 100, chunk_size=7, start=30))
+        self.assertEqual(len(chunks[0]), 7)
+        self.assertEqual(b''.join(chunks), body[30:])
+
+    def test_range_to_end_offset(self):
+        # Test that a shard is read up to its end rather than to the end of the object
+        body = self.put('source_data/a.csv', bytes(range(100)))
+        chunks = list(iter_object_chunks(BUCKET_NAME, 'source_data/a.csv', 64, chunk_size=7, start=30))
+        self.assertEqual(b''.join(chunks), body[30:64])
+
+    def test_empty_range(self):
+        self.put('source_data/a.csv', b'abc')
+        self.assertEqual(list(iter_object_chunks(BUCKET_NAME, 'source_data/a.csv', 3, start=3)), [])
+
+    def test_read_ahead_is_bounded_by_budget(self):
+        # Test that fewer ranges than max_concurrency are read ahead when they would exceed the budget
+        body = self.put('source_data/a.csv', bytes(range(100)))
+        budget = BufferBudget(21)
+        used = []
+        with mock.patch.object(s3_io, 'READ_BUFFER', budget):
+            chunks = []
+            for chunk in iter_object_chunks(BUCKET_NAME, 'source_data/a.csv', 100, chunk_size=7, max_concurrency=8):
+                used.append(budget.used)
+                chunks.append(chunk)
+        self.assertEqual(b''.join(chunks), body)
+        self.assertLessEqual(max(used), 21)
+        self.assertEqual(budget.used, 0)
+
+    def test_budget_is_released_when_closed_early(self):
+        self.put('source_data/a.csv', bytes(range(100)))
+        budget = BufferBudget(1000)
+        with mock.patch.object(s3_io, 'READ_BUFFER', budget):
+            chunks = iter_object_chunks(BUCKET_NAME, 'source_data/a.csv', 100, chunk_size=7, max_concurrency=4)
+            next(chunks)
+            chunks.close()
+        self.assertEqual(wait_for_release(budget), 0)
+
+
+class TestIterLines(unittest.TestCase):
+    def test_lines_split_across_chunks(self):
+        chunks = [b'name,em', b'ail\nJane,jane@x.com\nJo', b'hn,john@x.net\n']
+        self.assertEqual(list(iter_lines(chunks)), ['name,email\n', 'Jane,jane@x.com\n', 'John,john@x.net\n'])
+
+    def test_crlf_split_across_chunks(self):
+        # Test that a '\r' at the end of a chunk is kept with the '\n' starting the next one
+        chunks = [b'name\r', b'\nJane\r', b'\n']
+        self.assertEqual(list(iter_lines(chunks)), ['name\r\n', 'Jane\r\n'])
+
+    def test_multibyte_character_split_across_chunks(self):
+        content = 'name\nZoë\n'.encode('utf-8')
+        split = content.index(b'\xc3') + 1
+        self.assertEqual(list(iter_lines([content[:split], content[split:]])), ['name\n', 'Zoë\n'])
+
+    def test_last_line_without_line_break(self):
+        self.assertEqual(list(iter_lines([b'name\nJa', b'ne'])), ['name\n', 'Jane'])
+
+    def test_no_content(self):
+        self.assertEqual(list(iter_lines([])), [])
+        self.assertEqual(list(iter_lines([b''])), [])
+
+    def test_one_byte_chunks(self):
+        content = b'name,email\r\n"Doe, Jane","jane\nx"\r\nJohn,john@x.net'
+        self.assertEqual(''.join(iter_lines([content[i:i + 1] for i in range(len(content))])), content.decode())
+
+
+class TestIterLinesOfObject(S3TestCase):
+    def test_lines_of_object_read_in_small_chunks(self):
+        lines = [f'Applicant {i},applicant{i}@x.com\r\n' for i in range(50)]
+        body = self.put('source_data/a.csv', ''.join(lines).encode('utf-8'))
+        chunks = iter_object_chunks(BUCKET_NAME, 'source_data/a.csv', len(body), chunk_size=13, max_concurrency=4)
+        self.assertEqual(list(iter_lines(chunks)), lines)
+
+
+class TestDeleteAndMoveObjects(S3TestCase):
+    def test_delete_objects_in_batches(self):
+        for i in range(5):
+            self.put(f'shards/run/part{i}.csv', b'x')
+        with mock.patch.object(s3_io, 'DELETE_BATCH_SIZE', 2):
+            with mock.patch.object(self.s3, 'delete_objects', wraps=self.s3.delete_objects) as delete:
+                delete_objects(BUCKET_NAME, [f'shards/run/part{i}.csv' for i in range(4)])
+        self.assertEqual(delete.call_count, 2)
+        self.assertEqual(self.keys(), ['shards/run/part4.csv'])
+
+    def test_delete_objects_raises_on_errors(self):
+        errors = {'Errors': [{'Key': 'shards/run/part0.csv', 'Code': 'AccessDenied'}]}
+        with mock.patch.object(self.s3, 'delete_objects', return_value=errors):
+            with self.assertRaises(IOError):
+                delete_objects(BUCKET_NAME, ['shards/run/part0.csv'])
+
+    def test_move_objects(self):
+        first = self.put('source_data/a.csv', b'name\nJane\n')
+        second = self.put('source_data/b.csv', b'name\nJohn\n')
+        move_objects(BUCKET_NAME, {'source_data/a.csv': 'archive/source_data/a.csv',
+                                   'source_data/b.csv': 'archive/source_data/b.csv'})
+        self.assertEqual(self.keys('source_data/'), [])
+        self.assertEqual(self.read('archive/source_data/a.csv'), first)
+        self.assertEqual(self.read('archive/source_data/b.csv'), second)
+
+    def test_move_objects_keeps_sources_if_a_copy_fails(self):
+        self.put('source_data/a.csv', b'name\nJane\n')
+        with self.assertRaises(Exception):
+            move_objects(BUCKET_NAME, {'source_data/a.csv': 'archive/source_data/a.csv',
+                                       'source_data/missing.csv': 'archive/source_data/missing.csv'})
+        self.assertEqual(self.keys('source_data/'), ['source_data/a.csv'])
+
+
+class TestConcatenateObjects(S3TestCase):
+    def test_small_objects_are_put_at_once(self):
+        parts = [self.put(f'shards/run/part{i}.csv', f'Applicant {i}\n'.encode()) for i in range(3)]
+        with mock.patch.object(self.s3, 'create_multipart_upload', wraps=self.s3.create_multipart_upload) as create:
+            concatenate_objects(BUCKET_NAME, [(f'shards/run/part{i}.csv', len(part)) for i, part in enumerate(parts)],
+                                'raw_data/raw_data.csv', header=b'name\n')
+        create.assert_not_called()
+        self.assertEqual(self.read('raw_data/raw_data.csv'), b'name\n' + b''.join(parts))
+
+    def test_large_objects_are_copied_by_s3(self):
+        # Test that the parts of at least 5 MB are copied with UploadPartCopy, and that a small part
+        # between them is completed with the start of the next one to keep every part but the last valid
+        large = self.put('shards/run/part0.csv', b'a' * (MIN_PART_SIZE + 10))
+        small = self.put('shards/run/part1.csv', b'b' * 100)
+        last = self.put('shards/run/part2.csv', b'c' * (MIN_PART_SIZE + 200))
+        sources = [('shards/run/part0.csv', len(large)), ('shards/run/part1.csv', len(small)),
+                   ('shards/run/part2.csv', len(last))]
+        with mock.patch.object(self.s3, 'upload_part_copy', wraps=self.s3.upload_part_copy) as copy:
+            concatenate_objects(BUCKET_NAME, sources, 'raw_data/raw_data.csv', header=b'name\n')
+        self.assertEqual([call.kwargs['CopySource']['Key'] for call in copy.call_args_list],
+                         ['shards/run/part2.csv'])
+        self.assertEqual(self.read('raw_data/raw_data.csv'), b'name\n' + large + small + last)
+        self.assertEqual(self.pending_uploads(), [])
+
+    def test_large_object_without_header_is_copied_whole(self):
+        large = self.put('shards/run/part0.csv', b'a' * MIN_PART_SIZE)
+        with mock.patch.object(self.s3, 'upload_part_copy', wraps=self.s3.upload_part_copy) as copy:
+            concatenate_objects(BUCKET_NAME, [('shards/run/part0.csv', len(large))], 'raw_data/raw_data.csv')
+        self.assertEqual(copy.call_args.kwargs['CopySourceRange'], f'bytes=0-{MIN_PART_SIZE - 1}')
+        self.assertEqual(self.read('raw_data/raw_data.csv'), large)
+
+    def test_upload_is_aborted_on_error(self):
+        large = self.put('shards/run/part0.csv', b'a' * MIN_PART_SIZE)
+        with self.assertRaises(Exception):
+            concatenate_objects(BUCKET_NAME, [('shards/run/part0.csv', len(large)), ('shards/run/missing.csv', 10)],
+                                'raw_data/raw_data.csv')
+        self.assertEqual(self.pending_uploads(), [])
+        self.assertEqual(self.keys('raw_data/'), [])
+
+
+class TestMultipartCsvWriter(S3TestCase):
+    RECORDS = [{'name': f'Applicant {i}', 'email': f'applicant{i}@x.com', 'notes': 'x' * 1100} for i in range(12000)]
+
+    def test_small_object_is_put_at_once(self):
+        with mock.patch.object(self.s3, 'create_multipart_upload', wraps=self.s3.create_multipart_upload) as create:
+            with MultipartCsvWriter(BUCKET_NAME, 'raw_data/raw_data.csv') as writer:
+                writer.writerows(self.RECORDS[:2])
+                writer.writerows([])
+        create.assert_not_called()
+        self.assertEqual(self.read('raw_data/raw_data.csv').decode().splitlines()[0], 'name,email,notes')
+        self.assertEqual(writer.rows, 2)
+
+    def test_parts_are_sent_once_full(self):
+        with mock.patch.object(self.s3, 'upload_part', wraps=self.s3.upload_part) as upload_part:
+            with MultipartCsvWriter(BUCKET_NAME, 'raw_data/raw_data.csv', part_size=MIN_PART_SIZE) as writer:
+                for start in range(0, len(self.RECORDS), 1000):
+                    writer.writerows(self.RECORDS[start:start + 1000])
+        # about 13 MB of records in parts of at least 5 MB, the last one smaller
+        self.assertEqual(upload_part.call_count, 3)
+        part_sizes = [len(call.kwargs['Body']) for call in upload_part.call_args_list]
+        self.assertTrue(all(size >= MIN_PART_SIZE for size in part_sizes[:-1]))
+        lines = self.read('raw_data/raw_data.csv').decode().splitlines()
+        self.assertEqual(lines.count('name,email,notes'), 1)
+        self.assertEqual(len(lines), len(self.RECORDS) + 1)
+        self.assertTrue(lines[-1].startswith('Applicant 11999,'))
+
+    def test_parts_in_flight_are_bounded_by_budget(self):
+        # Test that a writer waits for its parts to be sent when they would exceed the budget
+        budget = BufferBudget(MIN_PART_SIZE)
+        used = []
+        send = self.s3.upload_part
+
+        def upload_part(**kwargs):
+            used.append(budget.used)
+            return send(**kwargs)
+
+        with mock.patch.object(s3_io, 'WRITE_BUFFER', budget), \
+             mock.patch.object(self.s3, 'upload_part', side_effect=upload_part):
+            with MultipartCsvWriter(BUCKET_NAME, 'raw_data/raw_data.csv', part_size=MIN_PART_SIZE) as writer:
+                for start in range(0, len(self.RECORDS), 1000):
+                    writer.writerows(self.RECORDS[start:start + 1000])
+        self.assertEqual(len(used), 3)
+        self.assertTrue(all(nbytes < 2 * MIN_PART_SIZE for nbytes in used))
+        self.assertEqual(wait_for_release(budget), 0)
+        self.assertEqual(len(self.read('raw_data/raw_data.csv').decode().splitlines()), len(self.RECORDS) + 1)
+
+    def test_no_header(self):
+        with MultipartCsvWriter(BUCKET_NAME, 'shards/run/part0.csv', fieldnames=['email', 'name'],
+                                header=False) as writer:
+            writer.writerows([{'name': 'Jane', 'email': 'jane@x.com'}])
+        self.assertEqual(self.read('shards/run/part0.csv'), b'jane@x.com,Jane\r\n')
+
+    def test_nothing_is_written_without_records(self):
+        with MultipartCsvWriter(BUCKET_NAME, 'raw_data/raw_data.csv') as writer:
+            writer.writerows([])
+        self.assertEqual(self.keys(), [])
+
+    def test_upload_is_aborted_on_error(self):
+        with self.assertRaises(ValueError):
+            with MultipartCsvWriter(BUCKET_NAME, 'raw_data/raw_data.csv', part_size=MIN_PART_SIZE) as writer:
+                writer.writerows(self.RECORDS[:6000])
+                self.assertEqual(len(self.pending_uploads()), 1)
+                raise ValueError('failed batch')
+        self.assertEqual(self.pending_uploads(), [])
+        self.assertEqual(self.keys(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+import pyarrow.parquet as pq
+from dags.sinks import CsvSink, ParquetSink, make_sink, RAW_SCHEMA, UNSUCCESSFUL_SCHEMA
+
+
+class TestCsvSink(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_appends_to_file_of_run(self):
+        # Test that the batches of a run go to the same file with a single header
+        sink = CsvSink(self.tmp_dir.name, 'raw_data', '20220101-000000', RAW_SCHEMA)
+        sink.write(pd.DataFrame({'name': ['Jane Doe'], 'email': ['jane@x.com'],
+                                 'date_of_birth': ['1990-01-01'], 'mobile_no': [12345678]}))
+        sink.write(pd.DataFrame({'email': ['john@x.net'], 'name': ['John Smith'],
+                                 'date_of_birth': ['1991-01-01'], 'mobile_no': ['1234 5678']}))
+        df = pd.read_csv(os.path.join(self.tmp_dir.name, 'raw_data_20220101-000000.csv'), dtype=str)
+        self.assertEqual(df.columns.tolist(), RAW_SCHEMA.names)
+        self.assertEqual(df['name'].tolist(), ['Jane Doe', 'John Smith'])
+
+    def test_write_rejects_unexpected_columns(self):
+        sink = CsvSink(self.tmp_dir.name, 'raw_data', '20220101-000000', RAW_SCHEMA)
+        with self.assertRaises(ValueError):
+            sink.write(pd.DataFrame({'name': ['Jane Doe'], 'phone': [12345678]}))
+
+
+class TestParquetSink(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.invalid_df = pd.DataFrame({
+          'first_name': ['Jane', 'John', 'David'],
+          'last_name': ['Doe', 'Smith', 'Lee'],
+          'email': ['jane@x.com', 'john@x.biz', 'david@x.com'],
+          'date_of_birth': ['19900101', '19910101', '20100101'],
+          'mobile_no': [1234567, 12345678, 87654321],
+          'above_18': [True, True, False],
+          'validate_check': ['invalid_mobile_number', 'invalid_email', 'below_18'],
+        })
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_partitions_by_date_and_reason(self):
+        sink = ParquetSink(self.tmp_dir.name, 'unsuccessful_applicants', '20220101-000000',
+                           schema=UNSUCCESSFUL_SCHEMA, partition_cols=['validate_check'])
+        written = sink.write(self.invalid_df)
+        root = os.path.join(self.tmp_dir.name, 'unsuccessful_applicants', 'ingestion_date=2022-01-01')
+        self.assertEqual(sorted(os.listdir(root)),
+                         ['validate_check=below_18', 'validate_check=invalid_email',
+                          'validate_check=invalid_mobile_number'])
+        self.assertEqual(sum(written.values()), 3)
+
+        # the partition column is only in the directory name and the mobile numbers are cast to strings
+        table = pq.read_table(os.path.join(root, 'validate_check=invalid_email'))
+        self.assertNotIn('validate_check', table.column_names)
+        self.assertEqual(table.column('mobile_no').to_pylist(), ['12345678'])
+
+    def test_batches_do_not_overwrite_each_other(self):
+        sink = ParquetSink(self.tmp_dir.name, 'unsuccessful_applicants', '20220101-000000',
+                           schema=UNSUCCESSFUL_SCHEMA, partition_cols=['validate_check'])
+        sink.write(self.invalid_df)
+        sink.write(self.invalid_df)
+        sink.write(self.invalid_df.iloc[:0])
+        df = pd.read_parquet(os.path.join(self.tmp_dir.name, 'unsuccessful_applicants'))
+        self.assertEqual(len(df), 6)
+        self.assertEqual(sorted(df['validate_check'].astype(str).unique()),
+                         ['below_18', 'invalid_email', 'invalid_mobile_number'])
+
+    def test_row_group_size(self):
+        sink = ParquetSink(self.tmp_dir.name, 'unsuccessful_applicants', '20220101-000000',
+                           schema=UNSUCCESSFUL_SCHEMA, row_group_size=2)
+        written = sink.write(self.invalid_df)
+        (partition_path,) = written
+        (filename,) = os.listdir(partition_path)
+        self.assertEqual(pq.ParquetFile(os.path.join(partition_path, filename)).num_row_groups, 2)
+
+    def test_write_rejects_values_not_matching_schema(self):
+        sink = ParquetSink(self.tmp_dir.name, 'unsuccessful_applicants', '20220101-000000',
+                           schema=UNSUCCESSFUL_SCHEMA)
+        with self.assertRaises(ValueError):
+            sink.write(self.invalid_df.drop(columns=['validate_check']))
+        with self.assertRaises(ValueError):
+            sink.write(self.invalid_df.assign(above_18=['yes', 'no', 'no']))
+
+
+class TestMakeSink(unittest.TestCase):
+    def test_make_sink(self):
+        self.assertIsInstance(make_sink('csv', '/tmp', 'raw_data'), CsvSink)
+        self.assertIsInstance(make_sink('parquet', '/tmp', 'raw_data'), ParquetSink)
+        with self.assertRaises(ValueError):
+            make_sink('json', '/tmp', 'raw_data')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import tempfile
+import unittest
+import pandas as pd
+from dags.staging import StagingStore, read_staged
+
+
+class TestStagingStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.staging = StagingStore(self.tmp_dir.name, 'scheduled__2022-01-01T00:00:00+00:00')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_and_read_staged(self):
+        # Test that the parts are read back in order and empty parts are skipped
+        frames = [pd.DataFrame({'name': ['Jane Doe', 'John Smith'], 'mobile_no': [12345678, 1234567]}),
+                  pd.DataFrame({'name': [], 'mobile_no': []}),
+                  pd.DataFrame({'name': ['David Lee'], 'mobile_no': [87654321]})]
+        staged = self.staging.write('raw_data', frames)
+        self.assertEqual((staged['rows'], staged['parts']), (3, 2))
+        df = pd.concat(read_staged(staged), ignore_index=True)
+        self.assertEqual(df['name'].tolist(), ['Jane Doe', 'John Smith', 'David Lee'])
+        self.assertEqual(df['mobile_no'].tolist(), [12345678, 1234567, 87654321])
+
+    def test_write_replaces_previous_version(self):
+        # Test that rewriting a dataset, e.g. on retry, drops the previous parts
+        self.staging.write('raw_data', [pd.DataFrame({'name': ['Jane Doe']})] * 3)
+        staged = self.staging.write('raw_data', [pd.DataFrame({'name': ['John Smith']})])
+        self.assertEqual([df['name'].tolist() for df in read_staged(staged)], [['John Smith']])
+
+    def test_cleanup(self):
+        staged = self.staging.write('raw_data', [pd.DataFrame({'name': ['Jane Doe']})])
+        self.staging.cleanup()
+        with self.assertRaises(OSError):
+            list(read_staged(staged))
+
+
+if __name__ == '__main__':
+    unittest.main()
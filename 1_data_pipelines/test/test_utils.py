@@ -1,14 +1,17 @@
 import unittest
-from datetime import datetime
-from dags.utils import (has_correct_digits,
-                        identify_date_format,
-                        format_date_of_birth,
-                        is_above_age,
-                        is_valid_email,
-                        is_empty_name,
-                        split_name,
-                        get_hashed_date
-                        )
+from datetime import datetime, timedelta
+from applicant_validation.core import (DATE_FORMATS,
+                                       DateNormalizer,
+                                       has_correct_digits,
+                                       identify_date_format,
+                                       format_date_of_birth,
+                                       is_above_age,
+                                       is_valid_email,
+                                       is_empty_name,
+                                       split_name,
+                                       get_hashed_date,
+                                       hash_date
+                                       )
 
 
 class TestHasCorrectDigits(unittest.TestCase):
@@ -68,6 +71,54 @@ class TestFormatDateOfBirth(unittest.TestCase):
             format_date_of_birth(dob_str, dob_format)
 
 
+class TestDateNormalizer(unittest.TestCase):
+    def setUp(self):
+        # Every 37th day over 80 years, written in every supported format
+        days = [datetime(1950, 1, 1) + timedelta(days=i) for i in range(0, 80 * 365, 37)]
+        self.dates = [day.strftime(fmt) for day in days for fmt in DATE_FORMATS]
+
+    def test_matches_identify_date_format(self):
+        normalizer = DateNormalizer()
+        for date_str in self.dates:
+            expected = format_date_of_birth(date_str, identify_date_format(date_str))
+            self.assertEqual(normalizer.normalize(date_str), expected, date_str)
+
+    def test_ambiguous_date_is_day_first(self):
+        normalizer = DateNormalizer()
+        self.assertEqual(normalizer.normalize("11/05/1999"), "19990511")
+        self.assertEqual(normalizer.normalize("05/31/1999"), "19990531")
+
+    def test_detect_formats_of_uniform_file(self):
+        normalizer = DateNormalizer()
+        dates = ["05/31/1999", "12/25/1980", "02/05/1968", "01/13/1970"]
+        self.assertEqual(normalizer.detect_formats(dates[:2]), ("%Y/%m/%d", "%d/%m/%Y", "%m/%d/%Y"))
+        self.assertEqual(normalizer.detect_formats(["1999-05-31", "1980-12-25"]), ("%Y-%m-%d",))
+        self.assertIsNone(normalizer.detect_formats(["1999-05-31", "31/05/1999"]))
+        # the detected mm/dd/yyyy format must not override the dd-mm-yyyy rule
+        self.assertEqual(normalizer.normalize_many(dates),
+                         ["19990531", "19801225", "19680502", "19700113"])
+
+    def test_normalize_many_with_mixed_formats(self):
+        normalizer = DateNormalizer()
+        expected = [format_date_of_birth(d, identify_date_format(d)) for d in self.dates]
+        self.assertEqual(normalizer.normalize_many(self.dates), expected)
+
+    def test_cache_is_bounded(self):
+        normalizer = DateNormalizer(maxsize=2)
+        for date_str in ["1999-05-31", "1999-05-31", "1980-12-25", "1970-01-13"]:
+            normalizer.normalize(date_str)
+        cache_info = normalizer.cache_info()
+        self.assertEqual(cache_info.hits, 1)
+        self.assertEqual(cache_info.currsize, 2)
+
+    def test_invalid_date(self):
+        normalizer = DateNormalizer()
+        with self.assertRaises(ValueError):
+            normalizer.normalize("May 11, 2022")
+        with self.assertRaises(ValueError):
+            normalizer.normalize("2022-02-30")
+
+
 class TestIsAboveAge(unittest.TestCase):
 
     def test_above_age(self):
@@ -167,6 +218,10 @@ class TestGetHashedDate(unittest.TestCase):
         expected_result = "a1a80"
         self.assertEqual(get_hashed_date(date_input), expected_result)
 
+    def test_hash_date_matches_get_hashed_date(self):
+        for date_input in ['20220101', '20211231', '20230915']:
+            self.assertEqual(hash_date(date_input), get_hashed_date(date_input))
+
     def test_get_hashed_date_invalid_input(self):
         # Test with invalid input type
         date_input = "2022-12-25"
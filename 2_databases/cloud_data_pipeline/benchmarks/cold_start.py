@@ -0,0 +1,164 @@
+"""
+Measures the cold start of the Lambda function: the time to import its handler module, and the
+latency of its first (cold) and following (warm) invocations, each run in a fresh Python process.
+
+The invocations process source files in S3 mocked by moto, so that the numbers compare versions
+of the code rather than measure S3. Each invocation of a process gets a different file of synthetic
+applications, generated with the benchmarks of the Airflow pipeline, so that the warm invocations
+do not only reuse the dates parsed by the previous ones. On AWS, the Init Duration of the REPORT
+lines of the logs of the function is the import time of the deployed handler.
+
+Usage:
+    python benchmarks/cold_start.py --runs 10 --warm 5 --rows 5000
+    python benchmarks/cold_start.py --source ../../1_data_pipelines/source_data/applications_dataset_1.csv
+    python benchmarks/cold_start.py --importtime
+"""
+from typing import Dict, List, Optional
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'terraform', 'src')
+DATA_PIPELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '1_data_pipelines')
+BUCKET_NAME = 'cold-start-benchmark'
+# environment of the handler, with fake credentials so that no request can reach AWS
+ENVIRONMENT = {
+  'BUCKET_NAME': BUCKET_NAME,
+  'AWS_DEFAULT_REGION': 'ap-southeast-1',
+  'AWS_ACCESS_KEY_ID': 'testing',
+  'AWS_SECRET_ACCESS_KEY': 'testing',
+  'PIPELINE_METRICS_EXPORTERS': 'log',
+}
+
+
+def measure_import() -> Dict:
+    """Imports the handler module, as the Lambda runtime does when it initializes a container."""
+    sys.path.insert(0, SRC_DIR)
+    start = time.perf_counter()
+    import main  # noqa: F401
+    return {'import_seconds': time.perf_counter() - start}
+
+
+def measure_invocations(sources: List[str]) -> Dict:
+    """Invokes the handler once per source file, the first time cold and then warm."""
+    from moto import mock_aws
+    with mock_aws():
+        import botocore.session
+        s3 = botocore.session.get_session().create_client('s3')
+        s3.create_bucket(Bucket=BUCKET_NAME,
+                         CreateBucketConfiguration={'LocationConstraint': ENVIRONMENT['AWS_DEFAULT_REGION']})
+        # moto imports botocore itself, so the import time measured here is only that of the code of the function
+        result = measure_import()
+        import main
+        latencies = []
+        for invocation, source in enumerate(sources):
+            with open(source, 'rb') as f:
+                s3.put_object(Bucket=BUCKET_NAME, Key=f'source_data/applications_{invocation}.csv', Body=f.read())
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                main.lambda_handler({}, None)
+            latencies.append(time.perf_counter() - start)
+    result['cold_seconds'] = latencies[0]
+    result['warm_seconds'] = latencies[1:]
+    return result
+
+
+def run_child(args: List[str]) -> subprocess.CompletedProcess:
+    """Runs a measurement in a fresh Python process."""
+    return subprocess.run([sys.executable, os.path.abspath(__file__)] + args, check=True,
+                          capture_output=True, text=True, env=dict(os.environ, **ENVIRONMENT))
+
+
+def import_profile(top: int = 15) -> List[Dict]:
+    """Returns the modules taking the most time to import, as reported by python -X importtime."""
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=SRC_DIR, check=True,
+                             capture_output=True, text=True, env=dict(os.environ, **ENVIRONMENT))
+    modules = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append({'module': name.rstrip(), 'self_ms': int(self_us) / 1000,
+                        'cumulative_ms': int(cumulative_us) / 1000})
+    return sorted(modules, key=lambda module: module['cumulative_ms'], reverse=True)[:top]
+
+
+def generate_sources(directory: str, count: int, rows: int) -> List[str]:
+    """Writes count files of synthetic applications with different seeds."""
+    sources = []
+    for seed in range(count):
+        filename = os.path.join(directory, f'applications_{seed}.csv')
+        subprocess.run([sys.executable, '-m', 'benchmarks.synthetic_data', str(rows), filename, '--seed', str(seed)],
+                       cwd=DATA_PIPELINES_DIR, check=True, capture_output=True)
+        sources.append(filename)
+    return sources
+
+
+def summarize(values: List[float]) -> Dict:
+    return {'median_ms': statistics.median(values) * 1000, 'min_ms': min(values) * 1000,
+            'max_ms': max(values) * 1000, 'runs': len(values)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='number of fresh processes per measurement (default 5)')
+    parser.add_argument('--warm', type=int, default=3, help='number of warm invocations per process (default 3)')
+    parser.add_argument('--rows', type=int, default=2000,
+                        help='number of synthetic applications per source file (default 2000)')
+    parser.add_argument('--source', help='CSV file processed by every invocation instead of the synthetic files')
+    parser.add_argument('--importtime', action='store_true',
+                        help='print the modules taking the most time to import instead')
+    parser.add_argument('--output', help='path of the JSON file to write the results to')
+    parser.add_argument('--child', choices=['import', 'invoke'], help=argparse.SUPPRESS)
+    parser.add_argument('--sources', nargs='*', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child == 'import':
+        print(json.dumps(measure_import()))
+        return 0
+    if args.child == 'invoke':
+        print(json.dumps(measure_invocations(args.sources)))
+        return 0
+
+    if args.importtime:
+        for module in import_profile():
+            print(f"{module['cumulative_ms']:10.1f} ms {module['self_ms']:10.1f} ms  {module['module']}")
+        return 0
+
+    imports = [json.loads(run_child(['--child', 'import']).stdout)['import_seconds'] for _ in range(args.runs)]
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        if args.source:
+            sources = [args.source] * (args.warm + 1)
+        else:
+            sources = generate_sources(tmp_dir, args.warm + 1, args.rows)
+        invocations = [json.loads(run_child(['--child', 'invoke', '--sources'] + sources).stdout.splitlines()[-1])
+                       for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(tmp_dir)
+    results = {
+      'import': summarize(imports),
+      'cold_invocation': summarize([invocation['cold_seconds'] for invocation in invocations]),
+      'warm_invocation': summarize([seconds for invocation in invocations
+                                    for seconds in invocation['warm_seconds']]),
+    }
+    for name, result in results.items():
+        print(f"{name:<16} median {result['median_ms']:9.1f} ms  min {result['min_ms']:9.1f} ms  "
+              f"max {result['max_ms']:9.1f} ms  ({result['runs']} runs)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,6 +4,21 @@ data "archive_file" "process_membership_applications" {
   output_path = "process_membership_applications.zip"
 }
 
+# botocore is pinned in a layer, as the conditional writes of the manifest need a more recent version than
+# the one of the runtime. The layer is installed from requirements.txt before deploying, see the README
+data "archive_file" "botocore_layer" {
+  type        = "zip"
+  source_dir  = "layer"
+  output_path = "botocore_layer.zip"
+}
+
+resource "aws_lambda_layer_version" "botocore" {
+  filename            = "botocore_layer.zip"
+  layer_name          = "process_membership_applications_botocore"
+  compatible_runtimes = ["python3.9"]
+  source_code_hash    = data.archive_file.botocore_layer.output_base64sha256
+}
+
 resource "aws_lambda_function" "process_membership_applications" {
   filename      = "process_membership_applications.zip"
   function_name = "process_membership_applications"
@@ -11,10 +26,18 @@ resource "aws_lambda_function" "process_membership_applications" {
   handler       = "main.lambda_handler"
   runtime       = "python3.9"
   timeout       = 900  # 15 minutes in seconds
+  # the requests to S3 hold up to a quarter of the memory, and the shards of the large files are an eighth
+  # of it in event mode by default, see the sizing in the README
+  memory_size   = 1024
+  layers        = [aws_lambda_layer_version.botocore.arn]
 
   environment {
     variables = {
-      BUCKET_NAME = "${aws_s3_bucket.membership_applications.id}"
+      BUCKET_NAME                = "${aws_s3_bucket.membership_applications.id}"
+      BATCH_SIZE                 = "50000"
+      PIPELINE_METRICS_EXPORTERS = "log,emf"
+      S3_MAX_CONCURRENCY         = "8"
+      SWEEP_MIN_AGE              = "3600"
     }
   }
 
@@ -64,3 +87,21 @@ resource "aws_iam_role_policy" "lambda_exec_cloudwatch_access" {
   
   role = "${aws_iam_role.lambda_exec.id}"
 }
+
+resource "aws_iam_role_policy" "lambda_exec_invoke_shards" {
+  name   = "lambda_exec_invoke_shards"
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Action = [
+          "lambda:InvokeFunction"
+        ]
+        Effect   = "Allow"
+        Resource = "${aws_lambda_function.process_membership_applications.arn}"
+      }
+    ]
+  })
+
+  role = "${aws_iam_role.lambda_exec.id}"
+}
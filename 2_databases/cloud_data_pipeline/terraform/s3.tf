@@ -2,3 +2,24 @@ resource "aws_s3_bucket" "membership_applications" {
   bucket = "membership-applications-processing-pipeline"
   acl    = "private"
 }
+
+resource "aws_lambda_permission" "allow_bucket" {
+  statement_id  = "AllowExecutionFromS3Bucket"
+  action        = "lambda:InvokeFunction"
+  function_name = "${aws_lambda_function.process_membership_applications.arn}"
+  principal     = "s3.amazonaws.com"
+  source_arn    = "${aws_s3_bucket.membership_applications.arn}"
+}
+
+resource "aws_s3_bucket_notification" "source_data_created" {
+  bucket = "${aws_s3_bucket.membership_applications.id}"
+
+  lambda_function {
+    lambda_function_arn = "${aws_lambda_function.process_membership_applications.arn}"
+    events              = ["s3:ObjectCreated:*"]
+    filter_prefix       = "source_data/"
+    filter_suffix       = ".csv"
+  }
+
+  depends_on = [aws_lambda_permission.allow_bucket]
+}
@@ -1,18 +1,18 @@
 import os
-import boto3
 import csv
 import io
+import json
 import time
-from typing import List, Dict, Tuple
-from utils import (has_correct_digits,
-                   identify_date_format,
-                   format_date_of_birth,
-                   is_above_age,
-                   is_valid_email,
-                   is_empty_name,
-                   split_name,
-                   get_hashed_date
-                   )
+from datetime import datetime, timezone
+from typing import Callable, List, Dict, Optional, Tuple, Iterable, Iterator
+from urllib.parse import unquote_plus
+import botocore
+from botocore.exceptions import ClientError
+from applicant_validation import DATE_FORMATS, preprocess_records, validate_records, transform_records
+from pipeline_tracking.manifest import FileManifest, archive_name
+from pipeline_tracking.metrics import MetricsRecorder
+from s3_io import (FUNCTION_MEMORY_SIZE, get_client, get_executor, iter_object_chunks, iter_lines, delete_objects,
+                   move_objects, concatenate_objects, MultipartCsvWriter)
 
 # Define the S3 bucket and partitions
 BUCKET_NAME = os.environ['BUCKET_NAME']
@@ -21,109 +21,424 @@ INPUT_PREFIX = 'source_data'
 OUTPUT_RAW_PREFIX = 'raw_data'
 OUTPUT_FAILED_PREFIX = 'unsuccessful_applicants'
 OUTPUT_PASSED_PREFIX = 'successful_applicants'
+OUTPUT_PREFIXES = [OUTPUT_RAW_PREFIX, OUTPUT_FAILED_PREFIX, OUTPUT_PASSED_PREFIX]
+# define where the processed source files are moved to and recorded
+ARCHIVE_PREFIX = 'archive'
+MANIFEST_KEY = 'manifest/processed_files.json'
+# define where the outputs of the shards of a source file are kept until they are compacted
+SHARD_PREFIX = 'shards'
+# maximum number of records held in memory at once
+BATCH_SIZE = int(os.getenv('BATCH_SIZE', 50000))
+# size of the byte ranges of a source file processed by separate invocations in event mode, 0 to never split files
+# Lambda allots CPU in proportion to the memory, so the shards follow the memory of the function to take about
+# the same time whatever it is, e.g. 128 MB for 1024 MB, the memory used being bounded by the batches and buffers
+SHARD_SIZE = int(os.getenv('SHARD_SIZE', FUNCTION_MEMORY_SIZE * 128 * 1024))
+# seconds after which the compaction of the shards of a file is taken over from an invocation which did not
+# finish it, the timeout of the function in the Terraform configuration
+COMPACTION_LEASE = int(os.getenv('COMPACTION_LEASE', 900))
+# files uploaded more recently are left to the invocations triggered by their upload events by the scheduled run
+SWEEP_MIN_AGE = int(os.getenv('SWEEP_MIN_AGE', 0))
+# the function invokes itself to process the shards, under the name set by the Lambda runtime
+FUNCTION_NAME = os.getenv('AWS_LAMBDA_FUNCTION_NAME')
 
+# the manifest and the shards are updated with the IfMatch and IfNoneMatch conditions of PutObject,
+# which older versions of botocore reject, so a recent botocore is packaged in the layer of the function
+# (see requirements.txt) rather than the one of the runtime, and the container fails early without it
+BOTOCORE_MIN_VERSION = (1, 36)
+if tuple(int(part) for part in botocore.__version__.split('.')[:2]) < BOTOCORE_MIN_VERSION:
+    raise RuntimeError(f'botocore {botocore.__version__} does not support conditional writes, '
+                       f"{'.'.join(map(str, BOTOCORE_MIN_VERSION))} or later is needed")
+
+# create the S3 client while the container is initialized rather than in the first invocation,
+# the client of the Lambda service is only created by the invocations splitting files
+get_client()
+# parse a date in each format while the container is initialized, so that the first invocation
+# does not have to import the date parser and compile the pattern of each format
+for _fmt in DATE_FORMATS:
+    datetime.strptime(datetime(2000, 1, 1).strftime(_fmt), _fmt)
+
+
+def read_manifest(bucket_name: str) -> Tuple[FileManifest, Optional[str]]:
+    # Load the manifest of the processed files with its ETag, or start an empty one
+    s3 = get_client()
+    try:
+        response = s3.get_object(Bucket=bucket_name, Key=MANIFEST_KEY)
+    except s3.exceptions.NoSuchKey:
+        return FileManifest(), None
+    return FileManifest.from_json(response['Body'].read().decode('utf-8')), response['ETag']
+
+
+def load_manifest(bucket_name: str) -> FileManifest:
+    return read_manifest(bucket_name)[0]
+
+
+def update_manifest(bucket_name: str, update: Callable[[FileManifest], None]):
+    # Apply an update to the manifest in S3
+    # Several invocations may update the manifest at once in event mode, so the manifest
+    # is only replaced if it has not changed since it was read, and the update is applied
+    # again to the new version otherwise
+    s3 = get_client()
+    while True:
+        manifest, etag = read_manifest(bucket_name)
+        update(manifest)
+        condition = {'IfMatch': etag} if etag is not None else {'IfNoneMatch': '*'}
+        try:
+            s3.put_object(Bucket=bucket_name, Key=MANIFEST_KEY, Body=manifest.to_json(), **condition)
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                raise
+
+
+def mark_processed(bucket_name: str, obj: Dict, rows: int, run_id: str):
+    update_manifest(bucket_name, lambda manifest: manifest.mark(
+      obj['Key'], 'processed', size=obj['Size'], mtime=obj['LastModified'].isoformat(),
+      content_hash=obj['ETag'].strip('"'), rows=rows, run_id=run_id))
+
+
+def is_processed(manifest: FileManifest, obj: Dict) -> bool:
+    # The ETag is used as the content hash of the file
+    return (manifest.is_unchanged(obj['Key'], obj['Size'], obj['LastModified'].isoformat())
+            or manifest.is_processed(obj['ETag'].strip('"')))
+
+
+def list_new_objects(bucket_name: str, prefix: str, manifest: FileManifest) -> List[Dict]:
+    # List the CSV files in the S3 bucket which have not been processed yet
+    # Files processed before, under the same or another name, are archived again
+    # Files uploaded less than SWEEP_MIN_AGE seconds ago are left to the invocations of their upload events
+    paginator = get_client().get_paginator('list_objects_v2')
+    new_objects = []
+    processed_objects = []
+    now = datetime.now(timezone.utc)
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            if obj['Key'].endswith('.csv'):
+                if is_processed(manifest, obj):
+                    print(f"Skipped s3://{bucket_name}/{obj['Key']} as it was already processed")
+                    processed_objects.append(obj)
+                elif (now - obj['LastModified']).total_seconds() >= SWEEP_MIN_AGE:
+                    new_objects.append(obj)
+    archive_objects(bucket_name, processed_objects)
+    return new_objects
+
+
+def head_object(bucket_name: str, key: str) -> Optional[Dict]:
+    # Get the size, modification time and ETag of an object, in the format of list_objects_v2,
+    # or None if the object does not exist anymore
+    try:
+        response = get_client().head_object(Bucket=bucket_name, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+            return None
+        raise
+    return {'Key': key, 'Size': response['ContentLength'], 'LastModified': response['LastModified'],
+            'ETag': response['ETag']}
+
+
+def iter_csv_batches(lines: Iterable[str], fieldnames: Optional[List[str]] = None,
+                     batch_size: int = BATCH_SIZE) -> Iterator[List[Dict]]:
+    # Yield the records of CSV lines in batches of at most batch_size records
+    # The lines are read with the header of the file when the fieldnames are not given
+    reader = csv.DictReader(lines, fieldnames=fieldnames)
+    batch = []
+    for row in reader:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+
+def read_header(bucket_name: str, obj: Dict) -> Tuple[List[str], int]:
+    # Read the header of a CSV file in S3 with its length in bytes
+    lines = iter_lines(iter_object_chunks(bucket_name, obj['Key'], obj['Size'], chunk_size=64 * 1024,
+                                          max_concurrency=1))
+    line = next(lines, '')
+    lines.close()
+    return next(csv.reader([line]), []), len(line.encode('utf-8'))
+
+
+def find_line_start(bucket_name: str, obj: Dict, offset: int, chunk_size: int = 64 * 1024) -> int:
+    # Return the offset of the first line of a file starting at or after the given offset
+    s3 = get_client()
+    position = offset - 1
+    while position < obj['Size']:
+        end = min(position + chunk_size, obj['Size']) - 1
+        chunk = s3.get_object(Bucket=bucket_name, Key=obj['Key'], Range=f'bytes={position}-{end}')['Body'].read()
+        newline = chunk.find(b'\n')
+        if newline >= 0:
+            return position + newline + 1
+        position = end + 1
+    return obj['Size']
+
+
+def shard_ranges(bucket_name: str, obj: Dict, start: int, shard_size: int = SHARD_SIZE) -> List[Tuple[int, int]]:
+    # Split the records of a source file into byte ranges of about shard_size bytes,
+    # moved forward to the start of the next line so that each record belongs to a single shard
+    # Records spanning several lines, with quoted line breaks, are not supported when files are split
+    if shard_size <= 0 or obj['Size'] - start <= shard_size:
+        return [(start, obj['Size'])]
+    boundaries = [start]
+    for offset in range(start + shard_size, obj['Size'], shard_size):
+        boundary = find_line_start(bucket_name, obj, offset)
+        if boundary > boundaries[-1]:
+            boundaries.append(boundary)
+    boundaries.append(obj['Size'])
+    return [(first, last) for first, last in zip(boundaries, boundaries[1:]) if last > first]
+
+
+def archive_key(obj: Dict) -> str:
+    # The ETag is used as the content hash of the file
+    content_hash = obj['ETag'].strip('"')
+    return f"{ARCHIVE_PREFIX}/{archive_name(obj['Key'], content_hash)}"
 
-def ingest_csv_files(prefix: str) -> List[Dict]:
-    # Loop through all the CSV files in the S3 bucket
-    # and store the records into a Python dictionary
-    # Remove the file from source_data folder to prevent duplication
-    all_data = []
-    s3 = boto3.resource('s3')
-    bucket = s3.Bucket(os.environ['BUCKET_NAME'])
-    for obj in bucket.objects.filter(Prefix=prefix):
-        if obj.key.endswith('.csv'):
-            obj_content = obj.get()['Body'].read().decode('utf-8').splitlines()
-            reader = csv.DictReader(obj_content)
-            for row in reader:
-                all_data.append(row)
-            s3.Object(bucket.name, obj.key).delete()
-    return all_data
-
-
-# define the function to preprocess the data
-def preprocess_records(records: List[Dict]) -> List[Dict]:
-    # perform initial processing of the records
-    preprocessed_records = []
-    for record in records:
-      preprocessed_record = {}
-      preprocessed_record['first_name'], preprocessed_record['last_name'] = split_name(record['name'])
-      preprocessed_record['email'] = record['email']
-      date_format = identify_date_format(record['date_of_birth'])
-      preprocessed_record['date_of_birth'] = format_date_of_birth(record['date_of_birth'], date_format)
-      preprocessed_record['mobile_no'] = record['mobile_no']
-      preprocessed_record['above_18'] = is_above_age(preprocessed_record['date_of_birth'], 18)
-      preprocessed_records.append(preprocessed_record)
-    return preprocessed_records
-
-
-# define the function to perform the validation check
-def validate_record(record: dict) -> str:
-    # perform validation checks on the record
-    # return valid if the record passes the checks and the error otherwise
-    if not has_correct_digits(record['mobile_no'], 8):
-        return 'invalid_mobile_number'
-    if not record['above_18']:
-        return 'below_18'
-    if not is_valid_email(record['email']):
-        return 'invalid_email'
-    if (is_empty_name(
-        record['first_name']) and is_empty_name(record['last_name']
-                                                )):
-        return 'missing_name'
-    return 'valid'
-
-
-def validate_records(records: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
-    # Perform validation checks on all the records
-    valid_records = []
-    invalid_records = []
-    for record in records:
-        check = validate_record(record)
-        if check == 'valid':
-            valid_records.append(record)
-        else:
-            record['validate_check'] = check
-            invalid_records.append(record)
-    return valid_records, invalid_records
 
+def archive_objects(bucket_name: str, objects: List[Dict]):
+    # Move the source files out of the input partition once they are processed
+    # instead of removing them, so that no data is lost if the run fails
+    # The ETag is added to their keys so that a file changed under the same key
+    # does not replace the archived copy of its previous version
+    if len(objects) > 0:
+        move_objects(bucket_name, {obj['Key']: archive_key(obj) for obj in objects})
+        print(f'Archived {len(objects)} files to s3://{bucket_name}/{ARCHIVE_PREFIX}/')
 
-# define the function to perform the transformation
-def transform_records(records: list) -> list:
-    # perform transformation on the record
-    # return the transformed record
-    for record in records:
-        record['membership_id'] = '_'.join([record['last_name'],
-                                            get_hashed_date(record['date_of_birth'])])
-    return records
+
+def list_keys(bucket_name: str, prefix: str) -> List[Dict]:
+    paginator = get_client().get_paginator('list_objects_v2')
+    return [obj for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix) for obj in page.get('Contents', [])]
 
 
 # define the function to unload the records
-def write_dict_to_s3_csv(records: list, bucket_name: str, prefix: str):
-    # write dict to target S3 bucket
+def output_key(prefix: str, timestamp: str, part: int) -> str:
     # append timestamp to prevent files from overwritten
-    if len(records) > 0:
-      timestamp = time.strftime("%Y%m%d-%H%M%S")
-      filename = f"{prefix}/{prefix}_{timestamp}.csv"
-      s3 = boto3.client("s3")
-      csv_buffer = io.StringIO()
-      writer = csv.DictWriter(csv_buffer, fieldnames=records[0].keys())
-      writer.writeheader()
-      writer.writerows(records)
-      s3.put_object(Bucket=bucket_name, Key=filename, Body=csv_buffer.getvalue())
-      print(f"{len(records)} records written to s3://{bucket_name}/{prefix}/{filename}")
+    # append the part number as the records of each source file are written to a file of their own
+    return f"{prefix}/{prefix}_{timestamp}_part{part:05d}.csv"
+
+
+def shard_key(run_id: str, prefix: str, index: int) -> str:
+    # the outputs of a shard are kept out of the output partitions until they are compacted
+    return f"{SHARD_PREFIX}/{run_id}/{prefix}/part{index:05d}.csv"
+
+
+def write_output(metrics: MetricsRecorder, writer: MultipartCsvWriter, records: list):
+    # Stream the records to S3, timed as the writing stage
+    with metrics.stage('writing') as stage:
+        writer.writerows(records)
+        stage.add_rows(rows_in=len(records), rows_out=len(records))
+
+
+def process_lines(metrics: MetricsRecorder, lines: Iterable[str], keys: List[str],
+                  fieldnames: Optional[List[str]] = None, header: bool = True) -> Tuple[int, Dict]:
+    # Process the records of CSV lines batch by batch and stream the raw, unsuccessful and
+    # successful records to the given keys, completed once all the batches are processed
+    # Return the number of records with the columns of each output, None if it has no record
+    rows = 0
+    with MultipartCsvWriter(BUCKET_NAME, keys[0], header=header) as raw_writer, \
+         MultipartCsvWriter(BUCKET_NAME, keys[1], header=header) as failed_writer, \
+         MultipartCsvWriter(BUCKET_NAME, keys[2], header=header) as passed_writer:
+        for raw_data in metrics.iter_stage('ingestion', iter_csv_batches(lines, fieldnames)):
+            rows += len(raw_data)
+            write_output(metrics, raw_writer, raw_data)
+
+            # Perform data processing
+            with metrics.stage('preprocessing') as stage:
+                preprocessed_data = preprocess_records(raw_data)
+                stage.add_rows(rows_in=len(raw_data), rows_out=len(preprocessed_data))
+            with metrics.stage('validation') as stage:
+                valid_data, invalid_data = validate_records(preprocessed_data)
+                stage.add_rows(rows_in=len(preprocessed_data), rows_out=len(valid_data))
+                stage.add_rejections(record['validate_check'] for record in invalid_data)
+            with metrics.stage('transformation') as stage:
+                transformed_data = transform_records(valid_data)
+                stage.add_rows(rows_in=len(valid_data), rows_out=len(transformed_data))
+
+            # Write output files to S3
+            write_output(metrics, failed_writer, invalid_data)
+            write_output(metrics, passed_writer, transformed_data)
+    writers = [raw_writer, failed_writer, passed_writer]
+    return rows, {prefix: writer.fieldnames for prefix, writer in zip(OUTPUT_PREFIXES, writers)}
+
+
+def process_object(metrics: MetricsRecorder, obj: Dict, run_id: str, part: int) -> int:
+    # Process a whole source file into one part file per output
+    lines = iter_lines(iter_object_chunks(BUCKET_NAME, obj['Key'], obj['Size']))
+    rows, _ = process_lines(metrics, lines, [output_key(prefix, run_id, part) for prefix in OUTPUT_PREFIXES])
+    return rows
+
+
+def process_sweep(metrics: MetricsRecorder, timestamp: str):
+    # Process all the new files of the input partition, one after the other
+    # The outputs of each file are completed before the file is recorded in the manifest,
+    # so a retry after a failure or timeout resumes from the first unprocessed file
+    # without losing or duplicating outputs
+    # The processed files are archived together at the end of the invocation
+    manifest = load_manifest(BUCKET_NAME)
+    processed_objects = []
+    for part, obj in enumerate(list_new_objects(BUCKET_NAME, INPUT_PREFIX, manifest)):
+        rows = process_object(metrics, obj, timestamp, part)
+        mark_processed(BUCKET_NAME, obj, rows, timestamp)
+        processed_objects.append(obj)
+    archive_objects(BUCKET_NAME, processed_objects)
+
+
+def invoke_shards(shards: List[Dict]):
+    # Invoke the function asynchronously once per shard, so that the shards are processed concurrently
+    client = get_client('lambda')
+    invocations = [get_executor().submit(client.invoke, FunctionName=FUNCTION_NAME, InvocationType='Event',
+                                         Payload=json.dumps({'shard': shard}))
+                   for shard in shards]
+    for invocation in invocations:
+        invocation.result()
+
+
+def process_event(metrics: MetricsRecorder, event: Dict, timestamp: str):
+    # Process the files named in S3 ObjectCreated notifications
+    # A file smaller than SHARD_SIZE is processed by this invocation, while a larger one is split
+    # into line-aligned byte ranges processed by separate invocations and compacted by the last one
+    manifest = load_manifest(BUCKET_NAME)
+    for record in event['Records']:
+        created = record.get('eventName', '').startswith('ObjectCreated')
+        if not created or record['s3']['bucket']['name'] != BUCKET_NAME:
+            continue
+        key = unquote_plus(record['s3']['object']['key'])
+        if not key.startswith(f'{INPUT_PREFIX}/') or not key.endswith('.csv'):
+            continue
+        # S3 may deliver a notification more than once, after the file was archived
+        obj = head_object(BUCKET_NAME, key)
+        if obj is None:
+            print(f"Skipped s3://{BUCKET_NAME}/{key} as it does not exist anymore")
+            continue
+        if is_processed(manifest, obj):
+            print(f"Skipped s3://{BUCKET_NAME}/{key} as it was already processed")
+            archive_objects(BUCKET_NAME, [obj])
+            continue
+        content_hash = obj['ETag'].strip('"')
+        run_id = f"{timestamp}-{content_hash[:8]}"
+        fieldnames, header_size = read_header(BUCKET_NAME, obj)
+        ranges = shard_ranges(BUCKET_NAME, obj, header_size)
+        if len(ranges) == 1:
+            rows = process_object(metrics, obj, run_id, 0)
+            mark_processed(BUCKET_NAME, obj, rows, run_id)
+            archive_objects(BUCKET_NAME, [obj])
+        else:
+            print(f"Split s3://{BUCKET_NAME}/{key} into {len(ranges)} shards")
+            invoke_shards([{'key': key, 'size': obj['Size'], 'last_modified': obj['LastModified'].isoformat(),
+                            'etag': obj['ETag'], 'run_id': run_id, 'index': index, 'count': len(ranges),
+                            'start': start, 'end': end, 'fieldnames': fieldnames}
+                           for index, (start, end) in enumerate(ranges)])
+
+
+def process_shard(metrics: MetricsRecorder, shard: Dict):
+    # Process the records of a byte range of a source file into part files without header,
+    # then record that the shard is done with the columns of its outputs
+    # The invocation which completes the last shard compacts the parts of all the shards
+    run_id = shard['run_id']
+    lines = iter_lines(iter_object_chunks(BUCKET_NAME, shard['key'], shard['end'], start=shard['start']))
+    keys = [shard_key(run_id, prefix, shard['index']) for prefix in OUTPUT_PREFIXES]
+    rows, fieldnames = process_lines(metrics, lines, keys, fieldnames=shard['fieldnames'], header=False)
+    s3 = get_client()
+    s3.put_object(Bucket=BUCKET_NAME, Key=f"{SHARD_PREFIX}/{run_id}/done/{shard['index']:05d}.json",
+                  Body=json.dumps({'rows': rows, 'fieldnames': fieldnames}))
+    if len(list_keys(BUCKET_NAME, f'{SHARD_PREFIX}/{run_id}/done/')) < shard['count']:
+        return
+    if not claim_compaction(run_id, metrics.run_id):
+        return
+    with metrics.stage('compaction'):
+        compact_shards(shard)
+
+
+def claim_compaction(run_id: str, request_id: str) -> bool:
+    # Only one of the invocations completing the last shards at the same time compacts them, the one
+    # which creates the compacting marker with the ID of its request
+    # The marker is taken over by a retry of the same request, which Lambda only sends once the attempt
+    # holding it failed, or by any invocation once it is older than COMPACTION_LEASE
+    s3 = get_client()
+    key = f'{SHARD_PREFIX}/{run_id}/compacting'
+    body = json.dumps({'request_id': request_id})
+    try:
+        s3.put_object(Bucket=BUCKET_NAME, Key=key, Body=body, IfNoneMatch='*')
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+            raise
+    try:
+        marker = s3.get_object(Bucket=BUCKET_NAME, Key=key)
+    except ClientError as e:
+        # the marker is deleted once the shards are compacted
+        if e.response['Error']['Code'] == 'NoSuchKey':
+            return False
+        raise
+    try:
+        holder = json.loads(marker['Body'].read()).get('request_id')
+    except ValueError:
+        holder = None
+    age = (datetime.now(timezone.utc) - marker['LastModified']).total_seconds()
+    if holder != request_id and age < COMPACTION_LEASE:
+        return False
+    try:
+        s3.put_object(Bucket=BUCKET_NAME, Key=key, Body=body, IfMatch=marker['ETag'])
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict', 'NoSuchKey'):
+            return False
+        raise
+    print(f"Took over the compaction of {run_id} from request {holder}, {age:.0f} seconds after it started")
+    return True
+
+
+def compact_shards(shard: Dict):
+    # Concatenate the parts of the shards of a source file into one file per output,
+    # mostly copied by S3 without being downloaded, then record and archive the source file
+    run_id = shard['run_id']
+    rows = 0
+    fieldnames = {}
+    for done in list_keys(BUCKET_NAME, f'{SHARD_PREFIX}/{run_id}/done/'):
+        body = json.loads(get_client().get_object(Bucket=BUCKET_NAME, Key=done['Key'])['Body'].read())
+        rows += body['rows']
+        for prefix, columns in body['fieldnames'].items():
+            fieldnames[prefix] = fieldnames.get(prefix) or columns
+    for prefix in OUTPUT_PREFIXES:
+        if fieldnames.get(prefix) is None:
+            continue
+        header = io.StringIO()
+        csv.DictWriter(header, fieldnames=fieldnames[prefix]).writeheader()
+        parts = sorted((part['Key'], part['Size'])
+                       for part in list_keys(BUCKET_NAME, f'{SHARD_PREFIX}/{run_id}/{prefix}/'))
+        key = output_key(prefix, run_id, 0)
+        concatenate_objects(BUCKET_NAME, parts, key, header=header.getvalue().encode('utf-8'))
+        print(f"{len(parts)} shards compacted to s3://{BUCKET_NAME}/{key}")
+    obj = {'Key': shard['key'], 'Size': shard['size'], 'ETag': shard['etag'],
+           'LastModified': datetime.fromisoformat(shard['last_modified'])}
+    mark_processed(BUCKET_NAME, obj, rows, run_id)
+    delete_objects(BUCKET_NAME, [part['Key'] for part in list_keys(BUCKET_NAME, f'{SHARD_PREFIX}/{run_id}/')])
+    archive_objects(BUCKET_NAME, [obj])
 
 
 def lambda_handler(event, context):
-    # Read CSV files from S3
-    raw_data = ingest_csv_files(INPUT_PREFIX)
-    if len(raw_data) > 0:
-        write_dict_to_s3_csv(raw_data, BUCKET_NAME, OUTPUT_RAW_PREFIX)
-
-    # Perform data processing
-    preprocessed_data = preprocess_records(raw_data)
-    valid_data, invalid_data = validate_records(preprocessed_data)
-    transformed_data = transform_records(valid_data)
-
-    # Write output files to S3
-    write_dict_to_s3_csv(invalid_data, BUCKET_NAME, OUTPUT_FAILED_PREFIX)
-    write_dict_to_s3_csv(transformed_data, BUCKET_NAME, OUTPUT_PASSED_PREFIX)
+    # Read CSV files from S3 batch by batch so that memory is bounded by the batch size
+    # The outputs of each file are uploaded in parts while its batches are processed
+    # The function is invoked in one of three modes:
+    # - by the hourly schedule, to process all the new files of the input partition
+    # - by S3 ObjectCreated notifications, to process the uploaded files only
+    # - by itself, with a shard of a large uploaded file to process
+    # The metrics of each stage are summed over all the batches and exported at the end,
+    # in the CloudWatch embedded metric format when PIPELINE_METRICS_EXPORTERS includes emf
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    event = event or {}
+    if 'shard' in event:
+        mode = 'shard'
+    elif 'Records' in event:
+        mode = 'event'
+    else:
+        mode = 'sweep'
+    metrics = MetricsRecorder('process_membership_applications', getattr(context, 'aws_request_id', timestamp),
+                              task=mode)
+    try:
+        if mode == 'shard':
+            process_shard(metrics, event['shard'])
+        elif mode == 'event':
+            process_event(metrics, event, timestamp)
+        else:
+            process_sweep(metrics, timestamp)
+    finally:
+        metrics.export()
@@ -0,0 +1,411 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import codecs
+import csv
+import io
+import os
+import threading
+# botocore is used without boto3, whose import of s3transfer only adds to the cold start of the Lambda
+import botocore.session
+from botocore.config import Config
+
+
+# maximum number of concurrent requests to S3, which is also the size of the connection pool
+S3_MAX_CONCURRENCY = int(os.getenv('S3_MAX_CONCURRENCY', 8))
+# size of the byte ranges read concurrently from an object
+S3_READ_CHUNK_SIZE = int(os.getenv('S3_READ_CHUNK_SIZE', 4 * 1024 * 1024))
+# memory of the function in MB, set by the Lambda runtime, and the smallest memory of a function otherwise
+FUNCTION_MEMORY_SIZE = int(os.getenv('AWS_LAMBDA_FUNCTION_MEMORY_SIZE', 128))
+# maximum number of bytes held by the requests in flight, half for the ranges read ahead and half for the
+# parts being uploaded, a quarter of the memory of the function by default so that the rest is left to the
+# runtime, the batches of records and the buffers of the writers, see the README
+S3_BUFFER_SIZE = int(os.getenv('S3_BUFFER_SIZE', FUNCTION_MEMORY_SIZE * 1024 * 1024 // 4))
+# minimum size of the parts of a multipart upload required by S3 for all but the last part
+MIN_PART_SIZE = 5 * 1024 * 1024
+# size of the parts of a multipart upload
+S3_PART_SIZE = max(int(os.getenv('S3_PART_SIZE', 8 * 1024 * 1024)), MIN_PART_SIZE)
+# maximum number of keys of a DeleteObjects request
+DELETE_BATCH_SIZE = 1000
+
+_session = None
+_clients = {}
+_executor = None
+
+
+class BufferBudget:
+    """
+    Bytes of the objects held in memory by the requests in flight of the process, shared by its readers
+    or writers whatever their number.
+
+    The bytes are acquired before a request is sent and released once its data is no longer held. A request
+    is always admitted when nothing else is held, so that a part larger than the budget cannot wait forever.
+
+    Args:
+        size (int): The number of bytes of the budget.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.used = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, nbytes: int, wait: bool = True) -> bool:
+        """Acquires bytes, waiting for other requests to release them unless wait is False."""
+        with self._condition:
+            while self.used > 0 and self.used + nbytes > self.size:
+                if not wait:
+                    return False
+                self._condition.wait()
+            self.used += nbytes
+            return True
+
+    def release(self, nbytes: int):
+        with self._condition:
+            self.used -= nbytes
+            self._condition.notify_all()
+
+    def release_when_done(self, future, nbytes: int):
+        """Releases bytes once a request completes, fails or is cancelled."""
+        future.add_done_callback(lambda _: self.release(nbytes))
+
+
+# the ranges read ahead only wait for each other and the uploads for each other, so that a writer waiting
+# for its parts to be sent cannot wait for the reader it is fed by to release its ranges
+READ_BUFFER = BufferBudget(S3_BUFFER_SIZE // 2)
+WRITE_BUFFER = BufferBudget(S3_BUFFER_SIZE // 2)
+
+
+def get_client(service_name: str = 's3'):
+    """
+    Returns the client of an AWS service shared by all the requests, created on first use
+    and kept across warm invocations. The clients share one botocore session, so that the
+    credentials and the service data are loaded once per container, and keep up to
+    S3_MAX_CONCURRENCY connections open so that concurrent requests do not wait for a connection.
+
+    Args:
+        service_name (str): The name of the service, e.g. 's3' or 'lambda'.
+    """
+    global _session
+    if service_name not in _clients:
+        if _session is None:
+            _session = botocore.session.get_session()
+        _clients[service_name] = _session.create_client(
+          service_name, config=Config(max_pool_connections=S3_MAX_CONCURRENCY,
+                                      retries={'max_attempts': 5, 'mode': 'standard'}))
+    return _clients[service_name]
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Returns the pool of threads sending the concurrent requests to S3."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=S3_MAX_CONCURRENCY)
+    return _executor
+
+
+def _get_range(bucket_name: str, key: str, start: int, end: int) -> bytes:
+    response = get_client().get_object(Bucket=bucket_name, Key=key, Range=f'bytes={start}-{end}')
+    return response['Body'].read()
+
+
+def iter_object_chunks(bucket_name: str, key: str, size: int, chunk_size: int = S3_READ_CHUNK_SIZE,
+                       max_concurrency: int = S3_MAX_CONCURRENCY, start: int = 0) -> Iterator[bytes]:
+    """
+    Reads an object in byte ranges fetched concurrently.
+
+    At most max_concurrency ranges are downloaded ahead of the one being consumed, and only as
+    long as the ranges read ahead by all the readers fit in READ_BUFFER, so that the memory used
+    is bounded by the budget rather than by the number of readers. The range being consumed is
+    always downloaded. The ranges not downloaded yet are cancelled if the iterator is closed
+    before the end of the object.
+
+    Args:
+        bucket_name (str): The bucket of the object.
+        key (str): The key of the object.
+        size (int): The size of the object in bytes.
+        chunk_size (int): The size of the byte ranges.
+        max_concurrency (int): The maximum number of ranges downloaded at once.
+        start (int): The offset of the first byte to read.
+
+    Returns:
+        Iterator[bytes]: The content of the object from the start offset, range by range in order.
+    """
+    executor = get_executor()
+    ranges = deque((offset, min(offset + chunk_size, size)) for offset in range(start, size, chunk_size))
+    pending = deque()
+
+    def submit(wait: bool) -> bool:
+        first, end = ranges[0]
+        if not READ_BUFFER.acquire(end - first, wait=wait):
+            return False
+        ranges.popleft()
+        future = executor.submit(_get_range, bucket_name, key, first, end - 1)
+        pending.append((future, end - first))
+        return True
+
+    consumed = 0
+    try:
+        while ranges or pending:
+            # read ahead while the budget allows it, and always the next range when nothing is pending
+            while ranges and len(pending) < max_concurrency and submit(wait=not pending):
+                pass
+            future, nbytes = pending.popleft()
+            chunk = future.result()
+            consumed = nbytes
+            yield chunk
+            READ_BUFFER.release(consumed)
+            consumed = 0
+    finally:
+        READ_BUFFER.release(consumed)
+        for future, nbytes in pending:
+            future.cancel()
+            READ_BUFFER.release_when_done(future, nbytes)
+
+
+def iter_lines(chunks: Iterable[bytes], encoding: str = 'utf-8') -> Iterator[str]:
+    """
+    Splits a stream of bytes into lines, keeping the line endings so that the csv module
+    can read quoted values spanning several lines.
+
+    Args:
+        chunks (Iterable[bytes]): The content, in chunks which may split lines and multi-byte characters.
+        encoding (str): The encoding of the content.
+
+    Returns:
+        Iterator[str]: The lines of the content.
+    """
+    # the newline decoder holds back a trailing '\r' until it knows whether a '\n' follows
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=False)
+    remainder = ''
+    for chunk in chunks:
+        lines = io.StringIO(remainder + decoder.decode(chunk), newline='').readlines()
+        remainder = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        yield from lines
+    remainder += decoder.decode(b'', final=True)
+    if remainder:
+        yield remainder
+
+
+def delete_objects(bucket_name: str, keys: List[str]):
+    """
+    Deletes objects with one DeleteObjects request per 1000 keys.
+
+    Raises:
+        IOError: If any of the objects could not be deleted.
+    """
+    s3 = get_client()
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[start:start + DELETE_BATCH_SIZE]
+        response = s3.delete_objects(Bucket=bucket_name,
+                                     Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True})
+        errors = response.get('Errors', [])
+        if errors:
+            raise IOError(f"Failed to delete {len(errors)} objects from s3://{bucket_name}: "
+                          f"{[(error['Key'], error['Code']) for error in errors]}")
+
+
+def move_objects(bucket_name: str, keys: Dict[str, str]):
+    """
+    Moves objects within a bucket, copying them concurrently before deleting the sources in batches.
+
+    Args:
+        bucket_name (str): The bucket of the objects.
+        keys (Dict[str, str]): The new key of each object, by current key.
+    """
+    s3 = get_client()
+    copies = [get_executor().submit(s3.copy_object, Bucket=bucket_name, Key=new_key,
+                                    CopySource={'Bucket': bucket_name, 'Key': key})
+              for key, new_key in keys.items()]
+    # the sources are only deleted once all the copies have succeeded
+    for copy in copies:
+        copy.result()
+    delete_objects(bucket_name, list(keys))
+
+
+def concatenate_objects(bucket_name: str, sources: List[Tuple[str, int]], key: str, header: bytes = b''):
+    """
+    Concatenates objects into a new object with a multipart upload.
+
+    The sources of at least 5 MB are copied by S3 with UploadPartCopy without being downloaded.
+    As all the parts but the last must be of at least 5 MB, smaller sources and the header
+    are downloaded and gathered into parts, and a part which would be too small is completed
+    with the first bytes of the next source before the rest of that source is copied.
+
+    Args:
+        bucket_name (str): The bucket of the objects.
+        sources (List[Tuple[str, int]]): The key and size of each source, in order.
+        key (str): The key of the new object.
+        header (bytes): The content written before the sources, e.g. the header of a CSV.
+    """
+    s3 = get_client()
+    executor = get_executor()
+    upload_id = None
+    parts = []
+    buffer = bytearray(header)
+
+    def start_upload():
+        nonlocal upload_id
+        if upload_id is None:
+            upload_id = s3.create_multipart_upload(Bucket=bucket_name, Key=key)['UploadId']
+
+    def send_buffer():
+        nonlocal buffer
+        start_upload()
+        body = bytes(buffer)
+        buffer = bytearray()
+        WRITE_BUFFER.acquire(len(body))
+        part = executor.submit(s3.upload_part, Bucket=bucket_name, Key=key, UploadId=upload_id,
+                               PartNumber=len(parts) + 1, Body=body)
+        WRITE_BUFFER.release_when_done(part, len(body))
+        parts.append(part)
+
+    def copy_range(source_key: str, first: int, last: int):
+        start_upload()
+        parts.append(executor.submit(s3.upload_part_copy, Bucket=bucket_name, Key=key, UploadId=upload_id,
+                                     PartNumber=len(parts) + 1, CopySourceRange=f'bytes={first}-{last}',
+                                     CopySource={'Bucket': bucket_name, 'Key': source_key}))
+
+    try:
+        for source_key, size in sources:
+            offset = 0
+            if len(buffer) > 0:
+                needed = max(MIN_PART_SIZE - len(buffer), 0)
+                if size - needed >= MIN_PART_SIZE:
+                    # complete the buffer to a valid part with the start of the source, and copy the rest
+                    if needed > 0:
+                        buffer += _get_range(bucket_name, source_key, 0, needed - 1)
+                    offset = needed
+                    send_buffer()
+                else:
+                    buffer += b''.join(iter_object_chunks(bucket_name, source_key, size))
+                    offset = size
+                    if len(buffer) >= S3_PART_SIZE:
+                        send_buffer()
+            if offset < size:
+                if size - offset >= MIN_PART_SIZE:
+                    copy_range(source_key, offset, size - 1)
+                else:
+                    buffer += b''.join(iter_object_chunks(bucket_name, source_key, size, start=offset))
+        if upload_id is None:
+            s3.put_object(Bucket=bucket_name, Key=key, Body=bytes(buffer))
+            return
+        if len(buffer) > 0:
+            send_buffer()
+        etags = []
+        for part in parts:
+            response = part.result()
+            etags.append(response['CopyPartResult']['ETag'] if 'CopyPartResult' in response else response['ETag'])
+        s3.complete_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id,
+                                     MultipartUpload={'Parts': [{'PartNumber': number, 'ETag': etag}
+                                                                for number, etag in enumerate(etags, start=1)]})
+    except Exception:
+        if upload_id is not None:
+            for part in parts:
+                part.exception()
+            s3.abort_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id)
+        raise
+
+
+class MultipartCsvWriter:
+    """
+    Writes records to a CSV object in S3 while they are being generated.
+
+    The CSV is buffered in memory up to part_size bytes, then sent as a part of a
+    multipart upload in a background thread while the next records are written. The parts
+    in flight of all the writers are bounded by WRITE_BUFFER, so that a writer waits for
+    parts to be sent rather than holding more of them than the memory allows.
+    An object smaller than a part is sent with a single PutObject request instead.
+    Nothing is written if the upload fails or no record is written.
+
+    Args:
+        bucket_name (str): The bucket of the object.
+        key (str): The key of the object.
+        part_size (int): The size of the parts, of at least 5 MB.
+        fieldnames (Optional[List[str]]): The columns of the CSV. Defaults to the keys of the first record.
+        header (bool): Whether to write the header, e.g. False for a piece of a CSV concatenated later.
+
+    Example:
+        >>> with MultipartCsvWriter('bucket', 'successful_applicants/successful_applicants.csv') as writer:
+        ...     for records in batches:
+        ...         writer.writerows(records)
+    """
+
+    def __init__(self, bucket_name: str, key: str, part_size: int = S3_PART_SIZE,
+                 fieldnames: Optional[List[str]] = None, header: bool = True):
+        self.bucket_name = bucket_name
+        self.key = key
+        self.part_size = part_size
+        self.fieldnames = fieldnames
+        self.header = header
+        self.rows = 0
+        self._buffer = io.StringIO()
+        self._writer = None
+        self._upload_id = None
+        self._parts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def writerows(self, records: List[Dict]):
+        """Appends the records to the CSV, sending a part once the buffer reaches the part size."""
+        if len(records) == 0:
+            return
+        if self._writer is None:
+            if self.fieldnames is None:
+                self.fieldnames = list(records[0].keys())
+            self._writer = csv.DictWriter(self._buffer, fieldnames=self.fieldnames)
+            if self.header:
+                self._writer.writeheader()
+        self._writer.writerows(records)
+        self.rows += len(records)
+        if self._buffer.tell() >= self.part_size:
+            self._send_part()
+
+    def _send_part(self):
+        s3 = get_client()
+        if self._upload_id is None:
+            self._upload_id = s3.create_multipart_upload(Bucket=self.bucket_name, Key=self.key)['UploadId']
+        body = self._buffer.getvalue().encode('utf-8')
+        self._buffer = io.StringIO()
+        self._writer = csv.DictWriter(self._buffer, fieldnames=self.fieldnames)
+        # wait for parts to be sent when those in flight use the budget, so that memory stays bounded
+        WRITE_BUFFER.acquire(len(body))
+        part = get_executor().submit(s3.upload_part, Bucket=self.bucket_name, Key=self.key,
+                                     UploadId=self._upload_id, PartNumber=len(self._parts) + 1, Body=body)
+        WRITE_BUFFER.release_when_done(part, len(body))
+        self._parts.append(part)
+
+    def close(self):
+        """Sends the rest of the CSV and completes the upload."""
+        if self.rows == 0:
+            return
+        s3 = get_client()
+        if self._upload_id is None:
+            s3.put_object(Bucket=self.bucket_name, Key=self.key, Body=self._buffer.getvalue().encode('utf-8'))
+        else:
+            if self._buffer.tell() > 0:
+                self._send_part()
+            try:
+                parts = [{'PartNumber': number, 'ETag': part.result()['ETag']}
+                         for number, part in enumerate(self._parts, start=1)]
+                s3.complete_multipart_upload(Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id,
+                                             MultipartUpload={'Parts': parts})
+            except Exception:
+                self.abort()
+                raise
+        print(f"{self.rows} records written to s3://{self.bucket_name}/{self.key}")
+
+    def abort(self):
+        """Cancels the upload, so that S3 does not keep its parts."""
+        if self._upload_id is not None:
+            for part in self._parts:
+                part.exception()
+            get_client().abort_multipart_upload(Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id)
+            self._upload_id = None
@@ -6,10 +6,58 @@ CREATE TABLE items (
   weight NUMERIC(10,2) NOT NULL
 );
 
+CREATE TABLE members (
+  membership_id VARCHAR(255) PRIMARY KEY,
+  first_name VARCHAR(255) NOT NULL,
+  last_name VARCHAR(255) NOT NULL,
+  email VARCHAR(255) NOT NULL,
+  date_of_birth DATE NOT NULL,
+  mobile_no VARCHAR(20) NOT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT now(),
+  updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
 CREATE TABLE transactions (
   id SERIAL PRIMARY KEY,
-  membership_id INTEGER NOT NULL,
+  membership_id VARCHAR(255) NOT NULL,
   item_ids INTEGER[] NOT NULL,
   total_price NUMERIC(10,2) NOT NULL,
   total_weight NUMERIC(10,2) NOT NULL
 );
+
+-- the items of the transactions, written with transactions.item_ids by the writers of the transactions,
+-- without foreign keys like the array, as checking them doubles the time to write the purchases
+CREATE TABLE transaction_items (
+  transaction_id INTEGER NOT NULL,
+  item_id INTEGER NOT NULL,
+  PRIMARY KEY (transaction_id, item_id)
+);
+
+CREATE INDEX transaction_items_item_id_idx ON transaction_items (item_id);
+CREATE INDEX transactions_membership_id_idx ON transactions (membership_id, total_price);
+
+-- the spending of the members and purchases of the items, summed up to the transaction
+-- last_transaction_id of summary_watermarks by refresh_summaries, for the reports
+CREATE TABLE member_spend (
+  membership_id VARCHAR(255) PRIMARY KEY,
+  total_spending NUMERIC(14,2) NOT NULL,
+  total_transactions BIGINT NOT NULL
+);
+
+CREATE INDEX member_spend_total_spending_idx ON member_spend (total_spending DESC);
+
+CREATE TABLE item_purchase_counts (
+  item_id INTEGER PRIMARY KEY,
+  total_purchases BIGINT NOT NULL
+);
+
+CREATE INDEX item_purchase_counts_total_purchases_idx ON item_purchase_counts (total_purchases DESC);
+
+CREATE TABLE summary_watermarks (
+  summary VARCHAR(255) PRIMARY KEY,
+  last_transaction_id INTEGER NOT NULL,
+  refreshed_at TIMESTAMP
+);
+
+INSERT INTO summary_watermarks (summary, last_transaction_id)
+VALUES ('member_spend', 0), ('item_purchase_counts', 0);
@@ -0,0 +1,14 @@
+-- Adds the members table loaded from the successful applicants of the data pipelines,
+-- whose membership ids are <last_name>_<hash>, and stores the membership ids of the transactions as such
+CREATE TABLE IF NOT EXISTS members (
+  membership_id VARCHAR(255) PRIMARY KEY,
+  first_name VARCHAR(255) NOT NULL,
+  last_name VARCHAR(255) NOT NULL,
+  email VARCHAR(255) NOT NULL,
+  date_of_birth DATE NOT NULL,
+  mobile_no VARCHAR(20) NOT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT now(),
+  updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+ALTER TABLE transactions ALTER COLUMN membership_id TYPE VARCHAR(255);
@@ -0,0 +1,30 @@
+-- Adds the transaction_items table, with a row per item of a transaction, so that the purchases of an item
+-- are read from an index rather than by searching the item_ids array of every transaction, and indexes
+-- the transactions by member to aggregate the spending of the members from the index.
+-- The primary key and indexes are added after the existing transactions are copied, which is much faster
+-- than checking them for every row. Like item_ids, the table has no foreign keys, which would double the
+-- time to write the purchases; it is written by the writers of the transactions, with item_ids.
+-- Like the other migrations it can be run again: the transactions are only copied into an empty table.
+-- The tables are vacuumed by a separate command once it is committed, see the README.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS transaction_items (
+  transaction_id INTEGER NOT NULL,
+  item_id INTEGER NOT NULL
+);
+
+INSERT INTO transaction_items (transaction_id, item_id)
+SELECT DISTINCT id, unnest(item_ids)
+FROM transactions
+WHERE NOT EXISTS (SELECT 1 FROM transaction_items);
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'transaction_items'::regclass AND contype = 'p') THEN
+    ALTER TABLE transaction_items ADD PRIMARY KEY (transaction_id, item_id);
+  END IF;
+END $$;
+CREATE INDEX IF NOT EXISTS transaction_items_item_id_idx ON transaction_items (item_id);
+CREATE INDEX IF NOT EXISTS transactions_membership_id_idx ON transactions (membership_id, total_price);
+
+COMMIT;
@@ -0,0 +1,30 @@
+-- Adds the member_spend and item_purchase_counts summary tables read by the reports, which are filled
+-- by running refresh_summaries once the tables are created
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS member_spend (
+  membership_id VARCHAR(255) PRIMARY KEY,
+  total_spending NUMERIC(14,2) NOT NULL,
+  total_transactions BIGINT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS member_spend_total_spending_idx ON member_spend (total_spending DESC);
+
+CREATE TABLE IF NOT EXISTS item_purchase_counts (
+  item_id INTEGER PRIMARY KEY,
+  total_purchases BIGINT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS item_purchase_counts_total_purchases_idx ON item_purchase_counts (total_purchases DESC);
+
+CREATE TABLE IF NOT EXISTS summary_watermarks (
+  summary VARCHAR(255) PRIMARY KEY,
+  last_transaction_id INTEGER NOT NULL,
+  refreshed_at TIMESTAMP
+);
+
+INSERT INTO summary_watermarks (summary, last_transaction_id)
+VALUES ('member_spend', 0), ('item_purchase_counts', 0)
+ON CONFLICT (summary) DO NOTHING;
+
+COMMIT;
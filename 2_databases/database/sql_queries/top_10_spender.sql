@@ -1,5 +1,20 @@
-SELECT membership_id, SUM(total_price) AS total_spending
-FROM transactions
-GROUP BY membership_id
+-- The spending summed up in member_spend, plus the transactions added since its last refresh.
+-- A member who is not in the top 10 of member_spend can only get in with new transactions,
+-- so the top 10 is found among the top 10 of member_spend and the members of new transactions.
+WITH new_spend AS (
+  SELECT membership_id, SUM(total_price) AS total_spending
+  FROM transactions
+  WHERE id > (SELECT last_transaction_id FROM summary_watermarks WHERE summary = 'member_spend')
+  GROUP BY membership_id
+), candidates AS (
+  (SELECT membership_id FROM member_spend ORDER BY total_spending DESC LIMIT 10)
+  UNION
+  SELECT membership_id FROM new_spend
+)
+SELECT candidates.membership_id,
+       COALESCE(member_spend.total_spending, 0) + COALESCE(new_spend.total_spending, 0) AS total_spending
+FROM candidates
+LEFT JOIN member_spend ON member_spend.membership_id = candidates.membership_id
+LEFT JOIN new_spend ON new_spend.membership_id = candidates.membership_id
 ORDER BY total_spending DESC
 LIMIT 10;
@@ -1,7 +1,22 @@
-SELECT items.id, items.name, COUNT(*) AS total_purchases
-FROM items
-JOIN transactions
-ON items.id = ANY (transactions.item_ids)
-GROUP BY items.id, items.name
+-- The purchases counted in item_purchase_counts, plus the transactions added since its last refresh.
+-- An item which is not in the top 3 of item_purchase_counts can only get in with new purchases,
+-- so the top 3 is found among the top 3 of item_purchase_counts and the items of new transactions.
+WITH new_purchases AS (
+  SELECT item_id, COUNT(*) AS total_purchases
+  FROM transaction_items
+  WHERE transaction_id > (SELECT last_transaction_id FROM summary_watermarks WHERE summary = 'item_purchase_counts')
+  GROUP BY item_id
+), candidates AS (
+  (SELECT item_id FROM item_purchase_counts ORDER BY total_purchases DESC LIMIT 3)
+  UNION
+  SELECT item_id FROM new_purchases
+)
+SELECT items.id, items.name,
+       COALESCE(item_purchase_counts.total_purchases, 0) + COALESCE(new_purchases.total_purchases, 0)
+         AS total_purchases
+FROM candidates
+JOIN items ON items.id = candidates.item_id
+LEFT JOIN item_purchase_counts ON item_purchase_counts.item_id = candidates.item_id
+LEFT JOIN new_purchases ON new_purchases.item_id = candidates.item_id
 ORDER BY total_purchases DESC
 LIMIT 3;
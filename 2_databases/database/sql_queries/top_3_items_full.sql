@@ -0,0 +1,11 @@
+SELECT items.id, items.name, top_items.total_purchases
+FROM (
+  SELECT item_id, COUNT(*) AS total_purchases
+  FROM transaction_items
+  GROUP BY item_id
+  ORDER BY total_purchases DESC
+  LIMIT 3
+) top_items
+JOIN items
+ON items.id = top_items.item_id
+ORDER BY top_items.total_purchases DESC;
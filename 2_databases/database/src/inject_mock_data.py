@@ -1,66 +1,230 @@
 import argparse
-import os
+import io
 import random
-import psycopg2
-from dotenv import load_dotenv
+import time
+from ecommerce_db import db
 
 
-# Load environment variables from .env file
-load_dotenv()
+# Names of the mock members, picked in turn so that a member number always gets the same name
+FIRST_NAMES = ['Jane', 'John', 'Wei', 'Siti', 'Ravi', 'Mei', 'Ahmad', 'Priya', 'David', 'Nur']
+LAST_NAMES = ['Doe', 'Smith', 'Tan', 'Lim', 'Kumar', 'Lee', 'Wong', 'Rahman', 'Ng', 'Chua']
+
+# Mock members get membership ids in the format of the data pipelines, e.g. Tan_0002a, so that
+# member number i has the same id on every run and existing members are not inserted twice
+INSERT_MEMBERS = """
+INSERT INTO members (membership_id, first_name, last_name, email, date_of_birth, mobile_no)
+SELECT membership_id, first_name, last_name, email, date_of_birth, mobile_no
+FROM mock_members
+ON CONFLICT (membership_id) DO NOTHING
+"""
+
+GENERATE_MEMBERS = """
+INSERT INTO mock_members
+SELECT membership_id, first_name, last_name,
+       lower(first_name) || '.' || lower(membership_id) || '@example.com',
+       date '1950-01-01' + floor(random() * 19000)::int,
+       (10000000 + floor(random() * 90000000)::int)::text
+FROM (
+  SELECT (%(first_names)s::text[])[1 + i %% %(first_name_count)s] AS first_name,
+         (%(last_names)s::text[])[1 + i %% %(last_name_count)s] AS last_name,
+         (%(last_names)s::text[])[1 + i %% %(last_name_count)s] || '_' || lpad(to_hex(i), 5, '0') AS membership_id
+  FROM generate_series(%(start)s, %(stop)s) i
+) m
+"""
+
+GENERATE_ITEMS = """
+INSERT INTO items (name, manufacturer, cost, weight)
+SELECT 'Item ' || i, 'Manufacturer ' || i,
+       round((10 + random() * 990)::numeric, 2), round((0.1 + random() * 49.9)::numeric, 2)
+FROM generate_series(%(start)s, %(stop)s) i
+"""
+
+# The members and items are ranked in a random order, and a rank is drawn for the member and
+# each of the 1 to 5 items of a transaction. The volatile CTE is evaluated once, so that each
+# transaction keeps its member and number of items, and the member is only looked up once the
+# items of the transactions are aggregated.
+RANK_MEMBERS = """
+CREATE TEMPORARY TABLE mock_member_ranks ON COMMIT DROP AS
+SELECT row_number() OVER (ORDER BY random()) AS rank, membership_id
+FROM (SELECT membership_id FROM mock_members ORDER BY membership_id) m
+"""
+
+RANK_ITEMS = """
+CREATE TEMPORARY TABLE mock_item_ranks ON COMMIT DROP AS
+SELECT row_number() OVER (ORDER BY random()) AS rank, id, cost, weight
+FROM (SELECT id, cost, weight FROM items WHERE id > %(last_item_id)s ORDER BY id) i
+"""
+
+GENERATE_TRANSACTIONS = """
+WITH picked AS (
+  SELECT g,
+         1 + floor(%(member_count)s * power(random(), %(skew)s))::int AS member_rank,
+         1 + floor(random() * 5)::int AS item_count
+  FROM generate_series(1, %(count)s) g
+), bought AS (
+  SELECT g, member_rank, array_agg(i.id) AS item_ids, sum(i.cost) AS total_price, sum(i.weight) AS total_weight
+  FROM (SELECT DISTINCT g, member_rank, 1 + floor(%(item_count)s * power(random(), %(skew)s))::int AS item_rank
+        FROM picked, generate_series(1, picked.item_count) p) b
+  JOIN mock_item_ranks i ON i.rank = b.item_rank
+  GROUP BY g, member_rank
+)
+INSERT INTO transactions (membership_id, item_ids, total_price, total_weight)
+SELECT m.membership_id, item_ids, total_price, total_weight
+FROM bought
+JOIN mock_member_ranks m ON m.rank = bought.member_rank
+"""
+
+# The items of the new transactions are copied from their item_ids arrays in one statement at the end
+ADD_TRANSACTION_ITEMS = """
+INSERT INTO transaction_items (transaction_id, item_id)
+SELECT id, unnest(item_ids)
+FROM transactions
+WHERE id > %(last_transaction_id)s
+"""
+
+
+def mock_member(i):
+    first_name = FIRST_NAMES[i % len(FIRST_NAMES)]
+    last_name = LAST_NAMES[i % len(LAST_NAMES)]
+    membership_id = f'{last_name}_{i:05x}'
+    date_of_birth = f'{random.randint(1950, 2001)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}'
+    mobile_no = str(random.randint(10000000, 99999999))
+    return (f'{membership_id}\t{first_name}\t{last_name}\t{first_name.lower()}.{membership_id.lower()}@example.com'
+            f'\t{date_of_birth}\t{mobile_no}\n')
+
+
+def mock_item(i):
+    return f'Item {i}\tManufacturer {i}\t{random.uniform(10, 1000):.2f}\t{random.uniform(0.1, 50):.2f}\n'
+
+
+def mock_transactions(count, member_ids, items, skew):
+    # u ** skew is close to 0 for most draws, so the first members and items of the lists take most of
+    # the transactions, like the heavy spenders and best sellers of a real shop; skew 1 is uniform
+    rand = random.random
+    member_count = len(member_ids)
+    item_count = len(items)
+    for _ in range(count):
+        membership_id = member_ids[int(member_count * rand() ** skew)]
+        bought = {int(item_count * rand() ** skew) for _ in range(1 + int(rand() * 5))}
+        price = weight = 0
+        for item in bought:
+            price += items[item][1]
+            weight += items[item][2]
+        item_ids = ','.join(str(items[item][0]) for item in bought)
+        yield f'{membership_id}\t{{{item_ids}}}\t{price // 100}.{price % 100:02d}\t{weight // 100}.{weight % 100:02d}\n'
+
+
+def report(label, done, total, start):
+    elapsed = time.perf_counter() - start
+    print(f'{label}: {done:,}/{total:,} rows in {elapsed:.1f}s ({done / max(elapsed, 1e-9):,.0f} rows/s)')
+
+
+def copy_rows(cur, table, rows, total, batch_size, label):
+    # Rows are formatted as COPY text and sent in batches, so that memory does not grow with the count
+    start = time.perf_counter()
+    done = 0
+    while done < total:
+        count = min(batch_size, total - done)
+        buffer = io.StringIO(''.join(next(rows) for _ in range(count)))
+        cur.copy_expert(f'COPY {table} FROM STDIN', buffer)
+        done += count
+        report(label, done, total, start)
+
+
+def generate_rows(cur, statement, params, total, batch_size, label):
+    # Rows are generated by the database with generate_series, one batch per statement
+    start = time.perf_counter()
+    done = 0
+    while done < total:
+        count = min(batch_size, total - done)
+        cur.execute(statement, dict(params, start=done + 1, stop=done + count, count=count))
+        done += count
+        report(label, done, total, start)
+
 
 # Parse command-line arguments
 parser = argparse.ArgumentParser()
 parser.add_argument('--items', '-i', type=int, default=50, help='number of items to insert')
 parser.add_argument('--transactions', '-t', type=int, default=100, help='number of transactions to insert')
 parser.add_argument('--members', '-m', type=int, default=10, help='number of members to insert')
+parser.add_argument('--mode', choices=['copy', 'server'], default='copy',
+                    help='generate the rows in Python and send them with COPY, or in the database')
+parser.add_argument('--seed', '-s', type=int, help='seed of the random generator, to reproduce a run')
+parser.add_argument('--skew', type=float, default=2.0,
+                    help='how much the most popular items and members dominate the transactions, 1 for uniform')
+parser.add_argument('--batch-size', '-b', type=int, default=100000, help='number of rows sent at once')
 args = parser.parse_args()
+if args.items < 1 or args.members < 1 or args.skew < 1 or args.batch_size < 1:
+    parser.error('--items, --members, --skew and --batch-size should be at least 1')
 
-# Database connection settings
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')
-
-# Connect to the database
-conn = psycopg2.connect(
-  host=DB_HOST,
-  port=DB_PORT,
-  dbname=DB_NAME,
-  user=DB_USER,
-  password=DB_PASSWORD
-)
+seed = args.seed if args.seed is not None else random.randrange(2 ** 31)
+random.seed(seed)
+print(f'Using seed {seed}')
+
+# Insert the mock data in one transaction, committed once all of it is inserted
+with db.connection() as conn, conn.cursor() as cur:
+    # setseed takes a number from -1 to 1, so any seed, also negative or larger ones, is folded into [0, 1)
+    cur.execute('SELECT setseed(%s)', (seed % 2 ** 31 / 2 ** 31,))
+
+    # Generate the members into a staging table first, which is merged into the members table
+    cur.execute('CREATE TEMPORARY TABLE mock_members (LIKE members INCLUDING DEFAULTS) ON COMMIT DROP')
+    cur.execute('ALTER TABLE mock_members DROP COLUMN created_at, DROP COLUMN updated_at')
+    if args.mode == 'copy':
+        copy_rows(cur, 'mock_members', (mock_member(i) for i in range(1, args.members + 1)), args.members,
+                  args.batch_size, 'members')
+    else:
+        generate_rows(cur, GENERATE_MEMBERS, {
+          'first_names': FIRST_NAMES, 'first_name_count': len(FIRST_NAMES),
+          'last_names': LAST_NAMES, 'last_name_count': len(LAST_NAMES),
+        }, args.members, args.batch_size, 'members')
+    cur.execute(INSERT_MEMBERS)
+    members_added = cur.rowcount
+
+    # Insert the items, whose ids depend on the items already in the table
+    cur.execute('SELECT COALESCE(max(id), 0) FROM items')
+    last_item_id = cur.fetchone()[0]
+    if args.mode == 'copy':
+        copy_rows(cur, 'items (name, manufacturer, cost, weight)', (mock_item(i) for i in range(1, args.items + 1)),
+                  args.items, args.batch_size, 'items')
+    else:
+        generate_rows(cur, GENERATE_ITEMS, {}, args.items, args.batch_size, 'items')
+
+    # Generate the transactions of the members. The members and items are shuffled, so that the heavy
+    # spenders and best sellers are not simply the first ones.
+    cur.execute('SELECT COALESCE(max(id), 0) FROM transactions')
+    last_transaction_id = cur.fetchone()[0]
+    if args.mode == 'copy':
+        cur.execute('SELECT membership_id FROM mock_members ORDER BY membership_id')
+        member_ids = [row[0] for row in cur.fetchall()]
+        random.shuffle(member_ids)
+        cur.execute('SELECT id, cost, weight FROM items WHERE id > %s ORDER BY id', (last_item_id,))
+        # prices and weights are summed in cents, to get the exact totals of the NUMERIC columns
+        items = [(item_id, int(cost * 100), int(weight * 100)) for item_id, cost, weight in cur.fetchall()]
+        random.shuffle(items)
+        copy_rows(cur, 'transactions (membership_id, item_ids, total_price, total_weight)',
+                  mock_transactions(args.transactions, member_ids, items, args.skew), args.transactions,
+                  args.batch_size, 'transactions')
+    else:
+        cur.execute(RANK_MEMBERS)
+        cur.execute(RANK_ITEMS, {'last_item_id': last_item_id})
+        for table in ['mock_member_ranks', 'mock_item_ranks']:
+            cur.execute(f'CREATE UNIQUE INDEX ON {table} (rank)')
+            cur.execute(f'ANALYZE {table}')
+        generate_rows(cur, GENERATE_TRANSACTIONS, {'member_count': args.members, 'item_count': args.items,
+                                                   'skew': args.skew}, args.transactions, args.batch_size,
+                      'transactions')
+    start = time.perf_counter()
+    cur.execute(ADD_TRANSACTION_ITEMS, {'last_transaction_id': last_transaction_id})
+    report('transaction items', cur.rowcount, cur.rowcount, start)
 
-# Create cursor
-cur = conn.cursor()
-
-# Generate mock data
-items = []
-for i in range(args.items):
-    item_name = f'Item {i+1}'
-    item_manufacturer = f'Manufacturer {i+1}'
-    item_cost = round(random.uniform(10, 1000), 2)
-    item_weight = round(random.uniform(0.1, 50), 2)
-    items.append((item_name, item_manufacturer, item_cost, item_weight))
-
-transactions = []
-for i in range(args.transactions):
-    member_id = random.randint(1, args.members)
-    item_ids = random.sample(range(1, args.items + 1), random.randint(1, 5))
-    total_price = sum([items[id - 1][2] for id in item_ids])
-    total_weight = sum([items[id - 1][3] for id in item_ids])
-    transactions.append((member_id, item_ids, total_price, total_weight))
-
-# Insert mock data into the database
-cur.executemany('INSERT INTO items (name, manufacturer, cost, weight) VALUES (%s, %s, %s, %s)', items)
-cur.executemany('INSERT INTO transactions (membership_id, item_ids, total_price, total_weight) VALUES (%s, %s, %s, %s)',
-                transactions)
-
-# Commit changes and close database connection
-conn.commit()
-cur.close()
-conn.close()
+# Refresh the statistics used to plan the queries and the visibility map which lets them read the
+# indexes without visiting the tables
+with db.connection(autocommit=True) as conn, conn.cursor() as cur:
+    for table in ['members', 'items', 'transactions', 'transaction_items']:
+        cur.execute(f'VACUUM ANALYZE {table}')
+db.close_pool()
 
 # Print summary of added data
-print(f'Added {len(items)} items to the database.')
-print(f'Added {len(transactions)} transactions to the database.')
+print(f'Added {members_added} members to the database.')
+print(f'Added {args.items} items to the database.')
+print(f'Added {args.transactions} transactions to the database.')
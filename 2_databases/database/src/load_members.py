@@ -0,0 +1,17 @@
+import argparse
+from ecommerce_db import db
+from ecommerce_db.members import load_members
+
+
+# Parse command-line arguments
+parser = argparse.ArgumentParser()
+parser.add_argument('paths', nargs='+',
+                    help='CSV or Parquet files of successful applicants, or directories of them')
+args = parser.parse_args()
+
+# Copy the files into a staging table and merge it into the members table, in one transaction
+with db.connection() as conn:
+    load_members(conn, args.paths)
+
+# Close database connection
+db.close_pool()
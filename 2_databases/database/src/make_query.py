@@ -1,50 +1,256 @@
 import argparse
 import os
-import psycopg2
-from dotenv import load_dotenv
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ecommerce_db import db
 
 
-# Load environment variables from .env file
-load_dotenv()
+# Queries whose results are read through a server-side cursor or COPY, i.e. a single SELECT, VALUES or WITH
+# query. Anything else, e.g. several statements or DDL, is executed as it is.
+QUERY_PATTERN = re.compile(r'^\s*(?:--[^\n]*\n\s*)*(?:SELECT|VALUES|WITH)\b[^;]*;?\s*$', re.IGNORECASE)
+
+# Neither cursors nor COPY accept queries which change data, e.g. WITH x AS (INSERT ... RETURNING *) SELECT,
+# or create a table with SELECT ... INTO. Queries mentioning these keywords anywhere, even in a string or as
+# FOR UPDATE, are executed as they are too, which only costs holding their rows in memory.
+DATA_MODIFYING_PATTERN = re.compile(r'\b(?:INSERT|UPDATE|DELETE|MERGE|INTO)\b', re.IGNORECASE)
+
+# Files of a directory which are not reports: the schema, applied when the database is created, is skipped like
+# the migrations, which are in a subdirectory, unless the file is given by itself
+SCHEMA_FILES = {'create_tables.sql'}
+
+# Output formats and the extensions of their files
+FORMATS = {'text': '.txt', 'csv': '.csv', 'jsonl': '.jsonl', 'parquet': '.parquet'}
+
+# The query is closed on a new line, in case it ends with a comment. JSON lines are written as a single CSV
+# column with a quote and delimiter which JSON never contains unescaped, so that they are written as they are.
+COPY_CSV = 'COPY ({query}\n) TO STDOUT WITH (FORMAT csv, HEADER)'
+COPY_JSONL = ("COPY (SELECT row_to_json(q) FROM ({query}\n) q) TO STDOUT "
+              "WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')")
+
+# Number of rows of the row groups of Parquet files
+PARQUET_ROW_GROUP_SIZE = 100000
+
+# Rows printed to the standard output by concurrent files are not interleaved
+print_lock = threading.Lock()
+
+
+def is_query(sql_query):
+    return bool(QUERY_PATTERN.match(sql_query)) and not DATA_MODIFYING_PATTERN.search(sql_query)
+
+
+def list_files(paths):
+    # directories are expanded to the SQL files directly in them, in sorted order, except the schema
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.endswith('.sql') and name not in SCHEMA_FILES
+                         and os.path.isfile(os.path.join(path, name)))
+        else:
+            files.append(path)
+    return files
+
+
+def print_rows(file, rows):
+    with print_lock:
+        if file is not None:
+            print(f'-- {file}')
+        for row in rows:
+            print(row)
+
+
+def write_text(conn, file, sql_query, output_path):
+    if is_query(sql_query):
+        # the rows are fetched a batch at a time with fetchmany, so large results are not held in memory
+        with db.server_side_cursor(conn) as cur:
+            cur.execute(sql_query.strip().rstrip(';'))
+            rows = 0
+            out = open(output_path, 'w') if output_path else None
+            try:
+                while True:
+                    batch = cur.fetchmany(cur.itersize)
+                    if not batch:
+                        break
+                    if out:
+                        out.writelines(f'{row}\n' for row in batch)
+                    else:
+                        print_rows(file if rows == 0 else None, batch)
+                    rows += len(batch)
+            finally:
+                if out:
+                    out.close()
+            if rows == 0 and not out:
+                print_rows(file, [])
+            return rows
+    with conn.cursor() as cur:
+        cur.execute(sql_query)
+        # statements which return no rows, e.g. DDL, only report the number of rows they changed
+        if cur.description is None:
+            print_rows(file, [])
+            return max(cur.rowcount, 0)
+        rows = cur.fetchall()
+        if output_path:
+            with open(output_path, 'w') as out:
+                out.writelines(f'{row}\n' for row in rows)
+        else:
+            print_rows(file, rows)
+        return len(rows)
+
+
+def copy_to(conn, statement, output_path):
+    # COPY streams the rows from the server straight to the file, without converting them to Python objects
+    with conn.cursor() as cur, open(output_path, 'wb') as out:
+        cur.copy_expert(statement, out)
+        return cur.rowcount
+
+
+def parquet_types(conn, query):
+    import pyarrow as pa
+    # the types of the columns are read from the description of the query, without running it
+    with conn.cursor() as cur:
+        cur.execute(f'SELECT * FROM ({query}\n) q LIMIT 0')
+        types = {}
+        for column in cur.description:
+            if column.type_code in (20, 21, 23):
+                types[column.name] = pa.int64()
+            elif column.type_code in (700, 701):
+                types[column.name] = pa.float64()
+            elif column.type_code == 1700:
+                # numbers of unconstrained precision, e.g. sums, have no fixed scale
+                known_scale = column.scale is not None and column.scale < 1000
+                types[column.name] = pa.decimal128(column.precision, column.scale) if known_scale else pa.float64()
+            elif column.type_code == 16:
+                types[column.name] = pa.bool_()
+            elif column.type_code == 1082:
+                types[column.name] = pa.date32()
+            elif column.type_code == 1114:
+                types[column.name] = pa.timestamp('us')
+            else:
+                types[column.name] = pa.string()
+        return types
+
+
+def write_parquet(conn, query, output_path):
+    import pyarrow as pa
+    import pyarrow.csv
+    import pyarrow.parquet as pq
+    column_types = parquet_types(conn, query)
+    # the rows are copied as CSV into a temporary file, and converted to Parquet a block at a time
+    with tempfile.NamedTemporaryFile(suffix='.csv', dir=os.path.dirname(output_path) or '.') as tmp:
+        rows = copy_to(conn, COPY_CSV.format(query=query), tmp.name)
+        reader = pyarrow.csv.open_csv(tmp.name, convert_options=pyarrow.csv.ConvertOptions(
+          column_types=column_types, true_values=['t'], false_values=['f'], strings_can_be_null=True,
+          quoted_strings_can_be_null=False))
+        with pq.ParquetWriter(output_path, reader.schema) as writer:
+            batches, batched_rows = [], 0
+            for batch in reader:
+                batches.append(batch)
+                batched_rows += batch.num_rows
+                if batched_rows >= PARQUET_ROW_GROUP_SIZE:
+                    writer.write_table(pa.Table.from_batches(batches), row_group_size=PARQUET_ROW_GROUP_SIZE)
+                    batches, batched_rows = [], 0
+            if batches:
+                writer.write_table(pa.Table.from_batches(batches), row_group_size=PARQUET_ROW_GROUP_SIZE)
+    return rows
+
+
+def explain(conn, file, sql_query, output_path):
+    with conn.cursor() as cur:
+        cur.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql_query.strip().rstrip(";")}')
+        plan = [row[0] for row in cur.fetchall()]
+    # EXPLAIN ANALYZE runs the statement, whose changes are undone
+    conn.rollback()
+    if output_path:
+        with open(output_path, 'w') as out:
+            out.writelines(f'{line}\n' for line in plan)
+    else:
+        with print_lock:
+            print(f'-- {file}')
+            print('\n'.join(plan))
+    return 0
+
+
+def output_path_of(file, extension):
+    if args.output is None:
+        return None
+    return os.path.join(args.output, os.path.splitext(os.path.basename(file))[0] + extension)
+
+
+def run_file(file, sql_query, label):
+    # Execute SQL query in its own transaction, committed once it succeeds, and time it
+    start = time.perf_counter()
+    try:
+        with db.connection() as conn:
+            if args.explain:
+                rows = explain(conn, file, sql_query, output_path_of(file, '.plan.txt'))
+            elif args.format == 'text':
+                rows = write_text(conn, file if label else None, sql_query, output_path_of(file, '.txt'))
+            elif not is_query(sql_query):
+                raise ValueError(f'only a single SELECT, VALUES or WITH query which does not change data can be '
+                                 f'written as {args.format}')
+            elif args.format == 'parquet':
+                rows = write_parquet(conn, sql_query.strip().rstrip(';'), output_path_of(file, '.parquet'))
+            else:
+                statement = COPY_CSV if args.format == 'csv' else COPY_JSONL
+                rows = copy_to(conn, statement.format(query=sql_query.strip().rstrip(';')),
+                               output_path_of(file, FORMATS[args.format]))
+    except Exception as e:
+        print(f'{file}: failed after {time.perf_counter() - start:.3f}s: {e}', file=sys.stderr)
+        return False
+    print(f'{file}: {rows} rows in {time.perf_counter() - start:.3f}s', file=sys.stderr)
+    return True
+
 
 # Parse command-line arguments
 parser = argparse.ArgumentParser()
-parser.add_argument('--file', '-f', help='path to SQL file')
+parser.add_argument('--file', '-f', action='append', required=True,
+                    help='path to SQL file, or directory of SQL files, which can be given several times')
+parser.add_argument('--every', '-e', type=float,
+                    help='keep running the files every given number of seconds, reusing the connections')
+parser.add_argument('--jobs', '-j', type=int, default=1, help='number of files run at once, on separate connections')
+parser.add_argument('--format', choices=FORMATS, default='text',
+                    help='format of the results, written with COPY to files in the output directory except text')
+parser.add_argument('--output', '-o', help='directory of the results, written as <name of the SQL file>.<format>')
+parser.add_argument('--explain', action='store_true',
+                    help='write the plans of the queries with EXPLAIN (ANALYZE, BUFFERS) instead of their results')
 args = parser.parse_args()
+if args.jobs < 1:
+    parser.error('--jobs should be at least 1')
+if args.format != 'text' and args.output is None and not args.explain:
+    parser.error(f'--format {args.format} needs --output')
+if args.jobs > 1 and args.output is None and not args.explain:
+    parser.error('--jobs above 1 needs --output, so that the rows of the files are not interleaved')
+if args.output:
+    os.makedirs(args.output, exist_ok=True)
+
+# Read SQL queries from files
+files = list_files(args.file)
+sql_queries = []
+for file in files:
+    with open(file, 'r') as f:
+        sql_queries.append(f.read())
 
-# Database connection settings
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')
-
-# Connect to the database
-conn = psycopg2.connect(
-  host=DB_HOST,
-  port=DB_PORT,
-  dbname=DB_NAME,
-  user=DB_USER,
-  password=DB_PASSWORD
-)
-
-# Create cursor
-cur = conn.cursor()
-
-# Read SQL query from file
-with open(args.file, 'r') as f:
-    sql_query = f.read()
-
-# Execute SQL query
-cur.execute(sql_query)
-
-# Get results (if any) and print them
-results = cur.fetchall()
-if results:
-    for row in results:
-        print(row)
-
-# Commit changes and close database connection
-conn.commit()
-cur.close()
-conn.close()
+# Execute SQL queries until interrupted in the long-lived mode. The results are labelled with their file
+# when there are several files or runs.
+label = len(files) > 1 or args.every is not None
+db.get_pool(max_connections=args.jobs)
+succeeded = True
+try:
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        while True:
+            start = time.monotonic()
+            results = executor.map(lambda file_query: run_file(*file_query, label), zip(files, sql_queries))
+            succeeded = all(list(results))
+            if args.every is None:
+                break
+            time.sleep(max(args.every - (time.monotonic() - start), 0))
+except KeyboardInterrupt:
+    pass
+finally:
+    # Close database connections
+    db.close_pool()
+sys.exit(0 if succeeded else 1)
@@ -0,0 +1,133 @@
+import argparse
+import sys
+import time
+from ecommerce_db import db
+
+
+# The transactions after the watermark of a summary are added to it, and the watermark moved to the last
+# of them. The table is locked against inserts first, so that no transaction below the new watermark is
+# still to be committed, and transaction_items is written with transactions by the same writers.
+LOCK_TRANSACTIONS = 'LOCK TABLE transactions IN SHARE MODE'
+
+READ_WATERMARKS = """
+SELECT summary, last_transaction_id
+FROM summary_watermarks
+FOR UPDATE
+"""
+
+ADD_MEMBER_SPEND = """
+INSERT INTO member_spend AS s (membership_id, total_spending, total_transactions)
+SELECT membership_id, SUM(total_price), COUNT(*)
+FROM transactions
+WHERE id > %(last_transaction_id)s AND id <= %(new_transaction_id)s
+GROUP BY membership_id
+ON CONFLICT (membership_id) DO UPDATE
+SET total_spending = s.total_spending + EXCLUDED.total_spending,
+    total_transactions = s.total_transactions + EXCLUDED.total_transactions
+"""
+
+ADD_ITEM_PURCHASE_COUNTS = """
+INSERT INTO item_purchase_counts AS c (item_id, total_purchases)
+SELECT item_id, COUNT(*)
+FROM transaction_items
+WHERE transaction_id > %(last_transaction_id)s AND transaction_id <= %(new_transaction_id)s
+GROUP BY item_id
+ON CONFLICT (item_id) DO UPDATE
+SET total_purchases = c.total_purchases + EXCLUDED.total_purchases
+"""
+
+UPDATE_WATERMARK = """
+UPDATE summary_watermarks
+SET last_transaction_id = %(new_transaction_id)s, refreshed_at = now()
+WHERE summary = %(summary)s
+"""
+
+SUMMARIES = {
+  'member_spend': ADD_MEMBER_SPEND,
+  'item_purchase_counts': ADD_ITEM_PURCHASE_COUNTS,
+}
+
+# Rows of a summary which differ from a full recompute up to its watermark, in either direction
+VERIFY_SUMMARIES = {
+  'member_spend': """
+SELECT COUNT(*) FROM (
+  (SELECT membership_id, total_spending, total_transactions FROM member_spend
+   EXCEPT
+   SELECT membership_id, SUM(total_price), COUNT(*) FROM transactions WHERE id <= %(last_transaction_id)s
+   GROUP BY membership_id)
+  UNION ALL
+  (SELECT membership_id, SUM(total_price), COUNT(*) FROM transactions WHERE id <= %(last_transaction_id)s
+   GROUP BY membership_id
+   EXCEPT
+   SELECT membership_id, total_spending, total_transactions FROM member_spend)
+) differences
+""",
+  'item_purchase_counts': """
+SELECT COUNT(*) FROM (
+  (SELECT item_id, total_purchases FROM item_purchase_counts
+   EXCEPT
+   SELECT item_id, COUNT(*) FROM transaction_items WHERE transaction_id <= %(last_transaction_id)s GROUP BY item_id)
+  UNION ALL
+  (SELECT item_id, COUNT(*) FROM transaction_items WHERE transaction_id <= %(last_transaction_id)s GROUP BY item_id
+   EXCEPT
+   SELECT item_id, total_purchases FROM item_purchase_counts)
+) differences
+""",
+}
+
+
+def refresh(cur, full):
+    cur.execute(LOCK_TRANSACTIONS)
+    cur.execute(READ_WATERMARKS)
+    watermarks = dict(cur.fetchall())
+    cur.execute('SELECT COALESCE(MAX(id), 0) FROM transactions')
+    new_transaction_id = cur.fetchone()[0]
+    for summary, statement in SUMMARIES.items():
+        start = time.perf_counter()
+        last_transaction_id = 0 if full else watermarks[summary]
+        if full:
+            cur.execute(f'TRUNCATE {summary}')
+        cur.execute(statement, {'last_transaction_id': last_transaction_id, 'new_transaction_id': new_transaction_id})
+        updated = cur.rowcount
+        cur.execute(UPDATE_WATERMARK, {'summary': summary, 'new_transaction_id': new_transaction_id})
+        print(f'Refreshed {summary} with transactions {last_transaction_id + 1} to {new_transaction_id}: '
+              f'{updated} rows updated in {time.perf_counter() - start:.1f}s')
+
+
+def verify(cur):
+    cur.execute('SELECT summary, last_transaction_id FROM summary_watermarks')
+    differences = 0
+    for summary, last_transaction_id in cur.fetchall():
+        cur.execute(VERIFY_SUMMARIES[summary], {'last_transaction_id': last_transaction_id})
+        count = cur.fetchone()[0]
+        print(f'{summary} up to transaction {last_transaction_id}: {count} rows differ from a full recompute')
+        differences += count
+    return differences
+
+
+# Parse command-line arguments
+parser = argparse.ArgumentParser()
+parser.add_argument('--full', action='store_true',
+                    help='recompute the summaries from all the transactions, e.g. after transactions were changed')
+parser.add_argument('--verify', action='store_true',
+                    help='compare the summaries with a full recompute instead of refreshing them')
+args = parser.parse_args()
+
+if args.verify:
+    # the summaries and transactions are read from the same snapshot
+    with db.connection(isolation_level='REPEATABLE READ', readonly=True) as conn, conn.cursor() as cur:
+        differences = verify(cur)
+    db.close_pool()
+    sys.exit(1 if differences else 0)
+
+# Refresh the summaries in one transaction. Autovacuum keeps the statistics of the summaries up to
+# date as they grow, but a full recompute rewrites them at once.
+with db.connection() as conn, conn.cursor() as cur:
+    refresh(cur, args.full)
+if args.full:
+    with db.connection(autocommit=True) as conn, conn.cursor() as cur:
+        for summary in SUMMARIES:
+            cur.execute(f'ANALYZE {summary}')
+
+# Close database connections
+db.close_pool()
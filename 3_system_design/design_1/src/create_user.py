@@ -1,106 +1,300 @@
-import psycopg2
-from dotenv import load_dotenv
+import argparse
 import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import Any, Dict, List, Set, Tuple
+import psycopg2
+import psycopg2.errors
 import yaml
-import argparse
-from typing import List, Dict
+from dotenv import load_dotenv
+from psycopg2 import sql
+from ecommerce_db import db
 
 
-# Load environment variables from .env file
-load_dotenv()
-
 # Parse command-line arguments
 parser = argparse.ArgumentParser()
 parser.add_argument('--config_path', '-c', type=str,
                     default='../config/user_config.yaml',
                     help='file path of the user config file')
+parser.add_argument('--dry-run', action='store_true',
+                    help='print the statements needed to match the config, without applying them')
+parser.add_argument('--reset-passwords', action='store_true',
+                    help='also set the passwords of the existing users to those of the config')
+parser.add_argument('--targets_path', '-t', type=str,
+                    help='file path of the databases to provision, by default the database of the .env file')
+parser.add_argument('--workers', '-w', type=int, default=4, help='number of databases provisioned at once')
+parser.add_argument('--retries', '-r', type=int, default=3,
+                    help='number of times a database is retried after a connection error or a conflict')
 args = parser.parse_args()
+if args.workers < 1 or args.retries < 0:
+    parser.error('--workers should be at least 1 and --retries at least 0')
+
+# Privileges which can be granted on tables, as written in the config and in information_schema
+TABLE_PRIVILEGES = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'TRUNCATE', 'REFERENCES', 'TRIGGER'}
+
+# Placeholders of the config, e.g. ${LOGISTICS_PASSWORD}, replaced by environment variables or the .env file
+PLACEHOLDER_PATTERN = re.compile(r'\$\{(\w+)\}')
+
+# The current roles and table privileges of the users of the config are read once. The privileges which
+# owners hold on their own tables are not managed by the config.
+READ_ROLES = """
+SELECT rolname, rolcanlogin
+FROM pg_roles
+WHERE rolname = ANY(%s)
+"""
+
+READ_TABLE_GRANTS = """
+SELECT DISTINCT grantee, table_schema, table_name, privilege_type
+FROM information_schema.role_table_grants
+WHERE grantee = ANY(%s) AND grantor <> grantee
+"""
+
+# The delay before the first retry of a database, doubled for every further retry
+RETRY_BACKOFF_SECONDS = 1.0
 
-# Get database credentials from environment variables
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')
+# Errors after which a database is provisioned again: the server could not be reached or the transaction
+# conflicted with another one, or another target of the same cluster created the same user at once, as
+# users are shared by the databases of a cluster
+RETRIED_ERRORS = (psycopg2.OperationalError, psycopg2.errors.UniqueViolation, psycopg2.errors.DuplicateObject)
 
-# Connect to the database
-conn = psycopg2.connect(
-  host=DB_HOST,
-  port=DB_PORT,
-  dbname=DB_NAME,
-  user=DB_USER,
-  password=DB_PASSWORD
-)
+# A privilege on a table, as (schema, table, privilege)
+Privilege = Tuple[str, str, str]
 
-# Create a cursor object to execute queries
-cur = conn.cursor()
 
+def expand_placeholders(value: str) -> str:
+    """
+    Replaces the ${NAME} placeholders of a config value with the environment variables they name.
+
+    Args:
+        value (str): The value of the config.
+
+    Returns:
+        str: The value with its placeholders replaced.
+
+    Raises:
+        ValueError: If an environment variable is not set.
+    """
+    def replace(match):
+        name = match.group(1)
+        if name not in os.environ:
+            raise ValueError(f'Environment variable {name} of the user config is not set')
+        return os.environ[name]
+    return PLACEHOLDER_PATTERN.sub(replace, value)
 
-def create_user(username: str, password: str) -> None:
-    """Creates a new database user with the specified username and password.
+
+def load_user_configs(config_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Reads the users of the config file, with their passwords and the privileges they should have.
+
+    Tables are in the public schema unless written as schema.table.
 
     Args:
-        username (str): The username of the new user to create.
-        password (str): The password of the new user to create.
+        config_path (str): The file path of the user config file.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The 'password' and set of 'privileges' of each username.
 
     Raises:
-        psycopg2.Error: If there was an error creating the user.
+        ValueError: If a privilege is unknown or a password placeholder is not set.
+    """
+    with open(config_path, 'r') as f:
+        user_configs = yaml.load(f, Loader=yaml.SafeLoader)
+    users = {}
+    for user_config in user_configs:
+        privileges = set()
+        for permission in user_config.get('permissions') or []:
+            permission_type = permission['permission_type'].upper()
+            if permission_type not in TABLE_PRIVILEGES:
+                raise ValueError(f"Unknown permission type {permission['permission_type']} of user "
+                                 f"{user_config['username']}")
+            schema, _, table = permission['table_name'].rpartition('.')
+            privileges.add((schema or 'public', table, permission_type))
+        users[user_config['username']] = {
+          'password': expand_placeholders(str(user_config['password'])),
+          'privileges': privileges,
+        }
+    return users
+
+
+def read_current_state(cur, usernames: List[str]) -> Tuple[Dict[str, bool], Dict[str, Set[Privilege]]]:
     """
-    try:
-        cur.execute(f"SELECT COUNT(*) FROM pg_user WHERE usename = '{username}'")
-        result = cur.fetchone()
-        user_exists = result[0] > 0
+    Reads the existing users and their table privileges.
+
+    Args:
+        cur: A psycopg2 cursor.
+        usernames (List[str]): The names of the users to read.
+
+    Returns:
+        Tuple[Dict[str, bool], Dict[str, Set[Privilege]]]: Whether each existing user can log in, and the
+            privileges each user holds.
+    """
+    cur.execute(READ_ROLES, (usernames,))
+    roles = dict(cur.fetchall())
+    cur.execute(READ_TABLE_GRANTS, (usernames,))
+    grants = {}
+    for grantee, schema, table, privilege in cur.fetchall():
+        grants.setdefault(grantee, set()).add((schema, table, privilege))
+    return roles, grants
+
+
+def table_privilege_statements(verb: str, username: str, privileges: Set[Privilege]) -> List[Tuple[str, sql.Composed]]:
+    """Builds one GRANT or REVOKE statement per table, for all its privileges at once."""
+    statements = []
+    preposition = 'TO' if verb == 'GRANT' else 'FROM'
+    for (schema, table), table_privileges in groupby(sorted(privileges), key=lambda p: p[:2]):
+        names = [privilege for _, _, privilege in table_privileges]
+        statement = sql.SQL('{} {} ON TABLE {} {} {}').format(
+          sql.SQL(verb), sql.SQL(', ').join(sql.SQL(name) for name in names), sql.Identifier(schema, table),
+          sql.SQL(preposition), sql.Identifier(username))
+        statements.append((f"{verb} {', '.join(names)} ON {schema}.{table} {preposition} {username}", statement))
+    return statements
+
+
+def plan_changes(users: Dict[str, Dict[str, Any]], roles: Dict[str, bool], grants: Dict[str, Set[Privilege]],
+                 reset_passwords: bool = False) -> List[Tuple[str, sql.Composed]]:
+    """
+    Computes the statements which make the users and their table privileges match the config.
+
+    Users missing from the database are created, and existing users are only altered when they cannot log
+    in, or their passwords are reset. Privileges missing from the database are granted, and the privileges
+    of the users which are not in the config are revoked. Users which are not in the config are left as
+    they are.
+
+    Args:
+        users (Dict[str, Dict[str, Any]]): The users of the config, from load_user_configs.
+        roles (Dict[str, bool]): Whether each existing user can log in, from read_current_state.
+        grants (Dict[str, Set[Privilege]]): The privileges of the existing users, from read_current_state.
+        reset_passwords (bool): Whether to set the passwords of the existing users.
 
-        if not user_exists:
-            cur.execute(f"CREATE USER {username} WITH PASSWORD '{password}'")
-            conn.commit()
-            print(f"User '{username}' created successfully!")
-    except psycopg2.Error as e:
-        print(f"Error creating user '{username}': {e}")
+    Returns:
+        List[Tuple[str, sql.Composed]]: The description, without passwords, and statement of each change.
+    """
+    changes = []
+    for username, user in users.items():
+        role = sql.Identifier(username)
+        password = sql.Literal(user['password'])
+        if username not in roles:
+            changes.append((f'CREATE USER {username}',
+                            sql.SQL('CREATE USER {} WITH PASSWORD {}').format(role, password)))
+        elif not roles[username] or reset_passwords:
+            options = [sql.SQL('LOGIN')] if not roles[username] else []
+            if reset_passwords:
+                options.append(sql.SQL('PASSWORD {}').format(password))
+            description = ' '.join(['LOGIN'] * (not roles[username]) + ['PASSWORD'] * reset_passwords)
+            changes.append((f'ALTER USER {username} WITH {description}',
+                            sql.SQL('ALTER USER {} WITH {}').format(role, sql.SQL(' ').join(options))))
+        current = grants.get(username, set())
+        changes.extend(table_privilege_statements('REVOKE', username, current - user['privileges']))
+        changes.extend(table_privilege_statements('GRANT', username, user['privileges'] - current))
+    return changes
 
 
-def grant_permissions(username: str, permissions: List[Dict[str, str]]) -> None:
+def load_targets(targets_path: str) -> Dict[str, Dict[str, str]]:
     """
-    Grants the specified permissions to the specified database user.
+    Reads the databases to provision, with the settings used to connect to them.
+
+    Each target has a name, and any of the keyword arguments of psycopg2.connect, e.g. host and dbname,
+    which default to the settings of the .env file. ${NAME} placeholders are replaced like in the user
+    config.
 
     Args:
-        username (str): The name of the user to grant permissions to.
-        permissions (List[Dict[str, str]]): A list of dictionaries representing the permissions to grant.
-            Each dictionary should have the keys 'table_name' and 'permission_type'.
+        targets_path (str): The file path of the targets file.
+
+    Returns:
+        Dict[str, Dict[str, str]]: The connection settings of each target.
 
     Raises:
-        psycopg2.Error: If there is an error executing the SQL command.
+        ValueError: If a placeholder is not set.
+    """
+    with open(targets_path, 'r') as f:
+        target_configs = yaml.load(f, Loader=yaml.SafeLoader)
+    targets = {}
+    for target_config in target_configs:
+        settings = {key: expand_placeholders(str(value)) for key, value in target_config.items() if key != 'name'}
+        targets[target_config['name']] = dict(db.connection_settings(), **settings)
+    return targets
 
+
+def provision(target: str, settings: Dict[str, str], users: Dict[str, Dict[str, Any]], dry_run: bool,
+              reset_passwords: bool, retries: int) -> Dict[str, Any]:
     """
-    for permission in permissions:
-        table_name = permission['table_name']
-        permission_type = permission['permission_type']
-        try:
-            cur.execute(f"GRANT {permission_type} ON {table_name} TO {username}")
-            print(f"User {username} permission - {permission_type} has been successfully granted on {table_name}.")
-        except psycopg2.Error as e:
-            print(f"Error granting permission for user {username} on table {table_name}: {e}")
-    conn.commit()
+    Makes the users and their table privileges of a database match the config, in one transaction.
 
+    The current state is read again on every attempt, so that a retry only applies what is still missing.
 
-def create_user_and_grant_permissions(user_config: dict) -> None:
-    """Creates a new database user and grants the specified permissions based on the provided configuration."""
-    username = user_config['username']
-    password = user_config['password']
-    permissions = user_config['permissions']
+    Args:
+        target (str): The name of the database, used in the progress.
+        settings (Dict[str, str]): The keyword arguments of psycopg2.connect.
+        users (Dict[str, Dict[str, Any]]): The users of the config, from load_user_configs.
+        dry_run (bool): Whether to only plan the changes.
+        reset_passwords (bool): Whether to set the passwords of the existing users.
+        retries (int): The number of times the database is retried after one of the RETRIED_ERRORS.
+
+    Returns:
+        Dict[str, Any]: The 'target', its 'changes', or 'error' if it failed, the number of 'attempts' and
+            the 'seconds' taken.
+    """
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            conn = psycopg2.connect(**settings)
+            try:
+                with conn, conn.cursor() as cur:
+                    roles, grants = read_current_state(cur, list(users))
+                    changes = plan_changes(users, roles, grants, reset_passwords)
+                    if not dry_run:
+                        for _, statement in changes:
+                            cur.execute(statement)
+            finally:
+                conn.close()
+            print(f"{target}: {'planned' if dry_run else 'applied'} {len(changes)} changes")
+            return {'target': target, 'changes': changes, 'error': None, 'attempts': attempt,
+                    'seconds': time.perf_counter() - start}
+        except psycopg2.Error as e:
+            error = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+            if not isinstance(e, RETRIED_ERRORS) or attempt > retries:
+                print(f'{target}: failed, no change was applied: {error}')
+                return {'target': target, 'changes': [], 'error': error, 'attempts': attempt,
+                        'seconds': time.perf_counter() - start}
+            # the delays of the targets are spread, so that targets of the same cluster do not retry at once
+            delay = RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1)
+            print(f'{target}: attempt {attempt} failed, retrying in {delay:.1f}s: {error}')
+            time.sleep(delay)
 
-    create_user(username, password)
-    grant_permissions(username, permissions)
 
+def print_summary(results: List[Dict[str, Any]], dry_run: bool) -> None:
+    """Prints the changes of each target, and a table of their status, number of changes, attempts and time."""
+    for result in results:
+        for description, _ in result['changes']:
+            print(f"{result['target']}: {'Would run' if dry_run else 'Ran'}: {description}")
+    width = max([len('Target')] + [len(result['target']) for result in results])
+    print(f"\n{'Target':<{width}}  {'Status':<7} {'Changes':>7} {'Attempts':>8} {'Time':>8}")
+    for result in results:
+        status = 'failed' if result['error'] else 'ok'
+        print(f"{result['target']:<{width}}  {status:<7} {len(result['changes']):>7} {result['attempts']:>8} "
+              f"{result['seconds']:>7.2f}s")
 
-# Load user configuration from YAML file
-with open(args.config_path, "r") as f:
-    user_configs = yaml.load(f, Loader=yaml.SafeLoader)
 
-# Create users and grant permissions based on configuration
-for user_config in user_configs:
-    create_user_and_grant_permissions(user_config)
+# Load user configuration from YAML file, with the passwords of the .env file
+load_dotenv()
+try:
+    users = load_user_configs(args.config_path)
+    targets = load_targets(args.targets_path) if args.targets_path else {'default': db.connection_settings()}
+except ValueError as e:
+    sys.exit(str(e))
 
-# Close the cursor and database connection
-cur.close()
-conn.close()
+# Provision the databases concurrently, each in its own transaction, so that each database is either fully
+# provisioned or left as it was
+with ThreadPoolExecutor(max_workers=args.workers) as executor:
+    futures = [executor.submit(provision, target, settings, users, args.dry_run, args.reset_passwords, args.retries)
+               for target, settings in targets.items()]
+    results = [future.result() for future in futures]
+print_summary(results, args.dry_run)
+if any(result['error'] for result in results):
+    sys.exit(1)
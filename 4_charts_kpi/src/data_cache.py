@@ -0,0 +1,154 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+import pandas as pd
+
+
+# Number of seconds after which a day is fetched again from the API, as the counts of recent days are revised
+CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Number of days kept in the cache, the least recently used ones being evicted first
+CACHE_MAX_DAYS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS partitions (
+  day TEXT PRIMARY KEY,
+  fetched_at REAL NOT NULL,
+  used_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+  day TEXT NOT NULL,
+  position INTEGER NOT NULL,
+  record TEXT NOT NULL,
+  PRIMARY KEY (day, position)
+);
+"""
+
+
+def utc_timestamp(value: str) -> pd.Timestamp:
+    """
+    Parses a date or timestamp, which is in UTC unless it has a time zone.
+
+    Raises:
+        ValueError: If the value is not a date.
+    """
+    timestamp = pd.Timestamp(value)
+    if pd.isna(timestamp):
+        raise ValueError(f'Invalid date: {value}')
+    return timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+
+
+def day_ranges(days: List[date]) -> Iterator[Tuple[date, date]]:
+    """Groups sorted days into ranges of consecutive days, as (first, last) days."""
+    first = last = None
+    for day in days:
+        if last is not None and day == last + timedelta(days=1):
+            last = day
+            continue
+        if first is not None:
+            yield first, last
+        first = last = day
+    if first is not None:
+        yield first, last
+
+
+class TimeSeriesCache:
+    """
+    Keeps the records of a time series API on disk, partitioned by the day of their Date.
+
+    A query only fetches the ranges of days which are not in the cache, or were fetched more than ttl_seconds
+    ago, with one call of fetch per range of consecutive days, and reads the other days from the cache. The
+    least recently used days are evicted once the cache holds more than max_days, except the days of the
+    query, which are all kept. Days without records are cached too, so that they are not fetched again.
+
+    Args:
+        path (str): File path of the SQLite database of the cache, created if it does not exist.
+        fetch (Callable[[str, str], List[Dict[str, Any]]]): Function returning the records from a timestamp
+            to another, given as e.g. 2022-01-01T00:00:00Z, with their timestamp in a Date field.
+        ttl_seconds (float): Number of seconds after which a day is fetched again.
+        max_days (int): Maximum number of days kept in the cache.
+
+    Example:
+        >>> cache = TimeSeriesCache('cache.sqlite3', fetch_cases)
+        >>> data = cache.get('2022-01-01T00:00:00Z', '2023-01-01T00:00:00Z')
+    """
+
+    def __init__(self, path: str, fetch: Callable[[str, str], List[Dict[str, Any]]],
+                 ttl_seconds: float = CACHE_TTL_SECONDS, max_days: int = CACHE_MAX_DAYS):
+        self.path = path
+        self.fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self.max_days = max_days
+        # queries wait for each other, so that a range requested twice at once is only fetched once
+        self._lock = threading.Lock()
+        with closing(sqlite3.connect(self.path)) as conn:
+            conn.executescript(SCHEMA)
+
+    def _missing_days(self, conn: sqlite3.Connection, first: date, last: date, now: float) -> List[date]:
+        cached = {day for day, in conn.execute(
+          'SELECT day FROM partitions WHERE day BETWEEN ? AND ? AND fetched_at > ?',
+          (first.isoformat(), last.isoformat(), now - self.ttl_seconds))}
+        days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+        return [day for day in days if day.isoformat() not in cached]
+
+    def _store(self, conn: sqlite3.Connection, first: date, last: date, records: List[Dict[str, Any]],
+               now: float) -> None:
+        # the records outside of the range, e.g. at the end timestamp, belong to days which were not requested
+        rows = [(record['Date'][:10], position, json.dumps(record)) for position, record in enumerate(records)
+                if first.isoformat() <= record['Date'][:10] <= last.isoformat()]
+        conn.execute('DELETE FROM records WHERE day BETWEEN ? AND ?', (first.isoformat(), last.isoformat()))
+        conn.executemany('INSERT INTO records (day, position, record) VALUES (?, ?, ?)', rows)
+        conn.executemany('INSERT OR REPLACE INTO partitions (day, fetched_at, used_at) VALUES (?, ?, ?)',
+                         [((first + timedelta(days=i)).isoformat(), now, now)
+                          for i in range((last - first).days + 1)])
+
+    def _evict(self, conn: sqlite3.Connection, first: date, last: date) -> None:
+        # the days just read are kept even if there are more than max_days of them, so that a longer range is
+        # not fetched again on every query, and the least recently used of the other days fill the rest
+        kept = max(self.max_days - ((last - first).days + 1), 0)
+        evicted = conn.execute('SELECT day FROM partitions WHERE day NOT BETWEEN ? AND ? '
+                               'ORDER BY used_at DESC, day DESC LIMIT -1 OFFSET ?',
+                               (first.isoformat(), last.isoformat(), kept)).fetchall()
+        conn.executemany('DELETE FROM records WHERE day = ?', evicted)
+        conn.executemany('DELETE FROM partitions WHERE day = ?', evicted)
+
+    def get(self, from_date: str, to_date: str) -> pd.DataFrame:
+        """
+        Returns the records with a Date from a date to another, both included.
+
+        Args:
+            from_date (str): The first date or timestamp, e.g. 2022-01-01T00:00:00Z.
+            to_date (str): The last date or timestamp.
+
+        Returns:
+            pd.DataFrame: The records, in the order of their days and of the API.
+
+        Raises:
+            ValueError: If a date is invalid.
+        """
+        start = utc_timestamp(from_date)
+        end = utc_timestamp(to_date)
+        if start > end:
+            return pd.DataFrame()
+        first, last = start.date(), end.date()
+        now = time.time()
+        with self._lock, closing(sqlite3.connect(self.path)) as conn:
+            with conn:
+                for range_first, range_last in day_ranges(self._missing_days(conn, first, last, now)):
+                    records = self.fetch(f'{range_first.isoformat()}T00:00:00Z',
+                                         f'{(range_last + timedelta(days=1)).isoformat()}T00:00:00Z')
+                    self._store(conn, range_first, range_last, records, now)
+                conn.execute('UPDATE partitions SET used_at = ? WHERE day BETWEEN ? AND ?',
+                             (now, first.isoformat(), last.isoformat()))
+                rows = conn.execute('SELECT record FROM records WHERE day BETWEEN ? AND ? ORDER BY day, position',
+                                    (first.isoformat(), last.isoformat())).fetchall()
+                self._evict(conn, first, last)
+        data = pd.DataFrame([json.loads(record) for record, in rows])
+        if data.empty:
+            return data
+        dates = pd.to_datetime(data['Date'], utc=True)
+        return data[(dates >= start) & (dates <= end)].reset_index(drop=True)
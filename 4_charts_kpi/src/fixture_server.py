@@ -0,0 +1,78 @@
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# First day of the mock records, and the route of the API which is served
+FIRST_DAY = datetime(2020, 1, 23, tzinfo=timezone.utc)
+ROUTE_PREFIX = '/live/country/'
+
+
+def mock_record(country: str, day: datetime) -> dict:
+    # cumulative counts which only grow, in the fields of the COVID-19 API
+    days = (day - FIRST_DAY).days
+    confirmed = days * days * 7 + days * 31
+    deaths = confirmed // 1000
+    recovered = confirmed * 9 // 10
+    return {
+      'ID': f'{country}-{day:%Y%m%d}', 'Country': country.title(), 'CountryCode': country[:2].upper(),
+      'Province': '', 'City': '', 'CityCode': '', 'Lat': '1.35', 'Lon': '103.82',
+      'Confirmed': confirmed, 'Deaths': deaths, 'Recovered': recovered, 'Active': confirmed - deaths - recovered,
+      'Date': f'{day:%Y-%m-%dT%H:%M:%SZ}',
+    }
+
+
+def parse_date(value: str) -> datetime:
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # e.g. /live/country/singapore/status/confirmed?from=2022-01-01T00:00:00Z&to=2023-01-01T00:00:00Z
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if not url.path.startswith(ROUTE_PREFIX):
+            self.send_error(404)
+            return
+        try:
+            start = max(parse_date(query['from'][0]), FIRST_DAY)
+            end = parse_date(query['to'][0])
+        except (KeyError, ValueError):
+            self.send_error(400, 'from and to should be timestamps such as 2022-01-01T00:00:00Z')
+            return
+        country = url.path[len(ROUTE_PREFIX):].split('/')[0]
+        # the records are at midnight, from the first one at or after the start
+        day = start.replace(hour=0, minute=0, second=0)
+        if day < start:
+            day += timedelta(days=1)
+        records = []
+        while day <= end:
+            records.append(mock_record(country, day))
+            day += timedelta(days=1)
+        time.sleep(args.delay)
+        body = json.dumps(records).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# Parse command-line arguments
+parser = argparse.ArgumentParser()
+parser.add_argument('--port', '-p', type=int, default=8000, help='port of the server')
+parser.add_argument('--delay', '-d', type=float, default=0.0, help='number of seconds to wait before each response')
+args = parser.parse_args()
+
+# Serve the mock API until interrupted
+server = ThreadingHTTPServer(('127.0.0.1', args.port), FixtureHandler)
+print(f'Serving mock COVID-19 API on http://127.0.0.1:{args.port}')
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    pass
+finally:
+    server.server_close()
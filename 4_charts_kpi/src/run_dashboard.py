@@ -1,32 +1,54 @@
+import os
 import dash
 from dash import dcc
 from dash import html
+from dash.exceptions import PreventUpdate
 import requests
-import pandas as pd
 from dash.dependencies import Input, Output
+from data_cache import TimeSeriesCache
 
 
 # Set default start and end dates
 DEFAULT_FROM_DATE = "2022-01-01T00:00:00Z"
 DEFAULT_TO_DATE = "2023-01-01T00:00:00Z"
 
+# Base URL of the API, e.g. http://127.0.0.1:8000 for the fixture server, and file path of the cache
+API_URL = os.getenv('COVID_API_URL', 'https://api.covid19api.com')
+CACHE_PATH = os.getenv('DASHBOARD_CACHE_PATH', 'dashboard_cache.sqlite3')
+
+# Connections to the API are kept open between requests
+session = requests.Session()
+
+
+# Define function to fetch records from API
+def fetch_cases(from_date, to_date):
+    response = session.get(f"{API_URL}/live/country/singapore/status/confirmed",
+                           params={'from': from_date, 'to': to_date}, timeout=60)
+    response.raise_for_status()
+    return response.json()
+
+
+# The records are cached by day, so that only the days which were not fetched yet are requested
+cache = TimeSeriesCache(CACHE_PATH, fetch_cases)
+
+
 # Define function to get data from API
 def get_data(from_date, to_date):
-    url = f"https://api.covid19api.com/live/country/singapore/status/confirmed?from={from_date}&to={to_date}"
-    response = requests.get(url)
-    data = pd.DataFrame(response.json())
-    return data
+    return cache.get(from_date, to_date)
+
 
 # Initialize the app
 app = dash.Dash(__name__)
 
-# Define the layout of the app
+# Define the layout of the app. The graph is updated when a date is entered or the input loses focus,
+# rather than on every keystroke.
 app.layout = html.Div([
     html.Label("From:"),
     dcc.Input(
         id='from-date',
         type='text',
         value=DEFAULT_FROM_DATE,
+        debounce=True,
         style={'width': '100%'}
     ),
     html.Label("To:"),
@@ -34,20 +56,26 @@ app.layout = html.Div([
         id='to-date',
         type='text',
         value=DEFAULT_TO_DATE,
+        debounce=True,
         style={'width': '100%'}
     ),
     dcc.Graph(id='cases-graph')
 ])
 
+
 # Define the callback to update the graph
 @app.callback(Output('cases-graph', 'figure'),
               [Input('from-date', 'value'), Input('to-date', 'value')])
 def update_graph(from_date, to_date):
-    data = get_data(from_date, to_date)
+    # the graph is kept as it is while a date is incomplete
+    try:
+        data = get_data(from_date, to_date)
+    except ValueError:
+        raise PreventUpdate
     figure = {
         'data': [{
-            'x': data['Date'],
-            'y': data['Confirmed'],
+            'x': data['Date'] if not data.empty else [],
+            'y': data['Confirmed'] if not data.empty else [],
             'type': 'line',
             'name': 'Confirmed Cases'
         }],
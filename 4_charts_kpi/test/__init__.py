@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The dashboard modules are run from the src folder and import each other as top-level modules
+# (e.g. `from data_cache import ...`), so do the same for the tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,154 @@
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+import data_cache
+from data_cache import TimeSeriesCache, day_ranges
+
+
+class FakeApi:
+    # serves one record per day, numbered by the day of the year, from a timestamp to another, both included as
+    # by the API, and records the ranges requested
+    def __init__(self, empty_days=()):
+        self.calls = []
+        self.empty_days = set(empty_days)
+
+    def __call__(self, from_date, to_date):
+        self.calls.append((from_date[:10], to_date[:10]))
+        day = datetime.strptime(from_date[:10], '%Y-%m-%d').date()
+        last = datetime.strptime(to_date[:10], '%Y-%m-%d').date()
+        records = []
+        while day <= last:
+            if day not in self.empty_days:
+                records.append({'Date': f'{day.isoformat()}T00:00:00Z', 'Confirmed': day.timetuple().tm_yday})
+            day += timedelta(days=1)
+        return records
+
+
+class TestDayRanges(unittest.TestCase):
+    def test_consecutive_days(self):
+        days = [date(2022, 1, 1), date(2022, 1, 2), date(2022, 1, 3)]
+        self.assertEqual(list(day_ranges(days)), [(date(2022, 1, 1), date(2022, 1, 3))])
+
+    def test_gaps(self):
+        days = [date(2022, 1, 1), date(2022, 1, 3), date(2022, 1, 4), date(2022, 1, 31), date(2022, 2, 1)]
+        self.assertEqual(list(day_ranges(days)), [(date(2022, 1, 1), date(2022, 1, 1)),
+                                                  (date(2022, 1, 3), date(2022, 1, 4)),
+                                                  (date(2022, 1, 31), date(2022, 2, 1))])
+
+    def test_no_days(self):
+        self.assertEqual(list(day_ranges([])), [])
+
+
+class TestTimeSeriesCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'cache.sqlite3')
+        self.api = FakeApi()
+        # the time is only moved forward by the tests, so that the TTL and the order of use are deterministic
+        self.now = 1000000.0
+        patcher = mock.patch.object(data_cache.time, 'time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def make_cache(self, **kwargs):
+        return TimeSeriesCache(self.path, self.api, **kwargs)
+
+    def get(self, cache, from_day, to_day):
+        self.now += 1
+        return cache.get(f'{from_day}T00:00:00Z', f'{to_day}T00:00:00Z')
+
+    def test_records_of_the_range(self):
+        data = self.get(self.make_cache(), '2022-01-01', '2022-01-03')
+        self.assertEqual(list(data['Date']), ['2022-01-01T00:00:00Z', '2022-01-02T00:00:00Z', '2022-01-03T00:00:00Z'])
+        self.assertEqual(list(data['Confirmed']), [1, 2, 3])
+        self.assertEqual(self.api.calls, [('2022-01-01', '2022-01-04')])
+
+    def test_cached_range_is_not_fetched(self):
+        cache = self.make_cache()
+        self.get(cache, '2022-01-01', '2022-01-10')
+        data = self.get(cache, '2022-01-03', '2022-01-05')
+        self.assertEqual(list(data['Confirmed']), [3, 4, 5])
+        self.assertEqual(len(self.api.calls), 1)
+
+    def test_only_missing_runs_of_days_are_fetched(self):
+        cache = self.make_cache()
+        self.get(cache, '2022-01-05', '2022-01-06')
+        self.get(cache, '2022-01-10', '2022-01-10')
+        self.api.calls.clear()
+        data = self.get(cache, '2022-01-01', '2022-01-12')
+        self.assertEqual(list(data['Confirmed']), list(range(1, 13)))
+        self.assertEqual(self.api.calls, [('2022-01-01', '2022-01-05'), ('2022-01-07', '2022-01-10'),
+                                          ('2022-01-11', '2022-01-13')])
+
+    def test_cache_is_kept_between_instances(self):
+        self.get(self.make_cache(), '2022-01-01', '2022-01-03')
+        self.get(self.make_cache(), '2022-01-01', '2022-01-03')
+        self.assertEqual(len(self.api.calls), 1)
+
+    def test_expired_days_are_fetched_again(self):
+        cache = self.make_cache(ttl_seconds=100)
+        self.get(cache, '2022-01-01', '2022-01-03')
+        self.now += 50
+        self.get(cache, '2022-01-01', '2022-01-03')
+        self.assertEqual(len(self.api.calls), 1)
+        self.now += 100
+        self.get(cache, '2022-01-01', '2022-01-03')
+        self.assertEqual(self.api.calls, [('2022-01-01', '2022-01-04'), ('2022-01-01', '2022-01-04')])
+
+    def test_least_recently_used_days_are_evicted(self):
+        cache = self.make_cache(max_days=3)
+        for day in ['2022-01-01', '2022-01-02', '2022-01-03']:
+            self.get(cache, day, day)
+        # reading the first day makes the second one the least recently used, which the fourth day evicts
+        self.get(cache, '2022-01-01', '2022-01-01')
+        self.get(cache, '2022-01-04', '2022-01-04')
+        self.api.calls.clear()
+        for day in ['2022-01-01', '2022-01-03', '2022-01-04']:
+            self.get(cache, day, day)
+        self.assertEqual(self.api.calls, [])
+        data = self.get(cache, '2022-01-02', '2022-01-02')
+        self.assertEqual(list(data['Confirmed']), [2])
+        self.assertEqual(self.api.calls, [('2022-01-02', '2022-01-03')])
+
+    def test_range_longer_than_max_days_is_kept(self):
+        cache = self.make_cache(max_days=3)
+        self.get(cache, '2022-02-01', '2022-02-01')
+        data = self.get(cache, '2022-01-01', '2022-01-10')
+        self.assertEqual(len(data), 10)
+        data = self.get(cache, '2022-01-01', '2022-01-10')
+        self.assertEqual(len(data), 10)
+        self.assertEqual(len(self.api.calls), 2)
+        # the days of other queries are evicted instead
+        self.get(cache, '2022-02-01', '2022-02-01')
+        self.assertEqual(len(self.api.calls), 3)
+
+    def test_empty_days_are_cached(self):
+        self.api.empty_days = {date(2022, 1, 2), date(2022, 1, 3)}
+        cache = self.make_cache()
+        self.assertEqual(list(self.get(cache, '2022-01-01', '2022-01-04')['Confirmed']), [1, 4])
+        self.assertTrue(self.get(cache, '2022-01-02', '2022-01-03').empty)
+        self.assertEqual(len(self.api.calls), 1)
+
+    def test_timestamps_within_the_days(self):
+        cache = self.make_cache()
+        self.now += 1
+        data = cache.get('2022-01-01T12:00:00Z', '2022-01-03T12:00:00Z')
+        self.assertEqual(list(data['Confirmed']), [2, 3])
+        self.assertEqual(self.api.calls, [('2022-01-01', '2022-01-04')])
+
+    def test_start_after_end(self):
+        self.assertTrue(self.get(self.make_cache(), '2022-01-03', '2022-01-01').empty)
+        self.assertEqual(self.api.calls, [])
+
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError):
+            self.make_cache().get('2022-13-01', '2022-01-03')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Validation of membership applications, shared by the Airflow pipeline and the Lambda function.
+
+The package has three levels, which apply the same rules:
+- core: the checks and conversions of single values, e.g. is_valid_email, with the tables they
+  use built once when the package is imported and the date parsing and hashing memoized
+- records: the preprocessing, validation and transformation of lists of records (dicts),
+  in pure Python so that it runs in the Lambda function without pandas
+- batch: the column-wise versions of the same stages on DataFrames, which need numpy and pandas
+  and are therefore not imported by the package, e.g. `from applicant_validation.batch import validate_frame`
+
+The validation rules are declared in rules.DEFAULT_RULES, or in a JSON or YAML file set in the
+VALIDATION_RULES environment variable, and compiled once into a rules.RuleSet used by the two APIs.
+
+Example:
+    >>> from applicant_validation import preprocess_records, validate_records, transform_records
+    >>> valid, invalid = validate_records(preprocess_records(records))
+    >>> successful = transform_records(valid)
+"""
+from .core import (DATE_FORMATS,
+                   DATE_FORMATS_BY_LAYOUT,
+                   DATE_FORMAT_CANDIDATES,
+                   DATE_CACHE_SIZE,
+                   NAME_SUFFIXES,
+                   EMAIL_SUFFIXES,
+                   normalize_mobile_no,
+                   has_correct_digits,
+                   identify_date_format,
+                   format_date_of_birth,
+                   parse_date,
+                   date_layout,
+                   DateNormalizer,
+                   DATE_NORMALIZER,
+                   is_above_age,
+                   is_valid_email,
+                   is_empty_name,
+                   split_name,
+                   is_valid_date,
+                   get_hashed_date,
+                   hash_date
+                   )
+from .rules import (VALID,
+                    DEFAULT_RULES,
+                    DEFAULT_RULE_SET,
+                    RULE_TYPES,
+                    Rule,
+                    RuleSet,
+                    compile_rules,
+                    load_rules
+                    )
+from .records import preprocess_records, validate_record, validate_records, transform_records
+
+__version__ = '0.1.0'
+
+__all__ = ['DATE_FORMATS',
+           'DATE_FORMATS_BY_LAYOUT',
+           'DATE_FORMAT_CANDIDATES',
+           'DATE_CACHE_SIZE',
+           'NAME_SUFFIXES',
+           'EMAIL_SUFFIXES',
+           'normalize_mobile_no',
+           'has_correct_digits',
+           'identify_date_format',
+           'format_date_of_birth',
+           'parse_date',
+           'date_layout',
+           'DateNormalizer',
+           'DATE_NORMALIZER',
+           'is_above_age',
+           'is_valid_email',
+           'is_empty_name',
+           'split_name',
+           'is_valid_date',
+           'get_hashed_date',
+           'hash_date',
+           'VALID',
+           'DEFAULT_RULES',
+           'DEFAULT_RULE_SET',
+           'RULE_TYPES',
+           'Rule',
+           'RuleSet',
+           'compile_rules',
+           'load_rules',
+           'preprocess_records',
+           'validate_record',
+           'validate_records',
+           'transform_records',
+           'clear_caches'
+           ]
+
+
+def clear_caches():
+    """Empties the caches of the parsed, normalized and hashed dates, e.g. between benchmark runs."""
+    parse_date.cache_clear()
+    hash_date.cache_clear()
+    DATE_NORMALIZER.cache_clear()
@@ -0,0 +1,304 @@
+from typing import List, Optional, Tuple
+from datetime import datetime
+import re
+import numpy as np
+import pandas as pd
+from .core import (NAME_SUFFIXES,
+                   EMAIL_SUFFIXES,
+                   DateNormalizer,
+                   DATE_NORMALIZER,
+                   is_valid_date,
+                   hash_date,
+                   normalize_mobile_no
+                   )
+from .rules import VALID, DEFAULT_RULE_SET, RuleSet
+
+
+# columns produced by the preprocessing stage, in output order
+PREPROCESSED_COLUMNS = ['first_name', 'last_name', 'email', 'date_of_birth', 'mobile_no', 'above_18']
+
+# whitespace as understood by str.split, spelled out so that every string engine agrees on it
+_WHITESPACE = ''.join(ch for ch in map(chr, range(0x3001)) if ch.isspace())
+_WS = f'[{_WHITESPACE}]'
+_NON_WS = f'[^{_WHITESPACE}]'
+
+
+def split_names(full_names: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Column-wise version of core.split_name.
+
+    Args:
+        full_names (pd.Series): Full names, which may include a salutation and/or a suffix.
+
+    Returns:
+        tuple: Two Series with the first and last names, aligned to the input index.
+            Empty or missing names give empty strings.
+    """
+    # collapse runs of whitespace so that words are separated by a single space
+    names = full_names.fillna('').astype(str)
+    names = names.str.replace(f'^{_WS}+|{_WS}+$', '', regex=True).str.replace(f'{_WS}+', ' ', regex=True)
+    num_words = names.str.count(' ') + (names != '')
+
+    # drop the salutation, i.e. a first word ending with '.' in names of 3 or more words
+    has_salutation = (num_words >= 3) & names.str.match(f'{_NON_WS}*\\. ')
+    names = names.where(~has_salutation, names.str.replace('^[^ ]+ ', '', n=1, regex=True))
+    num_words = num_words - has_salutation
+
+    # drop the suffix from names of 2 or more words
+    all_but_last_words = names.str.replace(' [^ ]+$', '', regex=True)
+    has_suffix = (num_words >= 2) & names.str.replace('^.* ', '', regex=True).isin(NAME_SUFFIXES)
+    names = names.where(~has_suffix, all_but_last_words)
+    num_words = num_words - has_suffix
+
+    # the last word is the last name, everything before it is the first name
+    last_names = names.str.replace('^.* ', '', regex=True)
+    first_names = names.where(num_words < 2, names.str.replace(' [^ ]+$', '', regex=True))
+    return first_names.astype(object), last_names.astype(object)
+
+
+def format_dates_of_birth(dates: pd.Series, output_format: str = "%Y%m%d") -> pd.Series:
+    """
+    Column-wise version of core.identify_date_format followed by core.format_date_of_birth.
+
+    The column is factorized so that every distinct date string is converted once by a
+    core.DateNormalizer, which also detects the format once when the column has a single one.
+
+    Args:
+        dates (pd.Series): Date strings in any of the formats supported by core.identify_date_format.
+        output_format (str): Optional parameter specifying the output date format.
+            Default is "%Y%m%d" (YYYYMMDD format).
+
+    Returns:
+        pd.Series: Date strings in the output format, aligned to the input index.
+
+    Raises:
+        ValueError: If a date string cannot be parsed in any of the supported formats.
+    """
+    normalizer = DATE_NORMALIZER
+    if output_format != normalizer.output_format:
+        normalizer = DateNormalizer(output_format)
+    codes, uniques = pd.factorize(dates)
+    formatted = normalizer.normalize_many(list(uniques))
+    return pd.Series(np.asarray(formatted, dtype=object)[codes], index=dates.index, dtype=object)
+
+
+def are_above_age(dates_of_birth: pd.Series, age_cutoff: int, date_cutoff: str = "2022-01-01") -> pd.Series:
+    """
+    Column-wise version of core.is_above_age.
+
+    A YYYYMMDD date read as an integer orders the same way as the date itself, so
+    an applicant is at least `age_cutoff` years old if YYYYMMDD + age_cutoff * 10000
+    is not after the cutoff date.
+
+    Args:
+        dates_of_birth (pd.Series): Dates of birth in YYYYMMDD format.
+        age_cutoff (int): The minimum age required.
+        date_cutoff (str): The date in YYYY-MM-DD format to compare the applicant's age against.
+            Defaulted to "2022-01-01".
+
+    Returns:
+        pd.Series: Boolean Series indicating whether each applicant is at least the specified age.
+
+    Raises:
+        ValueError: If a date of birth is not in YYYYMMDD format.
+    """
+    if not dates_of_birth.astype(str).str.fullmatch(r'\d{8}').all():
+        raise ValueError("Dates of birth must be in YYYYMMDD format")
+    cutoff = int(datetime.strptime(date_cutoff, "%Y-%m-%d").strftime("%Y%m%d"))
+    dob = dates_of_birth.astype(np.int64)
+    return dob + age_cutoff * 10000 <= cutoff
+
+
+def normalize_mobile_nos(numbers: pd.Series) -> pd.Series:
+    """
+    Column-wise version of core.normalize_mobile_no.
+
+    Args:
+        numbers (pd.Series): Mobile numbers, as strings, integers or floats.
+
+    Returns:
+        pd.Series: The mobile numbers as strings, with None for the missing ones.
+    """
+    if numbers.dtype.kind in 'iu':
+        return numbers.astype(str).astype(object)
+    if isinstance(numbers.dtype, pd.StringDtype):
+        return numbers
+    values = numbers.to_numpy(dtype=object)
+    if pd.api.types.infer_dtype(values, skipna=False) == 'string':
+        return numbers
+    return pd.Series([normalize_mobile_no(number) for number in values], index=numbers.index, dtype=object)
+
+
+def _have_digits(numbers: np.ndarray, num_digits: int) -> np.ndarray:
+    # compare non-negative integers to the powers of 10 rather than converting them to strings,
+    # with the bounds the dtype cannot reach left out
+    max_value = int(np.iinfo(numbers.dtype).max)
+    lower = 10 ** (num_digits - 1) if num_digits > 1 else 0
+    if num_digits < 1 or lower > max_value:
+        return np.zeros(len(numbers), dtype=bool)
+    has_digits = numbers >= lower
+    if 10 ** num_digits <= max_value:
+        has_digits &= numbers < 10 ** num_digits
+    return has_digits
+
+
+def have_correct_digits(numbers: pd.Series, num_digits: int = 8) -> pd.Series:
+    """
+    Column-wise version of core.has_correct_digits.
+
+    Integers are checked arithmetically, and strings, e.g. as normalized by normalize_mobile_nos,
+    by their lengths in a single pass, without converting the column.
+
+    Args:
+        numbers (pd.Series): Mobile numbers.
+        num_digits (int): The expected number of digits (default 8).
+
+    Returns:
+        pd.Series: Boolean Series indicating whether each number has the correct number of digits.
+    """
+    if numbers.dtype.kind in 'iu':
+        values = numbers.to_numpy()
+        if not (values < 0).any():
+            return pd.Series(_have_digits(values, num_digits), index=numbers.index)
+    elif isinstance(numbers.dtype, pd.StringDtype) and not numbers.hasnans:
+        return (numbers.str.len() == num_digits).astype(bool)
+    else:
+        values = numbers.to_numpy(dtype=object)
+        if pd.api.types.infer_dtype(values, skipna=False) == 'string':
+            lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+            return pd.Series(lengths == num_digits, index=numbers.index)
+    return numbers.astype(str).str.len() == num_digits
+
+
+def are_valid_emails(emails: pd.Series, suffixes: Optional[List[str]] = None) -> pd.Series:
+    """
+    Column-wise version of core.is_valid_email.
+
+    The suffixes are matched with a single endswith per email, in one pass over the column,
+    or with the string methods of pandas for the string dtypes, whose methods are vectorized.
+
+    Args:
+        emails (pd.Series): The email addresses to check.
+        suffixes (Optional[List[str]]): List of valid suffixes. Defaults to [".com", ".net"].
+
+    Returns:
+        pd.Series: Boolean Series indicating whether each email has a valid suffix and contains "@".
+    """
+    suffixes = EMAIL_SUFFIXES if suffixes is None else tuple(suffixes)
+    if not suffixes:
+        return pd.Series(False, index=emails.index)
+    if isinstance(emails.dtype, pd.StringDtype):
+        emails = emails.fillna('')
+        suffix_pattern = '(?:' + '|'.join(re.escape(s) for s in suffixes) + r')\Z'
+        has_at = emails.str.contains('@', regex=False)
+        has_suffix = emails.str.contains(suffix_pattern, regex=True)
+        return (has_at & has_suffix).astype(bool)
+    values = emails.to_numpy(dtype=object)
+    is_valid = np.fromiter((isinstance(email, str) and email.endswith(suffixes) and '@' in email
+                            for email in values), dtype=bool, count=len(values))
+    return pd.Series(is_valid, index=emails.index)
+
+
+def are_empty_names(names: pd.Series) -> pd.Series:
+    """
+    Column-wise version of core.is_empty_name.
+
+    Args:
+        names (pd.Series): The names to check.
+
+    Returns:
+        pd.Series: Boolean Series indicating whether each name is empty or doesn't exist.
+    """
+    return names.fillna('').astype(str).str.strip() == ''
+
+
+def preprocess_frame(df: pd.DataFrame, rules: Optional[RuleSet] = None) -> pd.DataFrame:
+    """
+    Column-wise version of the preprocessing stage of the pipeline.
+
+    Args:
+        df (pd.DataFrame): Raw applications with the columns name, email, date_of_birth and mobile_no.
+        rules (Optional[RuleSet]): The rules whose minimum age the above_18 column is computed with, see
+            RuleSet.age_threshold. Defaults to rules.DEFAULT_RULE_SET.
+
+    Returns:
+        pd.DataFrame: Preprocessed applications with the columns in PREPROCESSED_COLUMNS.
+    """
+    preprocessed = pd.DataFrame(index=df.index)
+    preprocessed['first_name'], preprocessed['last_name'] = split_names(df['name'])
+    preprocessed['email'] = df['email']
+    preprocessed['date_of_birth'] = format_dates_of_birth(df['date_of_birth'])
+    preprocessed['mobile_no'] = normalize_mobile_nos(df['mobile_no'])
+    # the column keeps its name in the outputs, but agrees with the validation if the minimum age is configured
+    age, date_cutoff = (rules or DEFAULT_RULE_SET).age_threshold()
+    preprocessed['above_18'] = are_above_age(preprocessed['date_of_birth'], age, date_cutoff)
+    return preprocessed
+
+
+def validate_frame(df: pd.DataFrame, rules: Optional[RuleSet] = None,
+                   mode: str = 'first') -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Column-wise version of the validation stage of the pipeline.
+
+    Each rule is applied to the whole column at once, and in 'first' mode only to the records
+    which have not already failed a rule reported before it, see rules.RuleSet.
+
+    Args:
+        df (pd.DataFrame): Preprocessed applications.
+        rules (Optional[RuleSet]): The rules to apply. Defaults to rules.DEFAULT_RULE_SET.
+        mode (str): 'first' to tag the invalid records with the first rule they fail, or 'all' to
+            also add every rule they fail as a bitmask in the `validate_mask` column.
+
+    Returns:
+        tuple: The valid records, and the invalid records with the reason in the `validate_check` column.
+    """
+    rules = rules or DEFAULT_RULE_SET
+    first, mask = rules.evaluate_frame(df, mode)
+    is_valid = first == len(rules)
+    valid_records = df[is_valid]
+    invalid_records = df[~is_valid].copy()
+    invalid_records['validate_check'] = np.asarray(rules.names + [VALID], dtype=object)[first[~is_valid]]
+    if mask is not None:
+        invalid_records['validate_mask'] = mask[~is_valid]
+    return valid_records, invalid_records
+
+
+def generate_membership_ids(last_names: pd.Series, dates_of_birth: pd.Series, validate: bool = True) -> pd.Series:
+    """
+    Column-wise version of joining the last name with core.get_hashed_date of the date of birth.
+
+    The dates are factorized so that each distinct date is checked and hashed once.
+
+    Args:
+        last_names (pd.Series): Last names of the applicants.
+        dates_of_birth (pd.Series): Dates of birth in YYYYMMDD format.
+        validate (bool): Whether to check the format of the dates. Can be turned off for
+            dates which are already normalized, e.g. by format_dates_of_birth.
+
+    Returns:
+        pd.Series: Membership ids, i.e. <last_name>_<hash(YYYYMMDD)>, aligned to the input index.
+
+    Raises:
+        ValueError: If validate is True and a date of birth is not in YYYYMMDD format.
+    """
+    codes, uniques = pd.factorize(dates_of_birth)
+    if validate and not all(is_valid_date(date_of_birth) for date_of_birth in uniques):
+        raise ValueError("Dates of birth must be in YYYYMMDD format")
+    hashed_dates = np.asarray([hash_date(date_of_birth) for date_of_birth in uniques], dtype=object)
+    return pd.Series(last_names.to_numpy(dtype=object) + '_' + hashed_dates[codes],
+                     index=last_names.index, dtype=object)
+
+
+def transform_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Column-wise version of the transformation stage of the pipeline.
+
+    Args:
+        df (pd.DataFrame): Valid applications, with the dates of birth normalized by preprocess_frame.
+
+    Returns:
+        pd.DataFrame: The applications with their `membership_id`, i.e. <last_name>_<hash(YYYYMMDD)>.
+    """
+    transformed = df.copy()
+    transformed['membership_id'] = generate_membership_ids(df['last_name'], df['date_of_birth'], validate=False)
+    return transformed
@@ -0,0 +1,429 @@
+from typing import Tuple, List, Optional, Iterable
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+import hashlib
+import re
+
+
+# As the local date format is usually date at the front or the end,
+# we will assume dates such as 11/05/1999 to be dd-mm-yyyy instead of mm-dd-yyyy
+DATE_FORMATS = ["%Y-%m-%d", "%d-%m-%Y", "%Y/%m/%d", "%d/%m/%Y", "%Y%m%d", "%d%m%Y",
+                "%m-%d-%Y", "%m%d%Y", "%m/%d/%Y"]
+
+# Date formats grouped by their separators, e.g. "--" for "%Y-%m-%d", keeping the order above.
+# A date string can only be parsed by the formats with the same separators as itself.
+# The tables are built once when the module is imported, e.g. once per Lambda container.
+DATE_FORMATS_BY_LAYOUT = {}
+for _fmt in DATE_FORMATS:
+    _layout = re.sub(r'%.', '', _fmt)
+    DATE_FORMATS_BY_LAYOUT[_layout] = DATE_FORMATS_BY_LAYOUT.get(_layout, ()) + (_fmt,)
+
+# Formats to try for a file whose dates were detected in a format, i.e. the format preceded
+# by the formats with the same separators that take priority over it.
+DATE_FORMAT_CANDIDATES = {
+  _fmt: _formats[:_formats.index(_fmt) + 1]
+  for _formats in DATE_FORMATS_BY_LAYOUT.values() for _fmt in _formats
+}
+
+# Maximum number of distinct date strings kept in the date caches
+DATE_CACHE_SIZE = 65536
+
+# Suffixes that are dropped from the end of a full name
+NAME_SUFFIXES = frozenset(['Jr.', 'Sr.', 'II', 'III', 'IV', 'MD', 'DVM', 'DDS', 'PhD'])
+
+# Email suffixes accepted by is_valid_email
+EMAIL_SUFFIXES = (".com", ".net")
+
+
+def normalize_mobile_no(mobile_no) -> Optional[str]:
+    """
+    Converts a mobile number to a string, the type it has when read from a CSV file as text.
+
+    Mobile numbers read by pandas can be integers, or floats when some are missing, whereas
+    csv.DictReader always gives strings. Converting them once before they are checked makes
+    has_correct_digits give the same result for both.
+
+    Args:
+        mobile_no: The mobile number, as a string, an integer or a float.
+
+    Returns:
+        Optional[str]: The mobile number as a string, e.g. '12345678' for 12345678.0,
+        or None if it is missing.
+
+    Example:
+        >>> normalize_mobile_no(12345678)
+        '12345678'
+    """
+    if mobile_no is None or isinstance(mobile_no, str):
+        return mobile_no
+    if isinstance(mobile_no, float):
+        if mobile_no != mobile_no:
+            return None
+        if mobile_no.is_integer():
+            return str(int(mobile_no))
+    return str(mobile_no)
+
+
+def has_correct_digits(number: int, num_digits: int = 8) -> bool:
+    """
+    Returns True if the given number has the specified number of digits,
+    and False otherwise. By default, the expected number of digits is 8.
+
+    The number is counted as written, so a string, e.g. as normalized by normalize_mobile_no,
+    must only contain the digits.
+
+    Args:
+        number (int): An integer or a string representing the mobile number.
+        num_digits (int): The expected number of digits (default 8).
+
+    Returns:
+        bool: True if the number has the correct number of digits, False otherwise.
+
+    Example:
+        >>> has_correct_digits(12345678)
+        True
+        >>> has_correct_digits(123456789, num_digits=10)
+        True
+        >>> has_correct_digits(123456789)
+        False
+    """
+    # Convert the number to a string and count the number of digits
+    num_digits_actual = len(str(number))
+
+    # Return True if the number has the expected number of digits, False otherwise
+    return num_digits_actual == num_digits
+
+
+def identify_date_format(date_str: str) -> str:
+    """
+    Identifies the format of a date string.
+
+    Args:
+        date_str: A string containing a date in an unknown format.
+
+    Returns:
+        A string representing the format of the date string, or None if the format
+        could not be identified.
+    """
+    for fmt in DATE_FORMATS:
+        try:
+            datetime.strptime(date_str, fmt)
+            return fmt
+        except ValueError:
+            pass
+
+    return None
+
+
+def format_date_of_birth(dob_str: str, dob_format: str, output_format: str = "%Y%m%d") -> str:
+    """
+    Convert a date string in the specified format to YYYYMMDD format.
+
+    Args:
+        dob_str (str): Date string in the specified format.
+        dob_format (str): Date format of the input date string.
+        output_format (str): Optional parameter specifying the output date format.
+            Default is "%Y%m%d" (YYYYMMDD format).
+
+    Returns:
+        str: Date of birth string in YYYYMMDD format.
+
+    Raises:
+        ValueError: If the date string cannot be parsed using the specified format.
+    """
+    dob = parse_date(dob_str, dob_format)
+    return dob.strftime(output_format)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(date_str: str, date_format: str) -> datetime:
+    """
+    Parses a date string in the specified format.
+    The results are memoized as the same dates of birth repeat across applications.
+
+    Args:
+        date_str (str): Date string in the specified format.
+        date_format (str): Date format of the input date string.
+
+    Returns:
+        datetime: The parsed date.
+
+    Raises:
+        ValueError: If the date string cannot be parsed using the specified format.
+    """
+    return datetime.strptime(date_str, date_format)
+
+
+_DIGITS = str.maketrans('', '', '0123456789')
+
+
+def date_layout(date_str: str) -> str:
+    """
+    Returns the separators of a date string, which is the string without its digits.
+
+    Example:
+        >>> date_layout('2022-05-11')
+        '--'
+    """
+    return date_str.translate(_DIGITS)
+
+
+class DateNormalizer:
+    """
+    Converts dates of birth in any of the DATE_FORMATS to a single output format.
+
+    Each distinct date string is parsed once and the result is kept in a bounded
+    LRU cache. A date string is only tried against the formats with the same
+    separators, in the order of DATE_FORMATS, so that ambiguous dates such as
+    11/05/1999 are still read as dd-mm-yyyy, as in identify_date_format.
+
+    Args:
+        output_format (str): Optional parameter specifying the output date format.
+            Default is "%Y%m%d" (YYYYMMDD format).
+        maxsize (int): Maximum number of distinct date strings kept in the cache.
+
+    Example:
+        >>> normalizer = DateNormalizer()
+        >>> normalizer.normalize('11/05/1999')
+        '19990511'
+    """
+
+    def __init__(self, output_format: str = "%Y%m%d", maxsize: int = DATE_CACHE_SIZE):
+        self.output_format = output_format
+        self._normalize_cached = lru_cache(maxsize=maxsize)(self._normalize)
+
+    def _normalize(self, date_str: str, formats: Optional[Tuple[str, ...]]) -> str:
+        if formats is None:
+            formats = DATE_FORMATS_BY_LAYOUT.get(date_layout(date_str), ())
+        for fmt in formats:
+            try:
+                return datetime.strptime(date_str, fmt).strftime(self.output_format)
+            except ValueError:
+                pass
+        # fall back to trying every format, e.g. for days padded with a space
+        date_format = identify_date_format(date_str)
+        if date_format is None:
+            raise ValueError(f"Unknown date format: {date_str}")
+        return format_date_of_birth(date_str, date_format, self.output_format)
+
+    def normalize(self, date_str: str, formats: Optional[Tuple[str, ...]] = None) -> str:
+        """
+        Converts a date string to the output format.
+
+        Args:
+            date_str (str): Date string in any of the DATE_FORMATS.
+            formats (Optional[Tuple[str, ...]]): Formats to try first, as returned by detect_formats.
+
+        Returns:
+            str: Date string in the output format.
+
+        Raises:
+            ValueError: If the date string cannot be parsed in any of the DATE_FORMATS.
+        """
+        return self._normalize_cached(date_str, formats)
+
+    def detect_formats(self, date_strs: Iterable[str], sample_size: int = 100) -> Optional[Tuple[str, ...]]:
+        """
+        Detects the date format of a file from a sample of its dates.
+
+        Args:
+            date_strs (Iterable[str]): Date strings of the file.
+            sample_size (int): Number of date strings to sample.
+
+        Returns:
+            Optional[Tuple[str, ...]]: The detected format, preceded by the formats with the same
+            separators that take priority over it, or None if the sample has mixed or unknown formats.
+        """
+        detected = {identify_date_format(date_str) for date_str in islice(date_strs, sample_size)}
+        if len(detected) != 1 or None in detected:
+            return None
+        return DATE_FORMAT_CANDIDATES[detected.pop()]
+
+    def normalize_many(self, date_strs: List[str], detect_format: bool = True) -> List[str]:
+        """
+        Converts date strings to the output format, detecting the format once when they share one.
+
+        Args:
+            date_strs (List[str]): Date strings in any of the DATE_FORMATS, usually from one file.
+            detect_format (bool): Whether to detect a common format from a sample of the date strings.
+
+        Returns:
+            List[str]: Date strings in the output format.
+
+        Raises:
+            ValueError: If a date string cannot be parsed in any of the DATE_FORMATS.
+        """
+        formats = self.detect_formats(date_strs) if detect_format else None
+        return [self._normalize_cached(date_str, formats) for date_str in date_strs]
+
+    def cache_info(self):
+        """Returns the hit and miss statistics of the cache."""
+        return self._normalize_cached.cache_info()
+
+    def cache_clear(self):
+        """Empties the cache."""
+        self._normalize_cached.cache_clear()
+
+
+# shared by the record and the batch APIs, and by all the batches processed in the same process,
+# so that dates seen before are not parsed again
+DATE_NORMALIZER = DateNormalizer()
+
+
+def is_above_age(date_of_birth: str, age_cutoff: int, date_cutoff: str = "2022-01-01") -> bool:
+    """
+    Determines if an applicant is above a certain age as of a given date based on their date of birth.
+
+    Args:
+        date_of_birth: A string in YYYYMMDD format representing the applicant's date of birth.
+        age_cutoff: An integer representing the minimum age required.
+        date_cutoff: A string representing the date in YYYY-MM-DD format to compare the applicant's age against.
+                     Defaulted to "2022-01-01".
+
+    Returns:
+        A boolean value indicating whether the applicant is at least the specified age as of the given date.
+    """
+    dob = parse_date(date_of_birth, "%Y%m%d")
+    cutoff_date = parse_date(date_cutoff, "%Y-%m-%d")
+    age = cutoff_date.year - dob.year - ((cutoff_date.month, cutoff_date.day) < (dob.month, dob.day))
+
+    return age >= age_cutoff
+
+
+def is_valid_email(email: str, suffixes: Optional[List[str]] = None) -> bool:
+    """
+    Checks if the email has a valid suffix and contains "@".
+
+    Args:
+        email (str): The email address to check.
+        suffix (Optional[List[str]]): List of valid suffixes. Defaults to [".com", ".net"].
+
+    Returns:
+        bool: True if email has a valid suffix and contains "@"; False otherwise.
+    """
+    if suffixes is None:
+        suffixes = EMAIL_SUFFIXES
+    elif not isinstance(suffixes, tuple):
+        suffixes = tuple(suffixes)
+    return "@" in email and email.endswith(suffixes)
+
+
+def is_empty_name(name: str) -> bool:
+    """
+    Check if the given name is empty or doesn't exist.
+
+    Args:
+        name: The name to check.
+
+    Returns:
+        True if the name is empty or doesn't exist, False otherwise.
+    """
+    if name is None or name.strip() == '':
+        return True
+    return False
+
+
+def split_name(full_name: str) -> Tuple[str, str]:
+    """
+    Splits a full name into first and last name.
+
+    Args:
+        full_name (str): A string containing the full name, which may include a salutation and/or a suffix.
+
+    Returns:
+        tuple: A tuple containing the first and last name extracted from the full name.
+
+    Example:
+        >>> name = 'Dr. Jane Doe Sr.'
+        >>> first_name, last_name = split_name(name)
+        >>> print(first_name, last_name)
+        Jane Doe
+    """
+    if is_empty_name(full_name):
+        return ('', '')
+
+    # Split the name string into words
+    words = full_name.split()
+
+    # Check if the name has a salutation and/or a suffix
+    if len(words) >= 3 and words[0].endswith('.'):
+        # The name has a salutation. Remove it from the words list
+        words.pop(0)
+
+    if len(words) >= 2 and words[-1] in NAME_SUFFIXES:
+        # The name has a suffix. Remove it from the words list
+        words.pop(-1)
+
+    # The first and last names are the first and last words respectively
+    first_name = words[0]
+    last_name = words[-1]
+
+    # If there are more than 2 words, the middle names are everything in between
+    if len(words) > 2:
+        middle_names = ' '.join(words[1:-1])
+        first_name += ' ' + middle_names
+
+    # Return the first and last names as a tuple
+    return (first_name, last_name)
+
+
+def is_valid_date(date_string: str) -> bool:
+    """
+    Checks if a date string is in YYYYMMDD format.
+
+    Args:
+        date_string: A string representing the date to check, in the format YYYYMMDD.
+
+    Returns:
+        True if the date string is in YYYYMMDD format, False otherwise.
+    """
+    if date_string is None:
+        return False
+    try:
+        parse_date(date_string, '%Y%m%d')
+        return True
+    except ValueError:
+        return False
+
+
+def get_hashed_date(date_string: str) -> str:
+    """
+    This function takes a string object of a date in YYYYMMDD
+    and returns the first 5 digits of the SHA256 hash of the date.
+
+    Args:
+    - date_string (str): a date string in the format YYYYMMDD
+
+    Returns:
+    - str: the first 5 digits of the SHA256 hash of the date
+    """
+    # Check if the date string is in a valid format
+    if not is_valid_date(date_string):
+        raise ValueError
+
+    return hash_date(date_string)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def hash_date(date_string: str) -> str:
+    """
+    Returns the first 5 digits of the SHA256 hash of a date string without checking its format.
+    The results are memoized as there are only a few tens of thousands of distinct dates of birth.
+
+    Args:
+    - date_string (str): a date string in the format YYYYMMDD, e.g. as returned by DateNormalizer
+
+    Returns:
+    - str: the first 5 digits of the SHA256 hash of the date
+    """
+    # Convert the date string to bytes
+    date_bytes = date_string.encode('utf-8')
+
+    # Calculate the SHA256 hash of the date
+    sha256_hash = hashlib.sha256(date_bytes)
+
+    # Get the hex digest of the hash and extract the first 5 digits
+    hashed_date = sha256_hash.hexdigest()[:5]
+
+    return hashed_date
@@ -0,0 +1,88 @@
+from typing import Dict, List, Optional, Tuple
+from .core import (DATE_NORMALIZER,
+                   is_above_age,
+                   split_name,
+                   hash_date,
+                   normalize_mobile_no
+                   )
+from .rules import DEFAULT_RULE_SET, RuleSet
+
+
+def preprocess_records(records: List[Dict], rules: Optional[RuleSet] = None) -> List[Dict]:
+    """
+    Splits the names, normalizes the dates of birth to YYYYMMDD and the mobile numbers to strings,
+    and flags the applicants above 18, or above the minimum age of the rules if it is configured.
+
+    The date format is detected once from a sample of the records, as the records of a file usually share one.
+
+    Args:
+        records (List[Dict]): The applications, with the name, email, date_of_birth and mobile_no fields.
+        rules (Optional[RuleSet]): The rules whose minimum age the above_18 field is computed with, see
+            RuleSet.age_threshold. Defaults to rules.DEFAULT_RULE_SET.
+
+    Returns:
+        List[Dict]: The records with the first_name, last_name, email, date_of_birth, mobile_no and above_18 fields.
+    """
+    age, date_cutoff = (rules or DEFAULT_RULE_SET).age_threshold()
+    preprocessed_records = []
+    date_formats = DATE_NORMALIZER.detect_formats(record['date_of_birth'] for record in records)
+    for record in records:
+        preprocessed_record = {}
+        preprocessed_record['first_name'], preprocessed_record['last_name'] = split_name(record['name'])
+        preprocessed_record['email'] = record['email']
+        preprocessed_record['date_of_birth'] = DATE_NORMALIZER.normalize(record['date_of_birth'], date_formats)
+        preprocessed_record['mobile_no'] = normalize_mobile_no(record['mobile_no'])
+        preprocessed_record['above_18'] = is_above_age(preprocessed_record['date_of_birth'], age, date_cutoff)
+        preprocessed_records.append(preprocessed_record)
+    return preprocessed_records
+
+
+def validate_record(record: Dict, rules: Optional[RuleSet] = None) -> str:
+    """
+    Checks a preprocessed record against the validation rules.
+
+    Args:
+        record (Dict): A record returned by preprocess_records.
+        rules (Optional[RuleSet]): The rules to apply. Defaults to rules.DEFAULT_RULE_SET, i.e. the checks
+            'invalid_mobile_number', 'below_18', 'invalid_email' and 'missing_name' unless configured otherwise.
+
+    Returns:
+        str: VALID if the record passes all the rules, otherwise the name of the first rule it fails.
+    """
+    return (rules or DEFAULT_RULE_SET).validate_record(record)
+
+
+def validate_records(records: List[Dict], rules: Optional[RuleSet] = None,
+                     mode: str = 'first') -> Tuple[List[Dict], List[Dict]]:
+    """
+    Splits preprocessed records into the valid and the invalid ones.
+
+    Args:
+        records (List[Dict]): Records returned by preprocess_records.
+        rules (Optional[RuleSet]): The rules to apply. Defaults to rules.DEFAULT_RULE_SET.
+        mode (str): 'first' to stop checking a record at the first rule it fails, or 'all' to also add
+            every rule it fails as a bitmask in its validate_mask field, see RuleSet.describe_mask.
+
+    Returns:
+        Tuple[List[Dict], List[Dict]]: The valid records, and the invalid records with the first failed
+        rule in their validate_check field.
+    """
+    return (rules or DEFAULT_RULE_SET).validate_records(records, mode)
+
+
+def transform_records(records: List[Dict]) -> List[Dict]:
+    """
+    Adds the membership id, <last_name>_<first 5 characters of the SHA256 of the date of birth>, to valid records.
+
+    The dates of birth are already normalized to YYYYMMDD by preprocess_records,
+    so they are hashed without checking their format again.
+
+    Args:
+        records (List[Dict]): Valid records returned by validate_records, updated in place.
+
+    Returns:
+        List[Dict]: The records with their membership_id field.
+    """
+    for record in records:
+        record['membership_id'] = '_'.join([record['last_name'], hash_date(record['date_of_birth'])])
+    return records
@@ -0,0 +1,479 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import json
+import os
+import re
+from datetime import datetime
+from .core import EMAIL_SUFFIXES
+
+
+# value returned for a record which passes all the rules
+VALID = 'valid'
+
+# Rules applied when no rule file is configured, i.e. the checks of the pipeline in the order in which
+# they are reported: a record failing several rules is rejected for the first of them in this list
+DEFAULT_RULES = [
+  {'name': 'invalid_mobile_number', 'type': 'digits', 'column': 'mobile_no', 'count': 8},
+  {'name': 'below_18', 'type': 'min_age', 'column': 'date_of_birth', 'age': 18, 'date_cutoff': '2022-01-01'},
+  {'name': 'invalid_email', 'type': 'email', 'column': 'email', 'suffixes': list(EMAIL_SUFFIXES)},
+  {'name': 'missing_name', 'type': 'not_empty', 'columns': ['first_name', 'last_name']},
+]
+
+# Path of a JSON or YAML rule file, or the rules themselves as JSON, replacing DEFAULT_RULES
+RULES_ENV_VAR = 'VALIDATION_RULES'
+
+# Rejection rate assumed for a rule before it has been observed, and the number of records this
+# assumption weighs as, so that the order of the rules does not swing on the first few records
+DEFAULT_REJECTION_RATE = 0.1
+PRIOR_WEIGHT = 100
+
+# the failures of a record are reported as the bits of a 64-bit integer
+MAX_RULES = 63
+
+
+class Rule:
+    """
+    A check on the fields of a preprocessed record, which fails the record with the name of the rule.
+
+    Subclasses compile the check of a record (a dict) into a predicate, and check a DataFrame
+    column-wise, with the same results.
+
+    Args:
+        name (str): The reason reported for the records failing the rule, e.g. 'invalid_email'.
+        column (str): The field checked by the rule.
+        cost (Optional[float]): The relative cost of the check, used to order the rules. Defaults to the
+            cost of the type of rule.
+        rejection_rate (Optional[float]): The expected share of records failing the rule, before it is observed.
+    """
+    type = None
+    cost = 1.0
+
+    def __init__(self, name: str, column: str, cost: Optional[float] = None, rejection_rate: Optional[float] = None):
+        self.name = name
+        self.columns = [column]
+        if cost is not None:
+            self.cost = float(cost)
+        self.rejection_rate = DEFAULT_REJECTION_RATE if rejection_rate is None else float(rejection_rate)
+
+    @property
+    def column(self) -> str:
+        return self.columns[0]
+
+    def compile(self) -> Callable[[Dict], bool]:
+        """Returns a function of a record returning True if the record passes the rule."""
+        raise NotImplementedError
+
+    def check_frame(self, df):
+        """Returns a boolean numpy array, True for the records of the DataFrame passing the rule."""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.name!r})'
+
+
+class DigitsRule(Rule):
+    """Checks that a number has `count` digits, as core.has_correct_digits."""
+    type = 'digits'
+    cost = 2.0
+
+    def __init__(self, name: str, column: str, count: int, **kwargs):
+        super().__init__(name, column, **kwargs)
+        self.count = int(count)
+
+    def compile(self) -> Callable[[Dict], bool]:
+        column, count = self.column, self.count
+        return lambda record: len(str(record[column])) == count
+
+    def check_frame(self, df):
+        from .batch import have_correct_digits
+        return have_correct_digits(df[self.column], self.count).to_numpy(dtype=bool)
+
+
+class MinAgeRule(Rule):
+    """
+    Checks that a date of birth is at least `age` years before `date_cutoff`, as core.is_above_age.
+
+    The dates of birth must be in YYYYMMDD format, as normalized by the preprocessing, so that
+    they are compared as integers, see batch.are_above_age.
+    """
+    type = 'min_age'
+    cost = 2.0
+
+    def __init__(self, name: str, column: str, age: int, date_cutoff: str = "2022-01-01", **kwargs):
+        super().__init__(name, column, **kwargs)
+        self.age = int(age)
+        self.date_cutoff = date_cutoff
+
+    def compile(self) -> Callable[[Dict], bool]:
+        column = self.column
+        latest = int(datetime.strptime(self.date_cutoff, "%Y-%m-%d").strftime("%Y%m%d")) - self.age * 10000
+        return lambda record: int(record[column]) <= latest
+
+    def check_frame(self, df):
+        from .batch import are_above_age
+        return are_above_age(df[self.column], self.age, self.date_cutoff).to_numpy(dtype=bool)
+
+
+class EmailRule(Rule):
+    """Checks that an email address contains "@" and ends with one of `suffixes`, as core.is_valid_email."""
+    type = 'email'
+    cost = 3.0
+
+    def __init__(self, name: str, column: str, suffixes: Optional[List[str]] = None, **kwargs):
+        super().__init__(name, column, **kwargs)
+        self.suffixes = EMAIL_SUFFIXES if suffixes is None else tuple(suffixes)
+
+    def compile(self) -> Callable[[Dict], bool]:
+        column, suffixes = self.column, self.suffixes
+        return lambda record: '@' in record[column] and record[column].endswith(suffixes)
+
+    def check_frame(self, df):
+        from .batch import are_valid_emails
+        return are_valid_emails(df[self.column], self.suffixes).to_numpy(dtype=bool)
+
+
+class NotEmptyRule(Rule):
+    """Checks that at least one of `columns` is not empty, as core.is_empty_name."""
+    type = 'not_empty'
+    cost = 2.0
+
+    def __init__(self, name: str, columns: List[str], **kwargs):
+        super().__init__(name, columns[0], **kwargs)
+        self.columns = list(columns)
+
+    def compile(self) -> Callable[[Dict], bool]:
+        columns = self.columns
+        return lambda record: any(record[column] is not None and record[column].strip() for column in columns)
+
+    def check_frame(self, df):
+        from .batch import are_empty_names
+        empty = are_empty_names(df[self.columns[0]])
+        for column in self.columns[1:]:
+            empty &= are_empty_names(df[column])
+        return ~empty.to_numpy(dtype=bool)
+
+
+class RegexRule(Rule):
+    """Checks that a field, as a string, fully matches `pattern`."""
+    type = 'regex'
+    cost = 4.0
+
+    def __init__(self, name: str, column: str, pattern: str, **kwargs):
+        super().__init__(name, column, **kwargs)
+        self.pattern = pattern
+        re.compile(pattern)
+
+    def compile(self) -> Callable[[Dict], bool]:
+        column, fullmatch = self.column, re.compile(self.pattern).fullmatch
+        return lambda record: record[column] is not None and fullmatch(str(record[column])) is not None
+
+    def check_frame(self, df):
+        values = df[self.column]
+        return (values.astype(str).str.fullmatch(self.pattern) & values.notna()).to_numpy(dtype=bool)
+
+
+class TrueRule(Rule):
+    """Checks that a boolean field is true, e.g. a flag computed by the preprocessing."""
+    type = 'true'
+    cost = 1.0
+
+    def compile(self) -> Callable[[Dict], bool]:
+        column = self.column
+        return lambda record: bool(record[column])
+
+    def check_frame(self, df):
+        return df[self.column].to_numpy(dtype=bool)
+
+
+# types of rule of the rule files
+RULE_TYPES = {rule_class.type: rule_class
+              for rule_class in [DigitsRule, MinAgeRule, EmailRule, NotEmptyRule, RegexRule, TrueRule]}
+
+
+class RuleSet:
+    """
+    Rules compiled from their configuration, applied to records or to DataFrames.
+
+    A record is checked against the rules one at a time and rejected for the first rule it fails,
+    without checking the rules after it. The failures of every rule can be reported as well, with
+    rule i as bit i of a failure mask.
+
+    By default the rules are ordered, i.e. checked in their declared order, so that a record failing
+    several rules is always rejected for the same one. Checking the rules in any other order would
+    only check more rules, as a record still has to be checked against all the rules declared before
+    the one it is rejected for. If the reasons of the rejections do not matter, the rules can be
+    unordered instead and checked the cheapest and most selective first, i.e. by increasing cost
+    divided by rejection rate, so that most records are rejected by the first rules checked. The
+    rejection rates are observed as the rules are applied, and the order is updated after each batch.
+
+    Args:
+        rules (List[Rule]): The rules.
+        ordered (bool): Whether to check the rules in their declared order, see above.
+
+    Raises:
+        ValueError: If there are no rules, more than MAX_RULES rules or several rules with the same name.
+
+    Example:
+        >>> rule_set = compile_rules([{'name': 'invalid_email', 'type': 'email', 'column': 'email'}])
+        >>> rule_set.validate_record({'email': 'jane@example.org'})
+        'invalid_email'
+    """
+
+    def __init__(self, rules: List[Rule], ordered: bool = True):
+        if not rules or len(rules) > MAX_RULES:
+            raise ValueError(f"A rule set must have between 1 and {MAX_RULES} rules, got {len(rules)}")
+        names = [rule.name for rule in rules]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate rule names: {duplicates}")
+        self.rules = list(rules)
+        self.names = names
+        self.ordered = ordered
+        self.evaluated = [PRIOR_WEIGHT] * len(rules)
+        self.rejected = [rule.rejection_rate * PRIOR_WEIGHT for rule in rules]
+        self.predicates = [rule.compile() for rule in rules]
+        self.order = list(range(len(rules)))
+        self.reorder()
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __getstate__(self):
+        # the compiled predicates are closures, which cannot be sent to other processes
+        state = dict(self.__dict__)
+        del state['predicates']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.predicates = [rule.compile() for rule in self.rules]
+
+    def rejection_rates(self) -> List[float]:
+        """Returns the rejection rate of each rule, observed or assumed, in the declared order."""
+        return [rejected / evaluated for rejected, evaluated in zip(self.rejected, self.evaluated)]
+
+    def reorder(self):
+        """Sorts unordered rules by increasing cost divided by rejection rate, the order in which they are checked."""
+        if self.ordered:
+            return
+        rates = self.rejection_rates()
+        self.order = sorted(range(len(self.rules)),
+                            key=lambda index: (self.rules[index].cost / max(rates[index], 1e-6), index))
+
+    def observe(self, rejected_by_position: List[int], total: int):
+        """
+        Adds the rejections of a batch to the observed rejection rates and reorders the rules.
+
+        Args:
+            rejected_by_position (List[int]): The number of records rejected by each rule, in the order
+                in which the rules were checked.
+            total (int): The number of records of the batch.
+        """
+        remaining = total
+        for index, rejected in zip(self.order, rejected_by_position):
+            self.evaluated[index] += remaining
+            self.rejected[index] += rejected
+            remaining -= rejected
+        self.reorder()
+
+    def stats(self) -> List[Dict]:
+        """Returns the rules with their rejection rates, in the order in which they are checked."""
+        rates = self.rejection_rates()
+        return [{'name': self.names[index], 'type': self.rules[index].type, 'cost': self.rules[index].cost,
+                 'rejection_rate': rates[index]} for index in self.order]
+
+    def validate_record(self, record: Dict) -> str:
+        """Returns VALID if the record passes all the rules, otherwise the name of the first rule it fails."""
+        for index in self.order:
+            if not self.predicates[index](record):
+                return self.names[index]
+        return VALID
+
+    def failure_mask(self, record: Dict) -> int:
+        """Returns the rules a record fails, as an integer with bit i set if it fails rule i."""
+        mask = 0
+        for index, predicate in enumerate(self.predicates):
+            if not predicate(record):
+                mask |= 1 << index
+        return mask
+
+    def age_threshold(self) -> Tuple[int, str]:
+        """
+        Returns the age and date cutoff of the first min_age rule, which the above_18 field of the
+        preprocessing is computed with, or 18 years as of 2022-01-01 if there is no such rule.
+        """
+        for rule in self.rules:
+            if isinstance(rule, MinAgeRule):
+                return rule.age, rule.date_cutoff
+        return 18, "2022-01-01"
+
+    def describe_mask(self, mask: int) -> List[str]:
+        """Returns the names of the rules set in a failure mask, in the declared order."""
+        return [name for index, name in enumerate(self.names) if mask >> index & 1]
+
+    def validate_records(self, records: List[Dict], mode: str = 'first') -> Tuple[List[Dict], List[Dict]]:
+        """
+        Splits preprocessed records into the valid and the invalid ones.
+
+        Args:
+            records (List[Dict]): Preprocessed records.
+            mode (str): 'first' to stop checking a record at the first rule it fails, or 'all' to check every
+                rule and add the failures of the invalid records as a bitmask in their validate_mask field.
+
+        Returns:
+            Tuple[List[Dict], List[Dict]]: The valid records, and the invalid records with the first rule
+            they fail in their validate_check field.
+        """
+        check_mode(mode)
+        valid_records = []
+        invalid_records = []
+        checks = [(position, self.names[index], self.predicates[index]) for position, index in enumerate(self.order)]
+        rejected = [0] * len(checks)
+        for record in records:
+            for position, name, predicate in checks:
+                if not predicate(record):
+                    rejected[position] += 1
+                    record['validate_check'] = name
+                    if mode == 'all':
+                        record['validate_mask'] = self.failure_mask(record)
+                    invalid_records.append(record)
+                    break
+            else:
+                valid_records.append(record)
+        self.observe(rejected, len(records))
+        return valid_records, invalid_records
+
+    def evaluate_frame(self, df, mode: str = 'first') -> Tuple[Any, Any]:
+        """
+        Finds the first rule each record of a DataFrame fails.
+
+        Each rule is only applied to the records which have not failed a rule checked before it.
+
+        Args:
+            df (pd.DataFrame): Preprocessed records.
+            mode (str): 'first' to only find the first rule each record fails, or 'all' to apply every rule
+                to every record and return the failure masks as well.
+
+        Returns:
+            Tuple[np.ndarray, Optional[np.ndarray]]: The index of the first rule failed by each record,
+            len(rule_set) for the valid records, and in 'all' mode the failure masks, with bit i set for the
+            records failing rule i.
+        """
+        import numpy as np
+        check_mode(mode)
+        num_rules = len(self.rules)
+        first = np.full(len(df), num_rules, dtype=np.int64)
+        mask = np.zeros(len(df), dtype=np.int64) if mode == 'all' else None
+        rejected = []
+        for index in self.order:
+            rule = self.rules[index]
+            candidates = first == num_rules
+            num_candidates = int(candidates.sum())
+            if mode == 'all':
+                failed = ~rule.check_frame(df)
+                mask |= failed.astype(np.int64) << index
+                failed &= candidates
+            elif num_candidates == len(df):
+                failed = ~rule.check_frame(df)
+            else:
+                failed = np.zeros(len(df), dtype=bool)
+                if num_candidates > 0:
+                    failed[candidates] = ~rule.check_frame(df[rule.columns][candidates])
+            first[failed] = index
+            rejected.append(int(failed.sum()))
+        self.observe(rejected, len(df))
+        return first, mask
+
+
+def check_mode(mode: str):
+    if mode not in ('first', 'all'):
+        raise ValueError(f"Unknown validation mode: {mode}, expected 'first' or 'all'")
+
+
+def compile_rule(config: Dict) -> Rule:
+    """
+    Builds a rule from its configuration.
+
+    Args:
+        config (Dict): The name and type of the rule, and the parameters of its type, e.g.
+            {'name': 'invalid_mobile_number', 'type': 'digits', 'column': 'mobile_no', 'count': 8}.
+
+    Returns:
+        Rule: The rule.
+
+    Raises:
+        ValueError: If the type of rule is unknown or its parameters are invalid.
+    """
+    params = dict(config)
+    rule_type = params.pop('type', None)
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Unknown rule type {rule_type!r} in rule {config.get('name')!r}, "
+                         f"expected one of {sorted(RULE_TYPES)}")
+    try:
+        return RULE_TYPES[rule_type](**params)
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters for rule {config.get('name')!r} of type {rule_type!r}: {e}") from e
+
+
+def compile_rules(config, ordered: Optional[bool] = None) -> RuleSet:
+    """
+    Compiles the configuration of rules into a rule set.
+
+    Args:
+        config: A list of rule configurations, see compile_rule, or a dict with the list in its `rules` key
+            and optionally `ordered`.
+        ordered (Optional[bool]): Whether to check the rules in their declared order, see RuleSet.
+            Defaults to the `ordered` key of the configuration, or True.
+
+    Returns:
+        RuleSet: The compiled rules.
+
+    Raises:
+        ValueError: If the configuration is invalid.
+    """
+    if isinstance(config, dict):
+        if ordered is None:
+            ordered = config.get('ordered')
+        config = config.get('rules')
+    if not isinstance(config, list):
+        raise ValueError("The rules must be a list, or a mapping with a list of rules in its 'rules' key")
+    return RuleSet([compile_rule(rule) for rule in config], ordered=True if ordered is None else bool(ordered))
+
+
+def load_rules(source: str, ordered: Optional[bool] = None) -> RuleSet:
+    """
+    Loads and compiles rules from a JSON or YAML file, or from a JSON string.
+
+    YAML files, with the .yaml or .yml extension, need PyYAML.
+
+    Args:
+        source (str): The path of the rule file, or the rules as JSON.
+        ordered (Optional[bool]): See compile_rules.
+
+    Returns:
+        RuleSet: The compiled rules.
+
+    Raises:
+        ValueError: If the rules are invalid.
+    """
+    if source.lstrip().startswith(('[', '{')):
+        return compile_rules(json.loads(source), ordered)
+    with open(source) as f:
+        if source.endswith(('.yaml', '.yml')):
+            import yaml
+            config = yaml.safe_load(f)
+        else:
+            config = json.load(f)
+    return compile_rules(config, ordered)
+
+
+def default_rules() -> RuleSet:
+    """Returns the rules of the VALIDATION_RULES environment variable if set, otherwise DEFAULT_RULES."""
+    source = os.getenv(RULES_ENV_VAR)
+    if source:
+        return load_rules(source)
+    return compile_rules(DEFAULT_RULES)
+
+
+# compiled once per process, e.g. once per Lambda container or pipeline worker,
+# and used by the record and the batch APIs when no rules are given
+DEFAULT_RULE_SET = default_rules()
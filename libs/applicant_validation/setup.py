@@ -0,0 +1,12 @@
+from setuptools import setup
+
+setup(
+  name='applicant-validation',
+  version='0.1.0',
+  description='Validation of membership applications, shared by the Airflow pipeline and the Lambda function',
+  packages=['applicant_validation'],
+  python_requires='>=3.7',
+  # the DataFrame API of applicant_validation.batch, used by the Airflow pipeline
+  # and the YAML rule files of applicant_validation.rules
+  extras_require={'batch': ['numpy', 'pandas'], 'yaml': ['PyYAML']},
+)
@@ -0,0 +1,17 @@
+"""
+Access to the ecommerce database, shared by the Airflow pipeline, the scripts of the database and the
+provisioning of its users.
+
+- db: the connection settings of the .env file, a pool of connections, server-side cursors and prepared
+  statements
+- members: the upsert of the successful applicants written by the pipelines into the members table,
+  streamed with COPY into a staging table and merged in one transaction
+
+Example:
+    >>> from ecommerce_db import db
+    >>> from ecommerce_db.members import load_members
+    >>> with db.connection() as connection:
+    ...     load_members(connection, ['/successful_applicants'])
+"""
+
+__version__ = '0.1.0'
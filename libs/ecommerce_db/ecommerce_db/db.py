@@ -0,0 +1,160 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence
+import os
+import weakref
+import psycopg2
+import psycopg2.pool
+from dotenv import find_dotenv, load_dotenv
+
+
+# Number of connections kept open by the pool, and the most it opens at once
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 5
+
+# Number of rows fetched from the server at a time by server-side cursors
+CURSOR_ITERSIZE = 10000
+
+_pool = None
+
+# names of the statements prepared in the session of each connection of the pool
+_prepared = weakref.WeakKeyDictionary()
+
+
+def connection_settings() -> Dict[str, str]:
+    """
+    Reads the connection settings from the DB_* environment variables, or the .env file of the working
+    directory or of its parents, e.g. of the src directory the scripts are run from.
+
+    DB_SSLMODE and DB_CONNECT_TIMEOUT are optional, and passed to libpq when set.
+
+    Returns:
+        Dict[str, str]: The keyword arguments of psycopg2.connect.
+    """
+    load_dotenv(find_dotenv(usecwd=True))
+    settings = {
+      'host': os.getenv('DB_HOST'),
+      'port': os.getenv('DB_PORT'),
+      'dbname': os.getenv('DB_NAME'),
+      'user': os.getenv('DB_USER'),
+      'password': os.getenv('DB_PASSWORD'),
+    }
+    for name in ['sslmode', 'connect_timeout']:
+        value = os.getenv(f'DB_{name.upper()}')
+        if value:
+            settings[name] = value
+    return settings
+
+
+def get_pool(max_connections: Optional[int] = None) -> psycopg2.pool.ThreadedConnectionPool:
+    """
+    Returns the connection pool of the process, creating it on first use.
+
+    The pool keeps DB_POOL_MIN connections open (default 1) and opens at most DB_POOL_MAX (default 5), so
+    that the queries of a long-lived process reuse warm connections rather than paying the connection
+    setup and TLS negotiation every time. It can be used from several threads.
+
+    Args:
+        max_connections (Optional[int]): The number of connections the caller uses at once, e.g. its number
+            of threads, which the pool opens at least. The pool raises an error rather than waiting when
+            all its connections are in use. Only used when the pool is created.
+
+    Returns:
+        psycopg2.pool.ThreadedConnectionPool: The connection pool.
+    """
+    global _pool
+    if _pool is None:
+        min_connections = int(os.getenv('DB_POOL_MIN', POOL_MIN_CONNECTIONS))
+        max_connections = max(int(os.getenv('DB_POOL_MAX', POOL_MAX_CONNECTIONS)), max_connections or 0)
+        _pool = psycopg2.pool.ThreadedConnectionPool(min_connections, max(min_connections, max_connections),
+                                                     **connection_settings())
+    return _pool
+
+
+def close_pool() -> None:
+    """Closes all the connections of the pool, e.g. at the end of a script."""
+    global _pool
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
+
+
+@contextmanager
+def connection(autocommit: bool = False, isolation_level: Optional[str] = None,
+               readonly: bool = False) -> Iterator[psycopg2.extensions.connection]:
+    """
+    Borrows a connection from the pool for a transaction.
+
+    The transaction is committed if the block succeeds and rolled back otherwise, and the connection is
+    then returned to the pool with its default session, or discarded if it was closed, e.g. by a restart
+    of the server.
+
+    Args:
+        autocommit (bool): Whether to run every statement in its own transaction, e.g. for VACUUM.
+        isolation_level (Optional[str]): The isolation level of the transaction, e.g. 'REPEATABLE READ' for
+            several queries reading the same snapshot. Defaults to the level of the server.
+        readonly (bool): Whether the transaction is read only.
+
+    Yields:
+        psycopg2.extensions.connection: The connection.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    if conn.closed:
+        pool.putconn(conn, close=True)
+        conn = pool.getconn()
+    try:
+        conn.set_session(isolation_level=isolation_level or 'DEFAULT', readonly=readonly or 'DEFAULT',
+                         autocommit=autocommit)
+        yield conn
+        conn.commit()
+    finally:
+        if not conn.closed:
+            conn.rollback()
+            conn.set_session(isolation_level='DEFAULT', readonly='DEFAULT', autocommit=False)
+        pool.putconn(conn, close=bool(conn.closed))
+
+
+@contextmanager
+def server_side_cursor(conn: psycopg2.extensions.connection, name: str = 'results',
+                       itersize: int = CURSOR_ITERSIZE) -> Iterator[psycopg2.extensions.cursor]:
+    """
+    Opens a named cursor, which keeps the results of a query on the server.
+
+    Iterating over the cursor, or calling fetchmany, fetches itersize rows at a time, so that large results
+    are not held in memory at once. The cursor only lives in the current transaction.
+
+    Args:
+        conn (psycopg2.extensions.connection): The connection, not in autocommit mode.
+        name (str): The name of the cursor, unique in the transaction.
+        itersize (int): The number of rows fetched at a time.
+
+    Yields:
+        psycopg2.extensions.cursor: The cursor, to execute one query.
+    """
+    with conn.cursor(name) as cur:
+        cur.itersize = itersize
+        yield cur
+
+
+def execute_prepared(cur: psycopg2.extensions.cursor, name: str, statement: str,
+                     params: Optional[Sequence[Any]] = None) -> None:
+    """
+    Executes a statement prepared once per connection, so that it is only parsed and planned once.
+
+    The statement is prepared on its first execution on the connection of the cursor, and kept for the
+    life of the connection, including by the pool.
+
+    Args:
+        cur (psycopg2.extensions.cursor): A cursor, which is not a server-side cursor.
+        name (str): The name of the prepared statement, an SQL identifier.
+        statement (str): The statement, with the parameters written as $1, $2, ...
+        params (Optional[Sequence[Any]]): The parameters.
+    """
+    prepared = _prepared.setdefault(cur.connection, set())
+    if name not in prepared:
+        cur.execute(f'PREPARE {name} AS {statement}')
+        prepared.add(name)
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f'EXECUTE {name}')
@@ -0,0 +1,179 @@
+from typing import Dict, IO, Iterable, Iterator, List
+import csv
+import io
+import os
+
+
+# columns of the successful applicants written by the pipelines, staged as text
+STAGED_COLUMNS = ['first_name', 'last_name', 'email', 'date_of_birth', 'mobile_no', 'above_18', 'membership_id']
+
+# size of the chunks read from a CSV file and sent to the database by COPY, and number of
+# records of a Parquet file converted to CSV at once
+COPY_BUFFER_SIZE = 1024 * 1024
+PARQUET_BATCH_SIZE = 100000
+
+# the staging table only lives for the transaction of a load, and seq keeps the order of the records
+# so that the last record of a member wins when the member appears more than once
+CREATE_STAGING_TABLE = """
+CREATE TEMPORARY TABLE members_staging (
+  seq BIGSERIAL,
+  first_name TEXT,
+  last_name TEXT,
+  email TEXT,
+  date_of_birth TEXT,
+  mobile_no TEXT,
+  above_18 TEXT,
+  membership_id TEXT
+) ON COMMIT DROP
+"""
+
+# members whose details have not changed are left untouched rather than rewritten
+MERGE_MEMBERS = """
+WITH upserted AS (
+  INSERT INTO members AS m (membership_id, first_name, last_name, email, date_of_birth, mobile_no)
+  SELECT DISTINCT ON (membership_id)
+         membership_id, COALESCE(first_name, ''), COALESCE(last_name, ''), email,
+         to_date(date_of_birth, 'YYYYMMDD'), mobile_no
+  FROM members_staging
+  ORDER BY membership_id, seq DESC
+  ON CONFLICT (membership_id) DO UPDATE
+  SET first_name = EXCLUDED.first_name,
+      last_name = EXCLUDED.last_name,
+      email = EXCLUDED.email,
+      date_of_birth = EXCLUDED.date_of_birth,
+      mobile_no = EXCLUDED.mobile_no,
+      updated_at = now()
+  WHERE (m.first_name, m.last_name, m.email, m.date_of_birth, m.mobile_no)
+        IS DISTINCT FROM (EXCLUDED.first_name, EXCLUDED.last_name, EXCLUDED.email,
+                          EXCLUDED.date_of_birth, EXCLUDED.mobile_no)
+  RETURNING (xmax = 0) AS inserted
+)
+SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted
+"""
+
+
+def read_csv_header(f: IO[bytes]) -> List[str]:
+    """
+    Reads the header of a CSV file, leaving the file at the start of the records.
+
+    Args:
+        f (IO[bytes]): The CSV file, opened in binary mode.
+
+    Returns:
+        List[str]: The columns of the file.
+
+    Raises:
+        ValueError: If the file has columns which are not successful applicants' or misses the membership_id.
+    """
+    columns = next(csv.reader([f.readline().decode('utf-8-sig')]), [])
+    unexpected = [column for column in columns if column not in STAGED_COLUMNS]
+    if unexpected or 'membership_id' not in columns:
+        raise ValueError(f"Not a file of successful applicants: columns {columns}")
+    return columns
+
+
+def copy_statement(columns: List[str]) -> str:
+    # the columns are checked against STAGED_COLUMNS, so they can be written in the statement as they are
+    return f"COPY members_staging ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+
+
+def copy_csv(cursor, filename: str) -> int:
+    """
+    Streams the records of a CSV file into the staging table, without reading the file in memory.
+
+    Args:
+        cursor: A psycopg2 cursor.
+        filename (str): A CSV file of successful applicants, with a header.
+
+    Returns:
+        int: The number of records copied.
+    """
+    with open(filename, 'rb') as f:
+        columns = read_csv_header(f)
+        cursor.copy_expert(copy_statement(columns), f, size=COPY_BUFFER_SIZE)
+    return cursor.rowcount
+
+
+def copy_parquet(cursor, filename: str, batch_size: int = PARQUET_BATCH_SIZE) -> int:
+    """
+    Copies the records of a Parquet file into the staging table, one batch of records at a time.
+
+    Args:
+        cursor: A psycopg2 cursor.
+        filename (str): A Parquet file of successful applicants.
+        batch_size (int): The maximum number of records held in memory at once.
+
+    Returns:
+        int: The number of records copied.
+    """
+    import pyarrow.csv
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(filename)
+    columns = [name for name in parquet_file.schema_arrow.names if name in STAGED_COLUMNS]
+    if 'membership_id' not in columns:
+        raise ValueError(f"Not a file of successful applicants: columns {parquet_file.schema_arrow.names}")
+    copied = 0
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        buffer = io.BytesIO()
+        pyarrow.csv.write_csv(batch, buffer, pyarrow.csv.WriteOptions(include_header=False))
+        buffer.seek(0)
+        cursor.copy_expert(copy_statement(columns), buffer, size=COPY_BUFFER_SIZE)
+        copied += cursor.rowcount
+    return copied
+
+
+def iter_member_files(paths: Iterable[str]) -> Iterator[str]:
+    """
+    Lists the CSV and Parquet files of successful applicants, expanding the directories, e.g. Parquet datasets.
+
+    Args:
+        paths (Iterable[str]): Files and directories.
+
+    Yields:
+        str: The files, with the files of a directory in sorted order.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, _, filenames in sorted(os.walk(path)):
+            for filename in sorted(filenames):
+                if filename.endswith(('.csv', '.parquet')):
+                    yield os.path.join(directory, filename)
+
+
+def load_members(connection, paths: Iterable[str]) -> Dict[str, int]:
+    """
+    Upserts successful applicants into the members table.
+
+    The files are copied into a temporary staging table with COPY, which is then merged into
+    the members table on the membership_id in one statement, all in one transaction. A member
+    appearing more than once takes the details of its last record.
+
+    Args:
+        connection: A psycopg2 connection to the database with the members table.
+        paths (Iterable[str]): CSV or Parquet files of successful applicants, or directories of them.
+
+    Returns:
+        Dict[str, int]: The number of records staged, and of members inserted and updated.
+
+    Raises:
+        ValueError: If a file is not a file of successful applicants.
+    """
+    staged = 0
+    with connection:
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_STAGING_TABLE)
+            for filename in iter_member_files(paths):
+                if filename.endswith('.parquet'):
+                    copied = copy_parquet(cursor, filename)
+                else:
+                    copied = copy_csv(cursor, filename)
+                print(f"Staged {copied} records from {filename}")
+                staged += copied
+            # temporary tables are not analyzed automatically, and the merge sorts them
+            cursor.execute("ANALYZE members_staging")
+            cursor.execute(MERGE_MEMBERS)
+            inserted, updated = cursor.fetchone()
+    print(f"Loaded {staged} records into members: {inserted} inserted and {updated} updated")
+    return {'staged': staged, 'inserted': inserted, 'updated': updated}
@@ -0,0 +1,12 @@
+from setuptools import setup
+
+setup(
+  name='ecommerce-db',
+  version='0.1.0',
+  description='Connections to the ecommerce database and loading of the successful applicants into it',
+  packages=['ecommerce_db'],
+  python_requires='>=3.7',
+  # the connection pool of the scripts needs psycopg2 and python-dotenv, while the Airflow pipeline
+  # passes its own connection to the members loader; the Parquet outputs of the pipelines are read with pyarrow
+  extras_require={'db': ['psycopg2-binary', 'python-dotenv'], 'parquet': ['pyarrow']},
+)
@@ -0,0 +1,13 @@
+"""
+Bookkeeping of the data pipelines, shared by the Airflow pipeline and the Lambda function.
+
+- manifest: the record of the source files ingested and processed, so that a file is processed once,
+  and the names they are archived under
+- metrics: the wall time, CPU time, rows, throughput and peak memory of the stages of a run, with the rejected
+  records by reason, exported to the logs, Prometheus, StatsD or CloudWatch
+
+The modules are imported on their own, so that the Lambda function only imports what it uses, e.g.
+`from pipeline_tracking.manifest import FileManifest`.
+"""
+
+__version__ = '0.1.0'
@@ -0,0 +1,103 @@
+from typing import Dict, Optional
+from datetime import datetime
+import hashlib
+import json
+import os
+
+
+# number of characters of the content hash added to the names of the archived files
+ARCHIVE_HASH_LENGTH = 16
+
+
+class FileManifest:
+    """
+    Record of the source files ingested and processed by the pipeline.
+
+    Each entry is keyed by the file name and holds the size, modification time,
+    content hash and number of rows of the file, with the status of its processing
+    ('ingested' or 'processed') and the run that last handled it. Files which were
+    processed before, under the same name or another one, can then be skipped.
+
+    Args:
+        entries (Optional[Dict[str, Dict]]): The entries of the manifest, keyed by file name.
+
+    Example:
+        >>> manifest = FileManifest.load('/source_data/archive/manifest.json')
+        >>> manifest.is_processed('9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08')
+        False
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Dict]] = None):
+        self.entries = entries or {}
+
+    @classmethod
+    def from_json(cls, text: str) -> 'FileManifest':
+        """Creates a manifest from its JSON representation."""
+        return cls(json.loads(text)['files'])
+
+    def to_json(self) -> str:
+        """Returns the JSON representation of the manifest."""
+        return json.dumps({'files': self.entries}, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, path: str) -> 'FileManifest':
+        """Loads a manifest from a local file, or returns an empty one if the file does not exist."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls.from_json(f.read())
+
+    def save(self, path: str):
+        """Saves the manifest to a local file, replacing it in one step so that a crash cannot corrupt it."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_json())
+        os.replace(tmp_path, path)
+
+    def is_unchanged(self, name: str, size: int, mtime) -> bool:
+        """Returns True if the file was processed and its size and modification time have not changed since."""
+        entry = self.entries.get(name)
+        return (entry is not None and entry['status'] == 'processed'
+                and entry['size'] == size and entry['mtime'] == mtime)
+
+    def is_processed(self, content_hash: str) -> bool:
+        """Returns True if a file with the same content was processed, under any name."""
+        return any(entry['status'] == 'processed' and entry['content_hash'] == content_hash
+                   for entry in self.entries.values())
+
+    def mark(self, name: str, status: str, **fields):
+        """
+        Records the status of a file.
+
+        Args:
+            name (str): The name of the file.
+            status (str): 'ingested' once its records are read, 'processed' once its outputs are written.
+            **fields: The other fields of the entry, e.g. size, mtime, content_hash, rows and run_id.
+        """
+        entry = self.entries.setdefault(name, {})
+        entry.update(fields)
+        entry['status'] = status
+        entry['updated_at'] = datetime.utcnow().isoformat()
+
+
+def archive_name(name: str, content_hash: str) -> str:
+    """
+    Returns the name a processed file is archived under, with the start of its content hash before its extension,
+    so that a file changed under the same name does not replace the archived copy of its previous version.
+
+    Example:
+        >>> archive_name('applications_dataset_1.csv', '9f86d081884c7d659a2feaa0c55ad015')
+        'applications_dataset_1.9f86d081884c7d65.csv'
+    """
+    root, ext = os.path.splitext(name)
+    return f'{root}.{content_hash[:ARCHIVE_HASH_LENGTH]}{ext}'
+
+
+def file_sha256(filename: str, block_size: int = 1 << 20) -> str:
+    """Returns the SHA256 hash of the content of a file, read in blocks."""
+    sha256_hash = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha256_hash.update(block)
+    return sha256_hash.hexdigest()
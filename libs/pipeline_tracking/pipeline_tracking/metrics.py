@@ -0,0 +1,325 @@
+from typing import Dict, Iterable, Iterator, List, Optional
+from collections import Counter
+from contextlib import contextmanager
+import json
+import os
+import resource
+import socket
+import time
+
+
+# reasons a record can be rejected for by the validation stage, always reported even when zero
+REJECTION_REASONS = ['invalid_mobile_number', 'below_18', 'invalid_email', 'missing_name']
+
+# comma separated exporters used by MetricsRecorder.export: log, prometheus, statsd and emf
+METRICS_EXPORTERS = os.getenv('PIPELINE_METRICS_EXPORTERS', 'log')
+SUPPORTED_EXPORTERS = ['log', 'prometheus', 'statsd', 'emf']
+# directory of the Prometheus text files, e.g. read by the textfile collector of the node exporter
+PROMETHEUS_DIR = os.getenv('PIPELINE_METRICS_DIR', '/metrics')
+STATSD_HOST = os.getenv('STATSD_HOST', 'localhost')
+STATSD_PORT = int(os.getenv('STATSD_PORT', 8125))
+# CloudWatch namespace of the metrics exported in embedded metric format
+EMF_NAMESPACE = os.getenv('PIPELINE_METRICS_NAMESPACE', 'MembershipApplications')
+
+
+def peak_rss_bytes() -> int:
+    """Returns the peak resident set size of the process and of its terminated worker processes."""
+    # ru_maxrss is in kilobytes on Linux
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * 1024
+
+
+def parse_exporters(exporters: str) -> List[str]:
+    """
+    Splits comma separated exporters, e.g. 'log,emf'.
+
+    Raises:
+        ValueError: If an exporter is not supported.
+    """
+    names = [exporter.strip() for exporter in exporters.split(',') if exporter.strip()]
+    unknown = [exporter for exporter in names if exporter not in SUPPORTED_EXPORTERS]
+    if unknown:
+        raise ValueError(f"Unknown metrics exporters: {', '.join(unknown)}, "
+                         f"expected some of {', '.join(SUPPORTED_EXPORTERS)}")
+    return names
+
+
+def cpu_seconds() -> float:
+    """Returns the CPU time used by the process and by its terminated worker processes."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class StageMetrics:
+    """
+    Metrics of a stage of the pipeline, accumulated over all the times the stage is run, e.g. once per batch.
+
+    Args:
+        stage (str): The name of the stage, e.g. 'validation'.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.peak_rss_bytes = 0
+        self.rejections = Counter()
+
+    def add_rows(self, rows_in: int = 0, rows_out: int = 0):
+        """Counts the records read and written by the stage."""
+        self.rows_in += int(rows_in)
+        self.rows_out += int(rows_out)
+
+    def add_rejections(self, reasons: Iterable[str]):
+        """Counts the rejected records by reason, e.g. from the `validate_check` column of the invalid records."""
+        for reason in REJECTION_REASONS:
+            self.rejections.setdefault(reason, 0)
+        self.rejections.update(reasons)
+
+    @property
+    def rows_per_second(self) -> float:
+        """The number of records read per second of wall time."""
+        return self.rows_in / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict:
+        values = {
+          'wall_seconds': round(self.wall_seconds, 6),
+          'cpu_seconds': round(self.cpu_seconds, 6),
+          'rows_in': self.rows_in,
+          'rows_out': self.rows_out,
+          'rows_per_second': round(self.rows_per_second, 3),
+          'peak_rss_bytes': self.peak_rss_bytes,
+        }
+        if self.rejections:
+            reasons = REJECTION_REASONS + sorted(set(self.rejections) - set(REJECTION_REASONS))
+            values['rejections'] = {reason: self.rejections[reason] for reason in reasons}
+        return values
+
+
+class MetricsRecorder:
+    """
+    Records the wall time, CPU time, rows in and out, throughput and peak memory of the stages of a pipeline
+    run, with the number of rejected records by reason, and exports them to Prometheus, StatsD or CloudWatch.
+
+    A stage can be entered several times, e.g. once per batch, and its metrics are summed. Stages can
+    be nested, e.g. a writing stage within the ingestion, in which case the time of the inner stage
+    is also counted in the outer one. The peak RSS is the high-water mark of the process at the end
+    of the stage, which Airflow runs in a process of its own for each task.
+
+    Args:
+        pipeline (str): The name of the pipeline, e.g. 'data_pipeline'.
+        run_id (Optional[str]): The id of the run, added to the logs and the embedded metric format.
+        task (Optional[str]): The task running the stages, when the stages of a run are spread over several
+            tasks. It is added to the labels of the metrics so that the tasks do not overwrite each other's.
+        exporters (Optional[str]): Comma separated exporters used by export. Defaults to METRICS_EXPORTERS.
+
+    Raises:
+        ValueError: If an exporter is not supported, so that a wrong setting fails the run before it starts
+            rather than when the metrics are exported, which is often while another exception is raised.
+
+    Example:
+        >>> metrics = MetricsRecorder('data_pipeline', context['run_id'], task='validation')
+        >>> with metrics.stage('validation') as stage:
+        ...     valid_df, invalid_df = validate_frame(df)
+        ...     stage.add_rows(rows_in=len(df), rows_out=len(valid_df))
+        ...     stage.add_rejections(invalid_df['validate_check'])
+        >>> metrics.export()
+    """
+
+    def __init__(self, pipeline: str, run_id: Optional[str] = None, task: Optional[str] = None,
+                 exporters: Optional[str] = None):
+        self.pipeline = pipeline
+        self.run_id = run_id
+        self.task = task
+        self.exporters = parse_exporters(exporters or METRICS_EXPORTERS)
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Times a stage of the pipeline.
+
+        Args:
+            name (str): The name of the stage.
+
+        Yields:
+            StageMetrics: The metrics of the stage, to count its rows and rejections.
+        """
+        metrics = self.stages.setdefault(name, StageMetrics(name))
+        start_wall = time.perf_counter()
+        start_cpu = cpu_seconds()
+        try:
+            yield metrics
+        finally:
+            metrics.wall_seconds += time.perf_counter() - start_wall
+            metrics.cpu_seconds += cpu_seconds() - start_cpu
+            metrics.peak_rss_bytes = max(metrics.peak_rss_bytes, peak_rss_bytes())
+
+    def iter_stage(self, name: str, batches: Iterable) -> Iterator:
+        """
+        Times the reading of batches as a stage, e.g. the ingestion of a file batch by batch,
+        counting the records of each batch as read and written by the stage.
+
+        Args:
+            name (str): The name of the stage.
+            batches (Iterable): The batches, e.g. lists of records or DataFrames.
+
+        Returns:
+            Iterator: The batches, with the time spent waiting for each of them recorded.
+        """
+        batches = iter(batches)
+        while True:
+            with self.stage(name) as stage:
+                batch = next(batches, None)
+                if batch is not None:
+                    stage.add_rows(rows_in=len(batch), rows_out=len(batch))
+            if batch is None:
+                return
+            yield batch
+
+    def to_dict(self) -> Dict:
+        return {
+          'pipeline': self.pipeline,
+          'run_id': self.run_id,
+          'task': self.task,
+          'stages': {name: metrics.to_dict() for name, metrics in self.stages.items()},
+        }
+
+    def to_prometheus(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format."""
+        task_label = f',task="{self.task}"' if self.task else ''
+        lines = []
+        gauges = [
+          ('wall_seconds', 'Wall time of the stage in seconds'),
+          ('cpu_seconds', 'CPU time of the stage in seconds, including its worker processes'),
+          ('rows_in', 'Number of records read by the stage'),
+          ('rows_out', 'Number of records written by the stage'),
+          ('rows_per_second', 'Number of records read by the stage per second of wall time'),
+          ('peak_rss_bytes', 'Peak resident set size of the process at the end of the stage'),
+        ]
+        for field, description in gauges:
+            metric = f'pipeline_stage_{field}'
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} gauge')
+            for name, metrics in self.stages.items():
+                lines.append(f'{metric}{{pipeline="{self.pipeline}"{task_label},stage="{name}"}} '
+                             f'{getattr(metrics, field)}')
+        rejections = [(name, metrics.to_dict()['rejections'])
+                      for name, metrics in self.stages.items() if metrics.rejections]
+        if rejections:
+            lines.append('# HELP pipeline_rejections Number of records rejected by the stage by reason')
+            lines.append('# TYPE pipeline_rejections gauge')
+            for name, counts in rejections:
+                for reason, count in counts.items():
+                    lines.append(f'pipeline_rejections{{pipeline="{self.pipeline}"{task_label},stage="{name}",'
+                                 f'reason="{reason}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def to_statsd(self) -> List[str]:
+        """Returns the metrics as StatsD lines, with the times as timers in milliseconds and the rest as gauges."""
+        lines = []
+        for name, metrics in self.stages.items():
+            prefix = '.'.join(filter(None, [self.pipeline, self.task, name]))
+            lines.append(f'{prefix}.wall_time:{metrics.wall_seconds * 1000:.3f}|ms')
+            lines.append(f'{prefix}.cpu_time:{metrics.cpu_seconds * 1000:.3f}|ms')
+            lines.append(f'{prefix}.rows_in:{metrics.rows_in}|g')
+            lines.append(f'{prefix}.rows_out:{metrics.rows_out}|g')
+            lines.append(f'{prefix}.rows_per_second:{metrics.rows_per_second:.3f}|g')
+            lines.append(f'{prefix}.peak_rss_bytes:{metrics.peak_rss_bytes}|g')
+            if metrics.rejections:
+                for reason, count in metrics.to_dict()['rejections'].items():
+                    lines.append(f'{prefix}.rejections.{reason}:{count}|g')
+        return lines
+
+    def to_emf(self) -> List[Dict]:
+        """
+        Returns the metrics in the CloudWatch embedded metric format, one document per stage.
+        CloudWatch extracts the metrics from the documents printed to the logs of a Lambda function.
+        """
+        timestamp = int(time.time() * 1000)
+        documents = []
+        for name, metrics in self.stages.items():
+            document = {
+              '_aws': {
+                'Timestamp': timestamp,
+                'CloudWatchMetrics': [{
+                  'Namespace': EMF_NAMESPACE,
+                  'Dimensions': [['Pipeline', 'Stage']],
+                  'Metrics': [
+                    {'Name': 'WallTime', 'Unit': 'Seconds'},
+                    {'Name': 'CpuTime', 'Unit': 'Seconds'},
+                    {'Name': 'RowsIn', 'Unit': 'Count'},
+                    {'Name': 'RowsOut', 'Unit': 'Count'},
+                    {'Name': 'RowsPerSecond', 'Unit': 'Count/Second'},
+                    {'Name': 'PeakRss', 'Unit': 'Bytes'},
+                  ],
+                }],
+              },
+              'Pipeline': self.pipeline,
+              'Stage': name,
+              'RunId': self.run_id,
+              'Task': self.task,
+              'WallTime': metrics.wall_seconds,
+              'CpuTime': metrics.cpu_seconds,
+              'RowsIn': metrics.rows_in,
+              'RowsOut': metrics.rows_out,
+              'RowsPerSecond': metrics.rows_per_second,
+              'PeakRss': metrics.peak_rss_bytes,
+            }
+            if metrics.rejections:
+                rejections = metrics.to_dict()['rejections']
+                document['_aws']['CloudWatchMetrics'][0]['Metrics'] += [
+                  {'Name': f'Rejections_{reason}', 'Unit': 'Count'} for reason in rejections]
+                document.update({f'Rejections_{reason}': count for reason, count in rejections.items()})
+            documents.append(document)
+        return documents
+
+    def write_prometheus(self, directory: str = PROMETHEUS_DIR):
+        """
+        Writes the metrics to <directory>/<pipeline>_<task>.prom, replacing the file of the previous run
+        in one step so that it is never read half-written.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, '_'.join(filter(None, [self.pipeline, self.task])) + '.prom')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+        print(f'Metrics written to {path}')
+
+    def send_statsd(self, host: str = STATSD_HOST, port: int = STATSD_PORT):
+        """Sends the metrics to a StatsD server over UDP, so that an unreachable server never fails the run."""
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            for line in self.to_statsd():
+                try:
+                    sock.sendto(line.encode('utf-8'), (host, port))
+                except OSError as e:
+                    print(f'Failed to send metrics to StatsD at {host}:{port}: {e}')
+                    return
+
+    def export(self, exporters: Optional[str] = None):
+        """
+        Exports the metrics. It is called in `finally` blocks, so an exporter which is not supported
+        is reported and skipped rather than raised, which would hide the exception of the run.
+
+        Args:
+            exporters (Optional[str]): Comma separated exporters, out of 'log' to print a summary of the
+                stages, 'prometheus', 'statsd' and 'emf' to print the embedded metric format.
+                Defaults to the exporters of the recorder.
+        """
+        names = self.exporters if exporters is None else [exporter.strip() for exporter in exporters.split(',')]
+        for exporter in names:
+            if exporter == 'log':
+                for stage, values in self.to_dict()['stages'].items():
+                    print(f'Metrics of {stage}: {json.dumps(values)}')
+            elif exporter == 'prometheus':
+                self.write_prometheus()
+            elif exporter == 'statsd':
+                self.send_statsd()
+            elif exporter == 'emf':
+                for document in self.to_emf():
+                    print(json.dumps(document))
+            elif exporter:
+                print(f'Skipped unknown metrics exporter: {exporter}')
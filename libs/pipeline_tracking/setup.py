@@ -0,0 +1,9 @@
+from setuptools import setup
+
+setup(
+  name='pipeline-tracking',
+  version='0.1.0',
+  description='Manifest of the processed files and stage metrics of the Airflow pipeline and the Lambda function',
+  packages=['pipeline_tracking'],
+  python_requires='>=3.7',
+)